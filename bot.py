@@ -3,13 +3,61 @@ Main Bot Module.
 Initializes and configures the Telegram bot using pyTelegramBotAPI.
 """
 
+import functools
+
 from telebot.async_telebot import AsyncTeleBot
 
-from config import TELEGRAM_BOT_TOKEN
+from config import TELEGRAM_BOT_TOKEN, MAX_CONCURRENT_HANDLERS
+from services.scheduler import PriorityScheduler, PRIORITY_COMMAND
 from utils.logging import logger
+from utils.ratelimit import telegram_limiter
+
+
+class PacedTeleBot(AsyncTeleBot):
+    """
+    AsyncTeleBot whose outgoing messages share one token bucket.
+    
+    Keeps bursts under Telegram's per-bot message limit instead of running
+    into 429 responses. Chat actions and downloads are not paced.
+    """
+    
+    async def send_message(self, *args, **kwargs):
+        async with telegram_limiter:
+            return await super().send_message(*args, **kwargs)
+    
+    async def send_photo(self, *args, **kwargs):
+        async with telegram_limiter:
+            return await super().send_photo(*args, **kwargs)
+    
+    async def send_voice(self, *args, **kwargs):
+        async with telegram_limiter:
+            return await super().send_voice(*args, **kwargs)
+    
+    async def edit_message_text(self, *args, **kwargs):
+        async with telegram_limiter:
+            return await super().edit_message_text(*args, **kwargs)
 
 
 # Create bot instance
-bot = AsyncTeleBot(TELEGRAM_BOT_TOKEN, parse_mode='Markdown')
+bot = PacedTeleBot(TELEGRAM_BOT_TOKEN, parse_mode='Markdown')
+
+# Telegram file download URL prefix (append file_info.file_path)
+TELEGRAM_FILE_URL_PREFIX = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/"
+
+# Runs handler coroutines on a bounded worker pool, cheapest first
+handler_scheduler = PriorityScheduler(MAX_CONCURRENT_HANDLERS)
+
+
+def bounded_handler(priority: int = PRIORITY_COMMAND):
+    """Decorator that runs a message handler through handler_scheduler."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            return await handler_scheduler.submit(
+                lambda: handler(*args, **kwargs),
+                priority
+            )
+        return wrapper
+    return decorator
 
 logger.info("Bot instance created")
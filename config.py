@@ -18,6 +18,12 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN is not set in .env file")
 
+# Webhook: если WEBHOOK_URL пуст, бот получает обновления через long polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Публичный HTTPS-адрес, например https://example.com/webhook
+WEBHOOK_LISTEN_HOST = os.getenv("WEBHOOK_LISTEN_HOST", "0.0.0.0")
+WEBHOOK_LISTEN_PORT = int(os.getenv("WEBHOOK_LISTEN_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")  # Заголовок X-Telegram-Bot-Api-Secret-Token; если пуст - случайный на каждый запуск
+
 # ==================== API CONFIGURATION ====================
 # Выбор провайдера AI: "yandex", "openai", "proxyapi"
 API_PROVIDER = os.getenv("API_PROVIDER", "yandex").lower()
@@ -89,9 +95,12 @@ DATA_DIR = BASE_DIR / "data"
 DOCUMENTS_DIR = DATA_DIR / "documents"
 EMBEDDINGS_DB = DATA_DIR / "embeddings.db"
 
-# Create directories if they don't exist
-DATA_DIR.mkdir(exist_ok=True)
-DOCUMENTS_DIR.mkdir(exist_ok=True)
+
+def ensure_dirs() -> None:
+    """Create data directories if they don't exist (called once at startup)."""
+    DATA_DIR.mkdir(exist_ok=True)
+    DOCUMENTS_DIR.mkdir(exist_ok=True)
+
 
 # Logging Configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -102,11 +111,31 @@ LOG_FILE = BASE_DIR / "bot.log"
 RAG_CHUNK_SIZE = 1500  # Увеличено для целостности таблиц
 RAG_CHUNK_OVERLAP = 300  # Больше overlap для связности
 RAG_TOP_K = 5  # Больше результатов для полноты ответа
+RAG_EMBEDDING_BATCH_SIZE = 256  # Чанков на один запрос к API эмбеддингов
+RAG_EMBEDDING_CONCURRENCY = 4  # Параллельных запросов эмбеддингов при индексации
+RAG_INDEX_PROCESSES = int(os.getenv("RAG_INDEX_PROCESSES", str(os.cpu_count() or 1)))  # Процессов для разбора документов
+SUPPORTED_DOCUMENT_EXTENSIONS = ('.pdf', '.txt', '.md')
+RAG_CACHE_SIZE = 512  # Закэшированных ответов RAG
+RAG_CACHE_TTL = 3600  # Время жизни ответа в кэше, секунды
+RAG_CACHE_SIMILARITY = 0.97  # Порог косинусной близости для семантического попадания
+RAG_COMPRESS = os.getenv("RAG_COMPRESS", "false").lower() == "true"  # Сжатие контекста перед отправкой в LLM
+RAG_COMPRESS_RATIO = 0.5  # Целевая доля символов чанка после сжатия
+RAG_EMBED_BATCH_MAX = 32  # Запросов пользователей в одном запросе эмбеддингов
+RAG_EMBED_BATCH_WINDOW = 0.015  # Окно сбора запросов в пакет, секунды
+RAG_QUERY_EMBEDDING_CACHE_SIZE = 1024  # Запомненных эмбеддингов запросов
 
 # OpenAI Settings
 TEMPERATURE = 0.7
 MAX_TOKENS = 1500
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "60"))  # Requests per minute for outbound OpenAI calls
+TELEGRAM_SEND_RATE = int(os.getenv("TELEGRAM_SEND_RATE", "30"))  # Outgoing Telegram messages per second (Bot API cap)
+HTTP_RETRY_ATTEMPTS = int(os.getenv("HTTP_RETRY_ATTEMPTS", "5"))  # Attempts per request on 429/5xx and connection errors
+HTTP_RETRY_MAX_DELAY = 30.0  # Upper bound for a single backoff pause, seconds
 
 # User session settings
 MAX_HISTORY_LENGTH = 10  # Maximum number of messages to keep in history
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))  # Users whose state is kept in memory (LRU)
+
+# Concurrency settings
+MAX_CONCURRENT_HANDLERS = int(os.getenv("MAX_CONCURRENT_HANDLERS", "32"))  # Handler coroutines running at once
 
@@ -15,6 +15,11 @@ from services.image_generation import (
     generate_image_variations
 )
 from utils.logging import logger
+from utils.http import close_http_session
+
+
+# Максимум одновременных запросов к DALL-E в примере 4
+MAX_CONCURRENT_GENERATIONS = 4
 
 
 async def example_1_detect_intent():
@@ -102,7 +107,10 @@ async def example_3_generate_with_params():
 
 async def example_4_multiple_generations():
     """
-    Пример 4: Генерация нескольких изображений по очереди.
+    Пример 4: Параллельная генерация нескольких изображений.
+    
+    Одновременно выполняется не более MAX_CONCURRENT_GENERATIONS запросов,
+    темп обращений к API задает общий openai_limiter внутри generate_image.
     """
     print("\n" + "="*60)
     print("Пример 4: Множественная генерация")
@@ -114,23 +122,29 @@ async def example_4_multiple_generations():
         "A golden sunset over mountains"
     ]
     
-    for i, prompt in enumerate(prompts, 1):
-        print(f"\n[{i}/{len(prompts)}] Генерация: {prompt}")
-        
-        try:
-            result = await generate_image(
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+    
+    async def generate_one(prompt: str):
+        async with semaphore:
+            return await generate_image(
                 prompt=prompt,
                 size="1024x1024",
                 quality="standard"
             )
-            print(f"  ✅ Создано: {result['image_path']}")
-            
-        except Exception as e:
-            print(f"  ❌ Ошибка: {e}")
-        
-        # Небольшая задержка между запросами
-        if i < len(prompts):
-            await asyncio.sleep(2)
+    
+    for i, prompt in enumerate(prompts, 1):
+        print(f"\n[{i}/{len(prompts)}] Генерация: {prompt}")
+    
+    results = await asyncio.gather(
+        *(generate_one(prompt) for prompt in prompts),
+        return_exceptions=True
+    )
+    
+    for i, result in enumerate(results, 1):
+        if isinstance(result, Exception):
+            print(f"  [{i}] ❌ Ошибка: {result}")
+        else:
+            print(f"  [{i}] ✅ Создано: {result['image_path']}")
 
 
 async def example_5_variations():
@@ -229,6 +243,18 @@ async def example_7_error_handling():
             print(f"     Сообщение: {str(e)[:100]}")
 
 
+async def warmup_openai_client():
+    """
+    Прогрев соединения с OpenAI, пока пользователь выбирает пример.
+    """
+    from services.openai_client import openai_client
+    
+    try:
+        await openai_client.client.models.list()
+    except Exception as e:
+        logger.debug(f"Прогрев клиента OpenAI не удался: {e}")
+
+
 async def main():
     """
     Главная функция для запуска примеров.
@@ -253,23 +279,35 @@ async def main():
     print("  0. Запустить все примеры")
     print("  q. Выход")
     
-    choice = input("\nВыберите пример (или 'q' для выхода): ").strip()
+    # Прогреваем клиент, пока ждем ввода (input не блокирует event loop)
+    warmup = asyncio.create_task(warmup_openai_client())
+    
+    choice = (await asyncio.get_running_loop().run_in_executor(
+        None, input, "\nВыберите пример (или 'q' для выхода): "
+    )).strip()
     
     if choice == 'q':
+        warmup.cancel()
         print("Выход...")
         return
     
-    if choice == '0':
-        print("\nЗапуск всех примеров...\n")
-        for name, func in examples.values():
+    await warmup
+    
+    try:
+        if choice == '0':
+            print("\nЗапуск всех примеров...\n")
+            for name, func in examples.values():
+                await func()
+                await asyncio.sleep(1)
+        elif choice in examples:
+            name, func = examples[choice]
+            print(f"\nЗапуск: {name}\n")
             await func()
-            await asyncio.sleep(1)
-    elif choice in examples:
-        name, func = examples[choice]
-        print(f"\nЗапуск: {name}\n")
-        await func()
-    else:
-        print("❌ Неверный выбор")
+        else:
+            print("❌ Неверный выбор")
+    finally:
+        # Общая HTTP-сессия создается при первом запросе к DALL-E
+        await close_http_session()
     
     print("\n" + "="*60)
     print("Примеры завершены!")
@@ -3,12 +3,14 @@ Document Upload Handler (Optional).
 Allows users to upload documents directly through the bot using pyTelegramBotAPI.
 """
 
+import asyncio
 from telebot import types
 from pathlib import Path
 
-from bot import bot
+from bot import bot, TELEGRAM_FILE_URL_PREFIX
 from config import DOCUMENTS_DIR, API_PROVIDER
 from utils.logging import logger
+from utils.http import download_to_file
 
 # Условные импорты в зависимости от провайдера
 if API_PROVIDER == "yandex":
@@ -17,6 +19,16 @@ else:
     from rag.index import vector_index as rag_index
     from rag.loader import document_loader
 
+# Maximum upload size (Telegram Bot API download limit)
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024  # 20 MB
+
+# Document types accepted for indexing
+SUPPORTED_MIME_TYPES = frozenset({
+    'application/pdf',
+    'text/plain',
+    'text/markdown'
+})
+
 
 # This handler is included but currently the main document handler 
 # in image.py provides basic functionality. This can be enhanced later.
@@ -26,13 +38,7 @@ async def process_document_upload(message: types.Message, document: types.Docume
     user_id = message.from_user.id
     
     # Check file type
-    supported_types = [
-        'application/pdf',
-        'text/plain',
-        'text/markdown'
-    ]
-    
-    if document.mime_type not in supported_types:
+    if document.mime_type not in SUPPORTED_MIME_TYPES:
         await bot.send_message(
             message.chat.id,
             f"❌ Неподдерживаемый тип файла: {document.mime_type}\n\n"
@@ -44,8 +50,7 @@ async def process_document_upload(message: types.Message, document: types.Docume
         return
     
     # Check file size (max 20 MB)
-    max_size = 20 * 1024 * 1024  # 20 MB
-    if document.file_size > max_size:
+    if document.file_size > MAX_UPLOAD_SIZE:
         await bot.send_message(
             message.chat.id,
             f"❌ Файл слишком большой: {document.file_size / 1024 / 1024:.1f} MB\n"
@@ -56,32 +61,32 @@ async def process_document_upload(message: types.Message, document: types.Docume
     try:
         await bot.send_message(message.chat.id, "⏳ Загружаю документ...")
         
-        # Download file
+        # Stream file straight to disk
         file_info = await bot.get_file(document.file_id)
-        file_bytes = await bot.download_file(file_info.file_path)
         file_path = DOCUMENTS_DIR / document.file_name
         
-        # Save file
-        with open(file_path, 'wb') as f:
-            f.write(file_bytes)
+        await download_to_file(
+            TELEGRAM_FILE_URL_PREFIX + file_info.file_path,
+            file_path,
+            max_size=MAX_UPLOAD_SIZE
+        )
         
-        logger.info(f"User {user_id} uploaded document: {document.file_name}")
+        logger.info("User %s uploaded document: %s", user_id, document.file_name)
         
         # Index document
         await bot.send_message(message.chat.id, "📄 Индексирую документ...")
         
         # Load and chunk document
         if API_PROVIDER == "yandex":
-            # Для Yandex просто переиндексируем всю директорию
-            count = rag_index.index_documents_directory(force_reindex=True)
-            chunks_count = count
+            # Для Yandex индексируем только новый файл
+            chunks_count = await rag_index.aindex_single_document(file_path)
         else:
-            # Для OpenAI используем loader
-            chunks = document_loader.load_document(file_path)
-            rag_index.add_documents(chunks)
+            # Для OpenAI используем loader (парсинг вне event loop)
+            chunks = await document_loader.aload_document(file_path)
+            await asyncio.to_thread(rag_index.add_documents, chunks)
             chunks_count = len(chunks)
         
-        logger.info(f"Indexed {chunks_count} chunks from {document.file_name}")
+        logger.info("Indexed %s chunks from %s", chunks_count, document.file_name)
         
         # Success message
         await bot.send_message(
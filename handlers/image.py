@@ -3,19 +3,71 @@ Image Handler.
 Handles image analysis with GPT-4 Vision using pyTelegramBotAPI.
 """
 
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from telebot import types
-from bot import bot
+from bot import bot, bounded_handler, TELEGRAM_FILE_URL_PREFIX
+from services.scheduler import PRIORITY_VISION
 from services.router import route_image_request
 from utils.logging import logger
-from utils.helpers import cleanup_file
+from utils.helpers import user_sessions
+from utils.http import get_http_session
+
+
+# Static replies for documents sent to the bot
+PDF_DOCUMENT_TEXT = (
+    "📄 PDF документ получен!\n\n"
+    "Для добавления документов в базу знаний:\n"
+    "1. Скачайте документ\n"
+    "2. Поместите его в папку `data/documents/`\n"
+    "3. Перезапустите бота или используйте команду индексации\n"
+    "4. Переключитесь в режим RAG: /mode rag\n\n"
+    "⚠️ Автоматическая загрузка документов будет добавлена в следующей версии."
+)
+IMAGE_DOCUMENT_TEXT = (
+    "📸 Получено изображение в виде документа.\n"
+    "Отправьте изображение как фото для анализа."
+)
+DOCUMENT_REPLIES = {
+    "application/pdf": PDF_DOCUMENT_TEXT,
+}
+
+# Vision results keyed by (file_unique_id, caption); identical photos share file_unique_id
+VISION_CACHE_SIZE = 1024
+VISION_CACHE_TTL = 3600  # seconds
+_vision_cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+
+
+def _get_cached_analysis(key: Tuple[str, str]) -> Optional[str]:
+    """Return cached analysis text, dropping it if expired."""
+    entry = _vision_cache.get(key)
+    if entry is None:
+        return None
+    stored_at, text = entry
+    if time.monotonic() - stored_at > VISION_CACHE_TTL:
+        del _vision_cache[key]
+        return None
+    _vision_cache.move_to_end(key)
+    return text
+
+
+def _cache_analysis(key: Tuple[str, str], text: str):
+    """Store analysis text, evicting the least recently used entry."""
+    _vision_cache[key] = (time.monotonic(), text)
+    _vision_cache.move_to_end(key)
+    if len(_vision_cache) > VISION_CACHE_SIZE:
+        _vision_cache.popitem(last=False)
 
 
 @bot.message_handler(content_types=['photo'])
+@bounded_handler(PRIORITY_VISION)
 async def handle_photo_message(message: types.Message):
     """Handle photo messages."""
     user_id = message.from_user.id
     
-    logger.info(f"Photo message from user {user_id}")
+    logger.info("Photo message from user %s", user_id)
     
     # Show typing indicator
     await bot.send_chat_action(message.chat.id, 'typing')
@@ -27,32 +79,52 @@ async def handle_photo_message(message: types.Message):
         # Get caption if provided
         caption = message.caption
         
+        # Same photo and question already analyzed: reply from cache
+        cache_key = (photo.file_unique_id, caption or "")
+        cached = _get_cached_analysis(cache_key)
+        if cached is not None:
+            logger.debug("Vision cache hit for user %s", user_id)
+            context = "[Пользователь отправил изображение]"
+            if caption:
+                context += f" с подписью: {caption}"
+            user_sessions.add_message(user_id, "user", context)
+            user_sessions.add_message(user_id, "assistant", cached)
+            await bot.send_message(
+                message.chat.id,
+                f"🔍 **Анализ изображения:**\n\n{cached}"
+            )
+            return
+        
         # Get file URL (for Vision API)
         file_info = await bot.get_file(photo.file_id)
-        file_url = f"https://api.telegram.org/file/bot{bot.token}/{file_info.file_path}"
+        file_url = TELEGRAM_FILE_URL_PREFIX + file_info.file_path
         
-        logger.debug(f"Image URL: {file_url}")
+        logger.debug("Image URL: %s", file_url)
         
-        # Notify user
+        # Notify user (this message is replaced with the result)
         if caption:
-            await bot.send_message(
+            status_message = await bot.send_message(
                 message.chat.id,
                 f"📸 Анализирую изображение с вопросом:\n_{caption}_"
             )
         else:
-            await bot.send_message(message.chat.id, "📸 Анализирую изображение...")
+            status_message = await bot.send_message(message.chat.id, "📸 Анализирую изображение...")
         
         # Process image request
         response = await route_image_request(
             user_id=user_id,
             image_url=file_url,
-            caption=caption
+            caption=caption,
+            session=get_http_session()
         )
+        if "error" not in response:
+            _cache_analysis(cache_key, response['text'])
         
-        # Send analysis result
-        await bot.send_message(
-            message.chat.id,
-            f"🔍 **Анализ изображения:**\n\n{response['text']}"
+        # Replace status message with analysis result
+        await bot.edit_message_text(
+            f"🔍 **Анализ изображения:**\n\n{response['text']}",
+            chat_id=message.chat.id,
+            message_id=status_message.message_id
         )
     
     except Exception as e:
@@ -65,36 +137,23 @@ async def handle_photo_message(message: types.Message):
 
 
 @bot.message_handler(content_types=['document'])
+@bounded_handler()
 async def handle_document_message(message: types.Message):
     """Handle document messages (could be PDFs for RAG)."""
-    user_id = message.from_user.id
     document = message.document
+    mime_type = document.mime_type or ""
     
     # Check if it's a supported document type
-    if document.mime_type == "application/pdf":
-        await bot.send_message(
-            message.chat.id,
-            "📄 PDF документ получен!\n\n"
-            "Для добавления документов в базу знаний:\n"
-            "1. Скачайте документ\n"
-            "2. Поместите его в папку `data/documents/`\n"
-            "3. Перезапустите бота или используйте команду индексации\n"
-            "4. Переключитесь в режим RAG: /mode rag\n\n"
-            "⚠️ Автоматическая загрузка документов будет добавлена в следующей версии."
-        )
-    elif document.mime_type and document.mime_type.startswith("image/"):
-        # Handle as image
-        await bot.send_message(
-            message.chat.id,
-            "📸 Получено изображение в виде документа.\n"
-            "Отправьте изображение как фото для анализа."
-        )
-    else:
-        await bot.send_message(
-            message.chat.id,
+    reply = DOCUMENT_REPLIES.get(mime_type)
+    if reply is None and mime_type.startswith("image/"):
+        reply = IMAGE_DOCUMENT_TEXT
+    if reply is None:
+        reply = (
             f"ℹ️ Получен файл: {document.file_name}\n"
             f"Тип: {document.mime_type}\n\n"
             "Поддерживаемые типы для анализа:\n"
             "• Изображения (отправляйте как фото)\n"
             "• PDF документы (для базы знаний)"
         )
+    
+    await bot.send_message(message.chat.id, reply)
@@ -4,13 +4,14 @@ Handles /start and /help commands using pyTelegramBotAPI.
 """
 
 from telebot import types
-from bot import bot
+from bot import bot, bounded_handler
 from utils.logging import logger
 from utils.helpers import user_sessions
 from config import BotMode, DEFAULT_MODE
 
 
 @bot.message_handler(commands=['start'])
+@bounded_handler()
 async def cmd_start(message: types.Message):
     """Handle /start command."""
     user_id = message.from_user.id
@@ -52,6 +53,7 @@ async def cmd_start(message: types.Message):
 
 
 @bot.message_handler(commands=['help'])
+@bounded_handler()
 async def cmd_help(message: types.Message):
     """Handle /help command."""
     user_id = message.from_user.id
@@ -127,6 +129,7 @@ async def cmd_help(message: types.Message):
 
 
 @bot.message_handler(commands=['reset'])
+@bounded_handler()
 async def cmd_reset(message: types.Message):
     """Handle /reset command - clear conversation history."""
     user_id = message.from_user.id
@@ -142,6 +145,7 @@ async def cmd_reset(message: types.Message):
 
 
 @bot.message_handler(commands=['stats'])
+@bounded_handler()
 async def cmd_stats(message: types.Message):
     """Handle /stats command - show knowledge base statistics."""
     user_id = message.from_user.id
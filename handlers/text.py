@@ -4,14 +4,17 @@ Handles regular text messages from users using pyTelegramBotAPI.
 """
 
 from telebot import types
-from bot import bot
-from services.router import route_text_request
+from bot import bot, bounded_handler
+from services.scheduler import PRIORITY_GENERATION, PRIORITY_TEXT
+from services.router import route_text_request, route_image_generation_request
+from services.tts import generate_voice_response
 from utils.logging import logger
-from utils.helpers import user_sessions
+from utils.helpers import user_sessions, cleanup_file_async, truncate_text, CAPTION_MAX_LENGTH
 from config import BotMode
 
 
 @bot.message_handler(commands=['mode'])
+@bounded_handler()
 async def cmd_mode(message: types.Message):
     """Handle /mode command - change bot mode."""
     user_id = message.from_user.id
@@ -74,6 +77,7 @@ async def cmd_mode(message: types.Message):
 
 
 @bot.message_handler(commands=['image'])
+@bounded_handler(PRIORITY_GENERATION)
 async def cmd_image(message: types.Message):
     """Handle /image command - generate image with specific parameters."""
     user_id = message.from_user.id
@@ -109,9 +113,6 @@ async def cmd_image(message: types.Message):
     
     try:
         # Generate image directly
-        from services.router import route_image_generation_request
-        from utils.helpers import cleanup_file
-        
         response = await route_image_generation_request(
             user_id=user_id,
             prompt=prompt,
@@ -128,9 +129,7 @@ async def cmd_image(message: types.Message):
             image_path = response['image_path']
             try:
                 with open(image_path, 'rb') as photo:
-                    caption = response.get('revised_prompt', '')
-                    if len(caption) > 1024:
-                        caption = caption[:1021] + "..."
+                    caption = truncate_text(response.get('revised_prompt', ''), CAPTION_MAX_LENGTH)
                     
                     await bot.send_photo(
                         message.chat.id,
@@ -138,7 +137,7 @@ async def cmd_image(message: types.Message):
                         caption=caption if caption else None
                     )
             finally:
-                cleanup_file(image_path)
+                await cleanup_file_async(image_path)
     
     except Exception as e:
         logger.error(f"Error in /image command: {e}", exc_info=True)
@@ -150,6 +149,7 @@ async def cmd_image(message: types.Message):
 
 
 @bot.message_handler(func=lambda message: message.content_type == 'text' and not message.text.startswith('/'))
+@bounded_handler(PRIORITY_TEXT)
 async def handle_text_message(message: types.Message):
     """Handle regular text messages."""
     user_id = message.from_user.id
@@ -170,7 +170,6 @@ async def handle_text_message(message: types.Message):
             await bot.send_message(message.chat.id, response["text"])
             
             # Then send the generated image
-            from utils.helpers import cleanup_file
             image_path = response['image_path']
             
             try:
@@ -179,9 +178,7 @@ async def handle_text_message(message: types.Message):
                 
                 # Send image
                 with open(image_path, 'rb') as photo:
-                    caption = response.get('revised_prompt', '')
-                    if len(caption) > 1024:
-                        caption = caption[:1021] + "..."
+                    caption = truncate_text(response.get('revised_prompt', ''), CAPTION_MAX_LENGTH)
                     
                     await bot.send_photo(
                         message.chat.id, 
@@ -193,7 +190,7 @@ async def handle_text_message(message: types.Message):
                 
             finally:
                 # Cleanup generated image file
-                cleanup_file(image_path)
+                await cleanup_file_async(image_path)
             
             return
         
@@ -202,9 +199,6 @@ async def handle_text_message(message: types.Message):
         
         if mode == BotMode.VOICE:
             # Generate voice response
-            from services.tts import generate_voice_response
-            from utils.helpers import cleanup_file
-            
             voice_path = await generate_voice_response(
                 response["text"],
                 voice=user_sessions.get_voice(user_id)
@@ -220,7 +214,7 @@ async def handle_text_message(message: types.Message):
                 
             finally:
                 # Cleanup
-                cleanup_file(voice_path)
+                await cleanup_file_async(voice_path)
         else:
             # Send text response
             await bot.send_message(message.chat.id, response["text"])
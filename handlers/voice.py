@@ -3,16 +3,40 @@ Voice Message Handler.
 Handles voice messages with STT and TTS using pyTelegramBotAPI.
 """
 
+import asyncio
+
 from telebot import types
-from bot import bot
-from services.router import route_voice_request
-from services.tts import get_available_voices, get_voice_info
+from bot import bot, bounded_handler
+from services.scheduler import PRIORITY_VISION
+from services.router import route_voice_request_bytes
+from services.tts import VOICE_INFO, get_available_voices
 from utils.logging import logger
-from utils.helpers import user_sessions, save_file_async, cleanup_files
+from utils.helpers import user_sessions, cleanup_files_async, truncate_text, CAPTION_MAX_LENGTH
 from config import VoiceType
 
 
+# Voice descriptions are static, so replies are formatted once at import
+VOICE_LIST = get_available_voices()
+VOICE_CARDS = {
+    voice: f"🔊 {info['name']} ({voice})\nТип: {info['type']}\n{info['description']}"
+    for voice, info in VOICE_INFO.items()
+}
+CURRENT_VOICE_TEXTS = {
+    voice: (
+        f"🔊 **Текущий голос:** {info['name']} ({voice})\n"
+        f"Тип: {info['type']}\n\n"
+        f"{VOICE_LIST}\n"
+        f"**Использование:**\n"
+        f"/voice <название>\n\n"
+        f"**Пример:**\n"
+        f"/voice nova"
+    )
+    for voice, info in VOICE_INFO.items()
+}
+
+
 @bot.message_handler(commands=['voice'])
+@bounded_handler()
 async def cmd_voice(message: types.Message):
     """Handle /voice command - change TTS voice."""
     user_id = message.from_user.id
@@ -23,34 +47,17 @@ async def cmd_voice(message: types.Message):
     if len(args) < 2:
         # Show current voice and available voices
         current_voice = user_sessions.get_voice(user_id)
-        current_info = get_voice_info(current_voice)
-        
-        voice_list = get_available_voices()
         
         await bot.send_message(
             message.chat.id,
-            f"🔊 **Текущий голос:** {current_info['name']} ({current_voice})\n"
-            f"Тип: {current_info['type']}\n\n"
-            f"{voice_list}\n"
-            f"**Использование:**\n"
-            f"/voice <название>\n\n"
-            f"**Пример:**\n"
-            f"/voice nova"
+            CURRENT_VOICE_TEXTS.get(current_voice, CURRENT_VOICE_TEXTS[VoiceType.ALLOY])
         )
         return
     
     # Set new voice
     new_voice = args[1].lower()
-    valid_voices = [
-        VoiceType.ALLOY,
-        VoiceType.ECHO,
-        VoiceType.NOVA,
-        VoiceType.FABLE,
-        VoiceType.ONYX,
-        VoiceType.SHIMMER
-    ]
     
-    if new_voice not in valid_voices:
+    if new_voice not in VOICE_CARDS:
         await bot.send_message(
             message.chat.id,
             f"❌ Неизвестный голос: `{new_voice}`\n\n"
@@ -59,52 +66,47 @@ async def cmd_voice(message: types.Message):
         return
     
     user_sessions.set_voice(user_id, new_voice)
-    logger.info(f"User {user_id} switched to voice: {new_voice}")
-    
-    voice_info = get_voice_info(new_voice)
+    logger.info("User %s switched to voice: %s", user_id, new_voice)
     
     await bot.send_message(
         message.chat.id,
-        f"✅ Голос изменен!\n\n"
-        f"🔊 {voice_info['name']} ({new_voice})\n"
-        f"Тип: {voice_info['type']}\n"
-        f"{voice_info['description']}"
+        f"✅ Голос изменен!\n\n{VOICE_CARDS[new_voice]}"
     )
 
 
 @bot.message_handler(commands=['voices'])
+@bounded_handler()
 async def cmd_voices(message: types.Message):
     """Handle /voices command - list all available voices."""
-    voice_list = get_available_voices()
-    await bot.send_message(message.chat.id, voice_list)
+    await bot.send_message(message.chat.id, VOICE_LIST)
+
+
+async def _download_voice(file_id: str) -> bytes:
+    """Download a voice message into memory."""
+    file_info = await bot.get_file(file_id)
+    return await bot.download_file(file_info.file_path)
 
 
 @bot.message_handler(content_types=['voice'])
+@bounded_handler(PRIORITY_VISION)
 async def handle_voice_message(message: types.Message):
     """Handle voice messages."""
     user_id = message.from_user.id
     
-    logger.info(f"Voice message from user {user_id}")
+    logger.info("Voice message from user %s", user_id)
     
-    # Show typing indicator
-    await bot.send_chat_action(message.chat.id, 'typing')
-    
-    voice_file_path = None
     audio_response_path = None
     image_path = None
     
     try:
-        # Download voice message
-        file_info = await bot.get_file(message.voice.file_id)
-        voice_bytes = await bot.download_file(file_info.file_path)
-        
-        # Save to temporary file
-        voice_file_path = await save_file_async(voice_bytes, "ogg")
-        
-        logger.debug(f"Voice file saved: {voice_file_path}")
+        # Show typing indicator while the voice message downloads
+        _, voice_bytes = await asyncio.gather(
+            bot.send_chat_action(message.chat.id, 'typing'),
+            _download_voice(message.voice.file_id)
+        )
         
-        # Process voice request
-        response = await route_voice_request(user_id, voice_file_path)
+        # Process voice request straight from memory
+        response = await route_voice_request_bytes(user_id, voice_bytes)
         
         # Check for errors
         if 'error' in response:
@@ -114,17 +116,15 @@ async def handle_voice_message(message: types.Message):
             )
             return
         
-        # Send transcription if available
+        # Combine transcription and answer into a single reply
+        reply_text = response["text"]
         if 'transcription' in response:
-            await bot.send_message(
-                message.chat.id,
-                f"🎤 **Распознано:**\n_{response['transcription']}_\n"
-            )
+            reply_text = f"🎤 **Распознано:**\n_{response['transcription']}_\n\n{reply_text}"
         
         # Check if response contains an image
         if response.get('has_image') and response.get('image_path'):
             # Send text response first
-            await bot.send_message(message.chat.id, response["text"])
+            await bot.send_message(message.chat.id, reply_text)
             
             # Then send the generated image
             image_path = response['image_path']
@@ -133,11 +133,9 @@ async def handle_voice_message(message: types.Message):
                 # Show uploading photo action
                 await bot.send_chat_action(message.chat.id, 'upload_photo')
                 
-                # Send image
+                # Send image; aiohttp streams the open file in chunks
                 with open(image_path, 'rb') as photo:
-                    caption = response.get('revised_prompt', '')
-                    if len(caption) > 1024:
-                        caption = caption[:1021] + "..."
+                    caption = truncate_text(response.get('revised_prompt', ''), CAPTION_MAX_LENGTH)
                     
                     await bot.send_photo(
                         message.chat.id, 
@@ -145,7 +143,7 @@ async def handle_voice_message(message: types.Message):
                         caption=caption if caption else None
                     )
                 
-                logger.info(f"Image sent to user {user_id} (from voice message)")
+                logger.info("Image sent to user %s (from voice message)", user_id)
                 
             except Exception as img_error:
                 logger.error(f"Error sending image: {img_error}")
@@ -156,7 +154,7 @@ async def handle_voice_message(message: types.Message):
         await bot.send_chat_action(message.chat.id, 'record_voice')
         
         # Send text response
-        await bot.send_message(message.chat.id, response["text"])
+        await bot.send_message(message.chat.id, reply_text)
         
         # Send voice response
         audio_response_path = response.get("voice_path")
@@ -174,10 +172,11 @@ async def handle_voice_message(message: types.Message):
     
     finally:
         # Cleanup temporary files
-        cleanup_files(voice_file_path, audio_response_path, image_path)
+        await cleanup_files_async(audio_response_path, image_path)
 
 
 @bot.message_handler(content_types=['audio'])
+@bounded_handler()
 async def handle_audio_message(message: types.Message):
     """Handle audio files (similar to voice)."""
     await bot.send_message(
@@ -6,25 +6,36 @@ Starts the Telegram bot using pyTelegramBotAPI.
 import asyncio
 import sys
 
-from bot import bot
+from bot import bot, handler_scheduler
+from config import ensure_dirs, WEBHOOK_URL, API_PROVIDER
 from utils.logging import logger
+from utils.http import close_http_session
 
 
-async def setup_bot():
-    """Setup bot with handlers and initialize RAG if needed."""
-    logger.info("Bot starting up...")
-    
-    # Import handlers (they will register themselves via decorators)
+async def _import_handlers():
+    """Import handlers (they will register themselves via decorators)."""
     try:
         from handlers import start, text, voice, image, document_upload
         logger.info("Handlers imported successfully")
     except Exception as e:
         logger.error(f"Error importing handlers: {e}", exc_info=True)
         raise
-    
-    # Initialize RAG index if documents exist
+
+
+async def _warm_bot_info():
+    """Fetch bot info, warming up the Telegram API session."""
     try:
-        from config import DOCUMENTS_DIR, API_PROVIDER
+        bot_info = await bot.get_me()
+        logger.info(f"Bot started: @{bot_info.username}")
+    except Exception as e:
+        logger.error(f"Could not get bot info: {e}")
+
+
+async def _rebuild_rag_index_if_needed():
+    """Initialize RAG index if documents exist."""
+    try:
+        from config import DOCUMENTS_DIR, SUPPORTED_DOCUMENT_EXTENSIONS
+        from utils.helpers import iter_files
         
         # Выбираем индекс в зависимости от провайдера
         if API_PROVIDER == "yandex":
@@ -35,24 +46,36 @@ async def setup_bot():
             logger.info(f"Using vector index (OpenAI)")
         
         # Check if documents directory has files
-        docs = list(DOCUMENTS_DIR.glob('*'))
-        docs = [d for d in docs if d.is_file() and d.suffix in ['.pdf', '.txt', '.md']]
+        docs = await asyncio.to_thread(
+            lambda: list(iter_files(DOCUMENTS_DIR, SUPPORTED_DOCUMENT_EXTENSIONS, recursive=False))
+        )
         
         if docs:
             logger.info(f"Found {len(docs)} documents, indexing...")
-            count = rag_index.index_documents_directory(force_reindex=False)
+            count = await rag_index.aindex_documents_directory(force_reindex=False)
             logger.info(f"Indexed {count} document chunks")
         else:
             logger.info("No documents found in data/documents/")
     
     except Exception as e:
         logger.warning(f"Could not initialize RAG index: {e}")
+
+
+async def setup_bot():
+    """Setup bot: import handlers, fetch bot info and build RAG index concurrently."""
+    logger.info("Bot starting up...")
     
-    try:
-        bot_info = await bot.get_me()
-        logger.info(f"Bot started: @{bot_info.username}")
-    except Exception as e:
-        logger.error(f"Could not get bot info: {e}")
+    # Steps are independent, so startup takes as long as the slowest one
+    results = await asyncio.gather(
+        _import_handlers(),
+        _warm_bot_info(),
+        _rebuild_rag_index_if_needed(),
+        return_exceptions=True
+    )
+    
+    # Handlers are required; the other steps only log their failures
+    if isinstance(results[0], BaseException):
+        raise results[0]
 
 
 async def shutdown_bot():
@@ -62,22 +85,48 @@ async def shutdown_bot():
         await bot.close_session()
     except:
         pass
+    try:
+        await handler_scheduler.shutdown()
+    except Exception as e:
+        logger.warning(f"Could not stop handler scheduler: {e}")
+    try:
+        await close_http_session()
+    except Exception as e:
+        logger.warning(f"Could not close HTTP session: {e}")
+    if API_PROVIDER != "yandex":
+        try:
+            from services.openai_client import openai_client
+            await openai_client.close()
+        except Exception as e:
+            logger.warning(f"Could not close OpenAI client: {e}")
     logger.info("Bot shutdown complete")
 
 
 async def main():
     """Main function to run the bot."""
     try:
+        # Data directories must exist before handlers and indexes load
+        ensure_dirs()
+        
         # Setup bot
         await setup_bot()
         
-        # Start polling
-        logger.info("Starting bot polling...")
-        await bot.infinity_polling(
-            timeout=10,
-            skip_pending=True
-        )
-        
+        if WEBHOOK_URL:
+            # Telegram pushes updates, no polling round-trips
+            from webhook import run_webhook
+            logger.info("Starting webhook server...")
+            await run_webhook()
+        else:
+            # A webhook left from an earlier run makes getUpdates fail with 409 Conflict
+            await bot.delete_webhook()
+            
+            # Start polling
+            logger.info("Starting bot polling...")
+            await bot.infinity_polling(
+                timeout=10,
+                skip_pending=True
+            )
+    
     except KeyboardInterrupt:
         logger.info("Bot stopped by user (Ctrl+C)")
     except Exception as e:
@@ -0,0 +1,114 @@
+"""
+Embedding Batcher for RAG.
+Coalesces concurrent query embeddings into one embeddings request.
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from config import RAG_EMBED_BATCH_MAX, RAG_EMBED_BATCH_WINDOW, RAG_QUERY_EMBEDDING_CACHE_SIZE
+from utils.logging import logger
+
+
+class EmbeddingBatcher:
+    """
+    Collects queries for a short window and embeds them in one call.
+    
+    Embeddings of recent query texts are kept in an LRU cache, so a repeated
+    question skips the embeddings request.
+    """
+    
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        max_batch: int = RAG_EMBED_BATCH_MAX,
+        window: float = RAG_EMBED_BATCH_WINDOW,
+        cache_size: int = RAG_QUERY_EMBEDDING_CACHE_SIZE
+    ):
+        """
+        Initialize the batcher.
+        
+        Args:
+            embed_fn: Blocking function embedding a list of texts
+            max_batch: Maximum texts per embeddings request
+            window: Seconds to wait for more queries after the first one
+            cache_size: Query embeddings to remember, 0 disables caching
+        """
+        self.embed_fn = embed_fn
+        self.max_batch = max_batch
+        self.window = window
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def _ensure_worker(self):
+        """Start the worker task on first use (requires a running loop)."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._worker())
+    
+    async def _worker(self):
+        """Drain queued queries in batches."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = await asyncio.to_thread(self.embed_fn, texts)
+            except Exception as e:
+                logger.error("Error embedding batch of %s queries: %s", len(texts), e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            logger.debug("Embedded batch of %s queries", len(texts))
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+    
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a query, sharing the request with concurrent callers.
+        
+        Args:
+            text: Query text
+        
+        Returns:
+            Query embedding
+        """
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            return cached
+        
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        embedding = await future
+        
+        if self.cache_size > 0:
+            self._cache[text] = embedding
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return embedding
+    
+    async def shutdown(self):
+        """Cancel the worker task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._queue = None
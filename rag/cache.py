@@ -0,0 +1,234 @@
+"""
+Response Cache for RAG.
+Caches generated answers by exact query and by query embedding similarity.
+"""
+
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import RAG_CACHE_SIZE, RAG_CACHE_TTL, RAG_CACHE_SIMILARITY
+from utils.logging import logger
+
+
+class CacheEntry:
+    """Cached RAG response with usage statistics."""
+    
+    def __init__(
+        self,
+        response: str,
+        sources: FrozenSet[str],
+        scope: str,
+        row: Optional[int] = None
+    ):
+        self.response = response
+        self.sources = sources
+        self.scope = scope
+        self.row = row  # Row of the query embedding in ResponseCache._matrix
+        self.created_at = time.monotonic()
+        self.last_access = self.created_at
+        self.hits = 0
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for exact-match lookups."""
+    return " ".join(query.lower().split())
+
+
+class ResponseCache:
+    """
+    Two-tier cache of RAG responses.
+    
+    Exact tier matches the normalized query text; semantic tier matches
+    query embeddings by cosine similarity against a preallocated matrix of
+    normalized embeddings, one row per entry. Entries expire after a TTL
+    (checked on hit and when the cache is full) and, when the cache is full,
+    the least frequently used entry is evicted (ties broken by least recent
+    access).
+    """
+    
+    def __init__(
+        self,
+        max_size: int = RAG_CACHE_SIZE,
+        ttl: float = RAG_CACHE_TTL,
+        similarity_threshold: float = RAG_CACHE_SIMILARITY
+    ):
+        """
+        Initialize the response cache.
+        
+        Args:
+            max_size: Maximum number of cached responses
+            ttl: Seconds a response stays valid
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: Dict[Tuple[str, str], CacheEntry] = {}
+        # Allocated on the first embedding, when its dimension is known
+        self._matrix: Optional[np.ndarray] = None
+        self._row_keys: List[Optional[Tuple[str, str]]] = [None] * max_size
+        self._free_rows = list(range(max_size - 1, -1, -1))
+        # Uploads clear the cache from worker threads
+        self._lock = threading.Lock()
+    
+    def get(
+        self,
+        query: str,
+        embedding: Optional[Sequence[float]] = None,
+        scope: str = ""
+    ) -> Optional[str]:
+        """
+        Look up a cached response.
+        
+        Args:
+            query: User's query
+            embedding: Query embedding for the semantic tier
+            scope: Conversation context the response depends on
+        
+        Returns:
+            Cached response or None
+        """
+        with self._lock:
+            key = (scope, normalize_query(query))
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._delete(key)
+                entry = None
+            if entry is None and embedding is not None:
+                entry = self._nearest(np.asarray(embedding, dtype=np.float32), scope)
+            
+            if entry is None:
+                return None
+            
+            entry.hits += 1
+            entry.last_access = time.monotonic()
+            return entry.response
+    
+    def put(
+        self,
+        query: str,
+        response: str,
+        sources: Iterable[str] = (),
+        embedding: Optional[Sequence[float]] = None,
+        scope: str = ""
+    ) -> None:
+        """
+        Store a response.
+        
+        Args:
+            query: User's query
+            response: Generated response
+            sources: Source documents the response was built from
+            embedding: Query embedding for the semantic tier
+            scope: Conversation context the response depends on
+        """
+        with self._lock:
+            key = (scope, normalize_query(query))
+            if key in self._entries:
+                self._delete(key)
+            elif len(self._entries) >= self.max_size:
+                self._expire()
+                if len(self._entries) >= self.max_size:
+                    self._evict()
+            
+            row = None
+            if embedding is not None:
+                vector = np.asarray(embedding, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                if self._matrix is None:
+                    self._matrix = np.zeros((self.max_size, vector.size), dtype=np.float32)
+                if norm and vector.size == self._matrix.shape[1]:
+                    row = self._free_rows.pop()
+                    self._matrix[row] = vector / norm
+                    self._row_keys[row] = key
+            
+            self._entries[key] = CacheEntry(
+                response=response,
+                sources=frozenset(sources),
+                scope=scope,
+                row=row
+            )
+    
+    def remove_from_cache(self, source: str) -> int:
+        """
+        Drop responses built from a given source document.
+        
+        Args:
+            source: Source name as stored in document metadata
+        
+        Returns:
+            Number of removed entries
+        """
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if source in entry.sources]
+            for key in stale:
+                self._delete(key)
+        
+        if stale:
+            logger.debug("Invalidated %s cached responses for %s", len(stale), source)
+        return len(stale)
+    
+    def clear(self) -> None:
+        """Drop all cached responses."""
+        with self._lock:
+            self._entries.clear()
+            self._row_keys = [None] * self.max_size
+            self._free_rows = list(range(self.max_size - 1, -1, -1))
+            if self._matrix is not None:
+                self._matrix.fill(0)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _nearest(self, vector: np.ndarray, scope: str) -> Optional[CacheEntry]:
+        """Find the most similar cached query within the same scope."""
+        norm = np.linalg.norm(vector)
+        if self._matrix is None or not norm or vector.size != self._matrix.shape[1]:
+            return None
+        
+        # Free rows are zero and map to no key
+        similarities = self._matrix @ (vector / norm)
+        rows = np.flatnonzero(similarities >= self.similarity_threshold)
+        for row in rows[np.argsort(-similarities[rows])]:
+            key = self._row_keys[row]
+            if key is None or key[0] != scope:
+                continue
+            entry = self._entries[key]
+            if self._expired(entry):
+                self._delete(key)
+                continue
+            return entry
+        return None
+    
+    def _expired(self, entry: CacheEntry) -> bool:
+        """Check whether an entry is older than the TTL."""
+        return entry.created_at < time.monotonic() - self.ttl
+    
+    def _delete(self, key: Tuple[str, str]) -> None:
+        """Remove an entry and release its embedding row."""
+        entry = self._entries.pop(key)
+        if entry.row is not None:
+            self._matrix[entry.row] = 0
+            self._row_keys[entry.row] = None
+            self._free_rows.append(entry.row)
+    
+    def _expire(self) -> None:
+        """Drop entries older than the TTL."""
+        expired = [key for key, entry in self._entries.items() if self._expired(entry)]
+        for key in expired:
+            self._delete(key)
+    
+    def _evict(self) -> None:
+        """Drop the least frequently, then least recently, used entry."""
+        victim = min(
+            self._entries,
+            key=lambda key: (self._entries[key].hits, self._entries[key].last_access)
+        )
+        self._delete(victim)
+
+
+# Global response cache instance
+response_cache = ResponseCache()
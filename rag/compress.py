@@ -0,0 +1,57 @@
+"""
+Context Compression for RAG.
+Drops chunk sentences unrelated to the query before they are sent to the LLM.
+"""
+
+import re
+from typing import Set
+
+from config import RAG_COMPRESS_RATIO
+
+
+# Sentence ends and line breaks (catalog tables are line-oriented)
+_SEGMENT_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"\w+")
+
+# Words are compared by prefix to tolerate Russian inflection
+STEM_LENGTH = 5
+
+
+def _terms(text: str) -> Set[str]:
+    """Extract lowercase word stems from text."""
+    return {word[:STEM_LENGTH] for word in _WORD_RE.findall(text.lower()) if len(word) > 1}
+
+
+def compress_chunk(text: str, query: str, target_ratio: float = RAG_COMPRESS_RATIO) -> str:
+    """
+    Compress a retrieved chunk by keeping the segments most related to the query.
+    
+    Segments sharing terms with the query are always kept; remaining budget
+    is filled with other segments that fit. Original order is preserved.
+    
+    Args:
+        text: Chunk text
+        query: User's query
+        target_ratio: Fraction of characters to keep
+    
+    Returns:
+        Compressed chunk text
+    """
+    segments = [segment.strip() for segment in _SEGMENT_SPLIT_RE.split(text) if segment.strip()]
+    if len(segments) <= 1:
+        return text
+    
+    query_terms = _terms(query)
+    scores = [len(query_terms & _terms(segment)) for segment in segments]
+    budget = len(text) * target_ratio
+    
+    keep = set()
+    used = 0
+    # Highest overlap first, earlier segments first on ties
+    for i in sorted(range(len(segments)), key=lambda i: (-scores[i], i)):
+        if scores[i] == 0 and used + len(segments[i]) > budget:
+            continue
+        keep.add(i)
+        used += len(segments[i])
+    
+    return "\n".join(segments[i] for i in sorted(keep))
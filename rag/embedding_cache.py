@@ -0,0 +1,154 @@
+"""
+Embedding Cache for RAG.
+Persists document chunk embeddings on disk, keyed by chunk text hash.
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from config import DATA_DIR
+from utils.helpers import evict_lru_files, unique_id
+from utils.logging import logger
+
+
+# Chunk embeddings cache: one {sha256}.npy per chunk text and model
+EMBEDDING_CACHE_DIR = DATA_DIR / "embedding_cache"
+EMBEDDING_CACHE_MAX_FILES = 20000
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that reuses stored vectors for known chunk texts.
+    
+    Only embed_documents is cached; queries are embedded fresh. Re-uploading
+    a document, even under another name, costs no embeddings requests.
+    Inside retain(), vectors are also kept in memory, so texts embedded ahead
+    of time are not requested again even if the disk cache cannot be written,
+    and eviction runs once when the block exits instead of after every batch.
+    """
+    
+    def __init__(
+        self,
+        underlying: Embeddings,
+        cache_dir: Path = EMBEDDING_CACHE_DIR,
+        namespace: str = "",
+        max_files: int = EMBEDDING_CACHE_MAX_FILES
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            underlying: Embeddings used for cache misses
+            cache_dir: Directory for cached vectors
+            namespace: Model identifier, so vectors of different models never mix
+            max_files: Cached vectors to keep; least recently used ones are evicted
+        """
+        self.underlying = underlying
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.namespace = namespace
+        self.max_files = max_files
+        self._memory: Dict[Path, List[float]] = {}
+        self._retainers = 0
+        self._pending_eviction = False
+        self._lock = threading.Lock()
+    
+    def _path(self, text: str) -> Path:
+        """Cache file for a chunk text."""
+        digest = hashlib.sha256(f"{self.namespace}\0{text}".encode()).hexdigest()
+        return self.cache_dir / f"{digest}.npy"
+    
+    @contextmanager
+    def retain(self) -> Iterator[None]:
+        """Keep vectors embedded or read inside the block in memory until it exits."""
+        with self._lock:
+            self._retainers += 1
+        try:
+            yield
+        finally:
+            evict = False
+            with self._lock:
+                self._retainers -= 1
+                if not self._retainers:
+                    self._memory.clear()
+                    evict, self._pending_eviction = self._pending_eviction, False
+            if evict:
+                self._evict()
+    
+    def _evict(self) -> None:
+        """Drop least recently used vectors above max_files."""
+        evict_lru_files(self.cache_dir, ".npy", self.max_files)
+    
+    def _read(self, path: Path) -> Optional[List[float]]:
+        """Read a cached vector, returning None on miss or corrupt entry."""
+        vector = self._memory.get(path)
+        if vector is not None:
+            return vector
+        
+        try:
+            vector = np.load(path).tolist()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Ignoring corrupt embedding cache %s: %s", path.name, e)
+            return None
+        
+        # Mark as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return vector
+    
+    def _write(self, path: Path, vector: List[float]) -> None:
+        """Write a vector to cache; failures are logged, not raised."""
+        tmp_path = path.with_name(f"{path.stem}.{unique_id()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(vector, dtype=np.float32))
+            tmp_path.replace(path)
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.warning("Could not write embedding cache %s: %s", path.name, e)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed chunk texts, requesting only those not cached yet.
+        
+        Args:
+            texts: Chunk texts
+        
+        Returns:
+            Embeddings, in the order of texts
+        """
+        paths = [self._path(text) for text in texts]
+        vectors = [self._read(path) for path in paths]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            fresh = self.underlying.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+                self._write(paths[i], vector)
+        
+        with self._lock:
+            retained = bool(self._retainers)
+            if retained:
+                self._memory.update(zip(paths, vectors))
+                self._pending_eviction |= bool(missing)
+        if missing and not retained:
+            self._evict()
+        
+        logger.debug("Embedding cache: %s hits, %s misses", len(texts) - len(missing), len(missing))
+        return vectors
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query without caching it."""
+        return self.underlying.embed_query(text)
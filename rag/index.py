@@ -3,6 +3,8 @@ Vector Index for RAG.
 Creates and manages embeddings using ChromaDB.
 """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 from pathlib import Path
 import chromadb
@@ -10,9 +12,17 @@ from chromadb.config import Settings
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
 
-from config import DATA_DIR, OPENAI_API_KEY, DOCUMENTS_DIR
+from config import (
+    DATA_DIR,
+    OPENAI_API_KEY,
+    DOCUMENTS_DIR,
+    RAG_EMBEDDING_BATCH_SIZE,
+    RAG_EMBEDDING_CONCURRENCY
+)
 from utils.logging import logger
 from rag.loader import document_loader
+from rag.cache import response_cache
+from rag.embedding_cache import CachedEmbeddings
 
 
 class VectorIndex:
@@ -31,10 +41,14 @@ class VectorIndex:
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(parents=True, exist_ok=True)
         
-        # Initialize embeddings
-        self.embeddings = OpenAIEmbeddings(
+        # Initialize embeddings; chunk vectors are cached on disk, queries are not
+        self.query_embeddings = OpenAIEmbeddings(
             openai_api_key=OPENAI_API_KEY
         )
+        self.embeddings = CachedEmbeddings(
+            self.query_embeddings,
+            namespace=self.query_embeddings.model
+        )
         
         # Initialize or load vector store
         self.vectorstore = None
@@ -50,7 +64,7 @@ class VectorIndex:
             )
             logger.info("Loaded existing vector store")
         except Exception as e:
-            logger.warning(f"Could not load existing vectorstore: {e}")
+            logger.warning("Could not load existing vectorstore: %s", e)
             # Create new vectorstore
             self.vectorstore = Chroma(
                 persist_directory=str(self.persist_directory),
@@ -58,23 +72,48 @@ class VectorIndex:
             )
             logger.info("Created new vector store")
     
-    def add_documents(self, documents: List) -> None:
+    def add_documents(
+        self,
+        documents: List,
+        batch_size: int = RAG_EMBEDDING_BATCH_SIZE
+    ) -> None:
         """
         Add documents to the vector store.
         
+        Documents are embedded in batches, one embeddings request per batch.
+        Batches are embedded concurrently first; the embedding cache retains
+        those vectors in memory, so the vector store reuses them.
+        
         Args:
             documents: List of document chunks
+            batch_size: Number of chunks per embeddings request
         """
         try:
             if not documents:
                 logger.warning("No documents to add")
                 return
             
-            self.vectorstore.add_documents(documents)
-            logger.info(f"Added {len(documents)} documents to vector store")
+            batches = [documents[start:start + batch_size] for start in range(0, len(documents), batch_size)]
+            
+            with self.embeddings.retain():
+                if len(batches) > 1:
+                    workers = min(RAG_EMBEDDING_CONCURRENCY, len(batches))
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        list(pool.map(
+                            self.embeddings.embed_documents,
+                            [[doc.page_content for doc in batch] for batch in batches]
+                        ))
+                
+                for batch in batches:
+                    self.vectorstore.add_documents(batch)
+            
+            # Any cached answer may now have a better source
+            response_cache.clear()
+            
+            logger.info("Added %s documents to vector store", len(documents))
             
         except Exception as e:
-            logger.error(f"Error adding documents: {e}")
+            logger.error("Error adding documents: %s", e)
             raise
     
     def similarity_search(
@@ -94,11 +133,11 @@ class VectorIndex:
         """
         try:
             results = self.vectorstore.similarity_search(query, k=k)
-            logger.debug(f"Found {len(results)} similar documents")
+            logger.debug("Found %s similar documents", len(results))
             return results
             
         except Exception as e:
-            logger.error(f"Error in similarity search: {e}")
+            logger.error("Error in similarity search: %s", e)
             raise
     
     def similarity_search_with_score(
@@ -118,11 +157,61 @@ class VectorIndex:
         """
         try:
             results = self.vectorstore.similarity_search_with_score(query, k=k)
-            logger.debug(f"Found {len(results)} similar documents with scores")
+            logger.debug("Found %s similar documents with scores", len(results))
             return results
             
         except Exception as e:
-            logger.error(f"Error in similarity search with scores: {e}")
+            logger.error("Error in similarity search with scores: %s", e)
+            raise
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a search query.
+        
+        Args:
+            query: Search query
+        
+        Returns:
+            Query embedding
+        """
+        return self.query_embeddings.embed_query(query)
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed several search queries in one request.
+        
+        Args:
+            queries: Search queries
+        
+        Returns:
+            Query embeddings, in the order of queries
+        """
+        return self.query_embeddings.embed_documents(queries)
+    
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 3
+    ) -> List[tuple]:
+        """
+        Search for similar documents by a precomputed query embedding.
+        
+        Args:
+            embedding: Query embedding from embed_query
+            k: Number of results to return
+        
+        Returns:
+            List of (document, score) tuples
+        """
+        try:
+            results = self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k
+            )
+            logger.debug("Found %s similar documents with scores", len(results))
+            return results
+        
+        except Exception as e:
+            logger.error("Error in similarity search by vector: %s", e)
             raise
     
     def index_documents_directory(
@@ -147,7 +236,7 @@ class VectorIndex:
                 self.clear_index()
             
             # Load documents
-            documents = document_loader.load_directory(directory)
+            documents = document_loader.load_directory(directory, use_cache=not force_reindex)
             
             if not documents:
                 logger.warning("No documents found to index")
@@ -156,28 +245,60 @@ class VectorIndex:
             # Add to vector store
             self.add_documents(documents)
             
-            logger.info(f"Indexed {len(documents)} document chunks")
+            logger.info("Indexed %s document chunks", len(documents))
+            return len(documents)
+            
+        except Exception as e:
+            logger.error("Error indexing documents: %s", e)
+            raise
+    
+    async def aindex_documents_directory(
+        self,
+        directory: Path = DOCUMENTS_DIR,
+        force_reindex: bool = False
+    ) -> int:
+        """
+        Index all documents from a directory without blocking the event loop.
+        
+        Args:
+            directory: Directory containing documents
+            force_reindex: If True, clear existing index first
+        
+        Returns:
+            Number of documents indexed
+        """
+        try:
+            if force_reindex:
+                logger.info("Clearing existing index")
+                await asyncio.to_thread(self.clear_index)
+            
+            documents = await document_loader.aload_directory(directory, use_cache=not force_reindex)
+            
+            if not documents:
+                logger.warning("No documents found to index")
+                return 0
+            
+            await asyncio.to_thread(self.add_documents, documents)
+            
+            logger.info("Indexed %s document chunks", len(documents))
             return len(documents)
             
         except Exception as e:
-            logger.error(f"Error indexing documents: {e}")
+            logger.error("Error indexing documents: %s", e)
             raise
     
     def clear_index(self):
         """Clear the entire vector store."""
         try:
-            # Delete and recreate
-            import shutil
-            if self.persist_directory.exists():
-                shutil.rmtree(self.persist_directory)
-            
-            self.persist_directory.mkdir(parents=True, exist_ok=True)
+            # Drop the collection inside the open database instead of deleting its files
+            self.vectorstore.delete_collection()
             self._load_or_create_vectorstore()
+            response_cache.clear()
             
             logger.info("Vector store cleared")
             
         except Exception as e:
-            logger.error(f"Error clearing index: {e}")
+            logger.error("Error clearing index: %s", e)
             raise
     
     def get_stats(self) -> dict:
@@ -198,7 +319,7 @@ class VectorIndex:
             }
             
         except Exception as e:
-            logger.error(f"Error getting stats: {e}")
+            logger.error("Error getting stats: %s", e)
             return {"error": str(e)}
 
 
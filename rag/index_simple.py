@@ -4,24 +4,199 @@ Uses keyword-based search - perfect for Yandex API without embeddings.
 """
 
 import re
+import asyncio
+import heapq
+import json
+import multiprocessing
+import struct
+import threading
+from array import array
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import List, Dict
+from pypdf import PdfReader
 from utils.logging import logger
-from config import DATA_DIR, DOCUMENTS_DIR, RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP
+from utils.helpers import iter_files
+from rag.cache import response_cache
+from config import (
+    DATA_DIR,
+    DOCUMENTS_DIR,
+    RAG_CHUNK_SIZE,
+    RAG_CHUNK_OVERLAP,
+    RAG_INDEX_PROCESSES,
+    SUPPORTED_DOCUMENT_EXTENSIONS
+)
+
+
+_WORD_RE = re.compile(r'\w+')
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Чанки хранятся как <длина uint32 LE><UTF-8 байты>, без разделителей в тексте
+CHUNKS_FILE = "chunks.bin"
+LEGACY_CHUNKS_FILE = "chunks.txt"
+LEGACY_CHUNK_SEPARATOR = "###CHUNK_SEPARATOR###"
+_CHUNK_LENGTH = struct.Struct('<I')
+
+# Стоп-слова, не участвующие в поиске
+_STOP_WORDS = frozenset({
+    'что', 'как', 'где', 'когда', 'кто', 'какой', 'какая', 'какие',
+    'это', 'для', 'или', 'и', 'в', 'на', 'с', 'по', 'из', 'у',
+    'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been'
+})
+
+
+def _extract_pdf_text(pdf_path: Path) -> str:
+    """Extract text from PDF file."""
+    try:
+        reader = PdfReader(pdf_path)
+        parts = []
+        for page in reader.pages:
+            t = page.extract_text()
+            if t:
+                parts.append(t)
+        return "\n".join(parts)
+    except Exception as e:
+        logger.error("Error extracting PDF text: %s", e)
+        return ""
+
+
+def _split_into_chunks(text: str) -> List[str]:
+    """
+    Split text into overlapping chunks.
+    Similar to LangChain's RecursiveCharacterTextSplitter.
+    """
+    # Разбиваем на предложения
+    sentences = _SENT_RE.split(text)
+    
+    chunks = []
+    current_chunk = ""
+    
+    for sentence in sentences:
+        # Если добавление предложения не превысит лимит - добавляем
+        if len(current_chunk) + len(sentence) <= RAG_CHUNK_SIZE:
+            current_chunk += " " + sentence
+        else:
+            # Сохраняем текущий чанк
+            if current_chunk.strip():
+                chunks.append(current_chunk.strip())
+            
+            # Начинаем новый чанк с overlap
+            if len(current_chunk) > RAG_CHUNK_OVERLAP:
+                # Берем последние N символов для overlap
+                overlap_text = current_chunk[-RAG_CHUNK_OVERLAP:]
+                current_chunk = overlap_text + " " + sentence
+            else:
+                current_chunk = sentence
+    
+    # Добавляем последний чанк
+    if current_chunk.strip():
+        chunks.append(current_chunk.strip())
+    
+    return chunks
+
+
+def _load_document_chunks(doc_path: Path) -> List[str]:
+    """
+    Read a document and split it into chunks.
+    
+    Module-level so it can run in worker processes.
+    
+    Args:
+        doc_path: Path to the document
+    
+    Returns:
+        List of chunks, empty on error
+    """
+    try:
+        # Извлекаем текст
+        if doc_path.suffix.lower() == '.pdf':
+            text = _extract_pdf_text(doc_path)
+        else:
+            with open(doc_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        
+        # Разбиваем на чанки
+        return _split_into_chunks(text)
+        
+    except Exception as e:
+        logger.error("Error processing %s: %s", doc_path, e)
+        return []
+
+
+class _IndexData:
+    """
+    Chunks, their sources and the inverted index.
+    
+    Filled by one writer before it is published; after that it is only read,
+    so searches never see a half-built index.
+    """
+    
+    def __init__(self):
+        self.chunks: List[str] = []
+        # Чанки в нижнем регистре для поиска точной фразы
+        self.chunks_lower: List[str] = []
+        # Имена источников хранятся один раз, у чанка - только номер источника
+        self.sources: List[str] = []
+        self.chunk_source = array('I')
+        self.source_ids: Dict[str, int] = {}
+        # Инвертированный индекс: слово -> номера чанков, где оно встречается
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+    
+    def append(self, chunk: str, source: str):
+        """Add a chunk with its source and index its distinct words."""
+        source_id = self.source_ids.get(source)
+        if source_id is None:
+            source_id = self.source_ids[source] = len(self.sources)
+            self.sources.append(source)
+        
+        chunk_id = len(self.chunks)
+        chunk_lower = chunk.lower()
+        self.chunks.append(chunk)
+        self.chunks_lower.append(chunk_lower)
+        self.chunk_source.append(source_id)
+        for word in set(_WORD_RE.findall(chunk_lower)):
+            self.postings[word].append(chunk_id)
 
 
 class SimpleDocumentIndex:
-    """Simple document index using keyword search."""
+    """
+    Simple document index using keyword search.
+    
+    Updates build a new _IndexData and publish it with a single assignment
+    under a lock, so concurrent uploads are serialized and searches running
+    meanwhile keep using the previous index.
+    """
     
     def __init__(self):
         """Initialize the simple index."""
-        self.chunks: List[str] = []
-        self.metadata: List[Dict] = []
+        self._data = _IndexData()
+        self._write_lock = threading.Lock()
         self.persist_directory = DATA_DIR / "simple_index"
-        self.persist_directory.mkdir(exist_ok=True)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
         
         logger.info("Simple document index initialized")
     
+    @property
+    def chunks(self) -> List[str]:
+        """Indexed chunks."""
+        return self._data.chunks
+    
+    @property
+    def sources(self) -> List[str]:
+        """Source document names."""
+        return self._data.sources
+    
+    @property
+    def chunk_source(self) -> array:
+        """Source number of every chunk."""
+        return self._data.chunk_source
+    
+    @property
+    def postings(self) -> Dict[str, List[int]]:
+        """Inverted index: word -> chunk numbers."""
+        return self._data.postings
+    
     def index_documents_directory(self, force_reindex: bool = False) -> int:
         """
         Index all documents in the documents directory.
@@ -34,162 +209,211 @@ class SimpleDocumentIndex:
         """
         try:
             # Проверяем, есть ли уже индекс
-            index_file = self.persist_directory / "chunks.txt"
-            if index_file.exists() and not force_reindex:
+            index_exists = (
+                (self.persist_directory / CHUNKS_FILE).exists()
+                or (self.persist_directory / LEGACY_CHUNKS_FILE).exists()
+            )
+            if index_exists and not force_reindex:
                 logger.info("Loading existing index...")
                 return self._load_index()
             
             # Находим все документы
-            documents = list(DOCUMENTS_DIR.glob('*'))
-            documents = [d for d in documents if d.is_file() and d.suffix in ['.pdf', '.txt', '.md']]
+            documents = list(iter_files(DOCUMENTS_DIR, SUPPORTED_DOCUMENT_EXTENSIONS, recursive=False))
             
             if not documents:
                 logger.warning("No documents found to index")
                 return 0
             
-            logger.info(f"Indexing {len(documents)} documents...")
+            logger.info("Indexing %s documents...", len(documents))
             
+            # Полная переиндексация заменяет старые чанки, а не дописывает их
+            # Извлечение текста и разбиение на чанки - по процессам, документы независимы
+            workers = min(len(documents), RAG_INDEX_PROCESSES)
+            if workers > 1:
+                # spawn, not fork: this runs in a worker thread next to the event loop,
+                # and forked children could inherit locks held by other threads
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                ) as executor:
+                    results = list(executor.map(_load_document_chunks, documents))
+            else:
+                results = [_load_document_chunks(doc_path) for doc_path in documents]
+            
+            data = _IndexData()
             total_chunks = 0
-            for doc_path in documents:
-                chunks = self._process_document(doc_path)
+            for doc_path, chunks in zip(documents, results):
+                for chunk in chunks:
+                    data.append(chunk, doc_path.name)
                 total_chunks += len(chunks)
-                logger.info(f"Indexed {doc_path.name}: {len(chunks)} chunks")
+                logger.info("Indexed %s: %s chunks", doc_path.name, len(chunks))
             
-            # Сохраняем индекс
-            self._save_index()
+            # Публикуем и сохраняем индекс
+            with self._write_lock:
+                self._data = data
+                self._save_index()
+            response_cache.clear()
             
-            logger.info(f"Total chunks indexed: {total_chunks}")
+            logger.info("Total chunks indexed: %s", total_chunks)
             return total_chunks
             
         except Exception as e:
-            logger.error(f"Error indexing documents: {e}")
+            logger.error("Error indexing documents: %s", e)
             return 0
     
-    def _process_document(self, doc_path: Path) -> List[str]:
-        """Process a single document and split into chunks."""
-        try:
-            # Извлекаем текст
-            if doc_path.suffix == '.pdf':
-                text = self._extract_pdf_text(doc_path)
-            else:
-                with open(doc_path, 'r', encoding='utf-8') as f:
-                    text = f.read()
-            
-            # Разбиваем на чанки
-            chunks = self._split_into_chunks(text)
-            
-            # Сохраняем с метаданными
-            for chunk in chunks:
-                self.chunks.append(chunk)
-                self.metadata.append({'source': doc_path.name})
-            
-            return chunks
-            
-        except Exception as e:
-            logger.error(f"Error processing {doc_path}: {e}")
-            return []
-    
-    def _extract_pdf_text(self, pdf_path: Path) -> str:
-        """Extract text from PDF file."""
-        try:
-            from PyPDF2 import PdfReader
-            
-            reader = PdfReader(pdf_path)
-            text = ""
-            for page in reader.pages:
-                t = page.extract_text()
-                if t:
-                    text += t + "\n"
-            return text
-        except Exception as e:
-            logger.error(f"Error extracting PDF text: {e}")
-            return ""
+    async def aindex_documents_directory(self, force_reindex: bool = False) -> int:
+        """
+        Index all documents without blocking the event loop.
+        
+        Args:
+            force_reindex: Force re-indexing even if index exists
+        
+        Returns:
+            Number of chunks indexed
+        """
+        return await asyncio.to_thread(self.index_documents_directory, force_reindex)
     
-    def _split_into_chunks(self, text: str) -> List[str]:
+    def index_single_document(self, doc_path: Path) -> int:
         """
-        Split text into overlapping chunks.
-        Similar to LangChain's RecursiveCharacterTextSplitter.
+        Add one document to the index without re-indexing the directory.
+        
+        Chunks of an earlier document with the same name are replaced.
+        
+        Args:
+            doc_path: Path to the document
+        
+        Returns:
+            Number of chunks indexed
         """
-        # Разбиваем на предложения
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        doc_path = Path(doc_path)
+        chunks = _load_document_chunks(doc_path)
         
-        chunks = []
-        current_chunk = ""
+        with self._write_lock:
+            # Индекс мог ещё не загружаться в этом процессе
+            if not self._data.chunks:
+                self._load_index()
+            
+            current = self._data
+            old_id = current.source_ids.get(doc_path.name)
+            data = _IndexData()
+            for chunk, source_id in zip(current.chunks, current.chunk_source):
+                if source_id != old_id:
+                    data.append(chunk, current.sources[source_id])
+            for chunk in chunks:
+                data.append(chunk, doc_path.name)
+            
+            self._data = data
+            self._save_index()
+        response_cache.clear()
         
-        for sentence in sentences:
-            # Если добавление предложения не превысит лимит - добавляем
-            if len(current_chunk) + len(sentence) <= RAG_CHUNK_SIZE:
-                current_chunk += " " + sentence
-            else:
-                # Сохраняем текущий чанк
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                
-                # Начинаем новый чанк с overlap
-                if len(current_chunk) > RAG_CHUNK_OVERLAP:
-                    # Берем последние N символов для overlap
-                    overlap_text = current_chunk[-RAG_CHUNK_OVERLAP:]
-                    current_chunk = overlap_text + " " + sentence
-                else:
-                    current_chunk = sentence
+        logger.info("Indexed %s: %s chunks", doc_path.name, len(chunks))
+        return len(chunks)
+    
+    async def aindex_single_document(self, doc_path: Path) -> int:
+        """
+        Add one document to the index without blocking the event loop.
         
-        # Добавляем последний чанк
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        Args:
+            doc_path: Path to the document
         
-        return chunks
+        Returns:
+            Number of chunks indexed
+        """
+        return await asyncio.to_thread(self.index_single_document, doc_path)
+    
+    def get_source(self, chunk_id: int) -> str:
+        """Get the source document name of a chunk."""
+        data = self._data
+        return data.sources[data.chunk_source[chunk_id]]
     
     def _save_index(self):
         """Save index to disk."""
         try:
-            chunks_file = self.persist_directory / "chunks.txt"
+            data = self._data
+            chunks_file = self.persist_directory / CHUNKS_FILE
             metadata_file = self.persist_directory / "metadata.txt"
             
-            # Сохраняем чанки
-            with open(chunks_file, 'w', encoding='utf-8') as f:
-                for chunk in self.chunks:
-                    # Используем разделитель, который вряд ли встретится в тексте
-                    f.write(chunk + "\n###CHUNK_SEPARATOR###\n")
+            # Сохраняем чанки с префиксом длины
+            with open(chunks_file, 'wb') as f:
+                for chunk in data.chunks:
+                    encoded = chunk.encode('utf-8')
+                    f.write(_CHUNK_LENGTH.pack(len(encoded)))
+                    f.write(encoded)
+            
+            # Старый текстовый формат больше не нужен
+            (self.persist_directory / LEGACY_CHUNKS_FILE).unlink(missing_ok=True)
             
             # Сохраняем метаданные
-            import json
+            metadata = {'sources': data.sources, 'chunk_source': data.chunk_source.tolist()}
             with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.metadata, f, ensure_ascii=False)
-            
-            logger.info(f"Index saved: {len(self.chunks)} chunks")
+                json.dump(metadata, f, ensure_ascii=False)
             
+            logger.info("Index saved: %s chunks", len(data.chunks))
+        
         except Exception as e:
-            logger.error(f"Error saving index: {e}")
+            logger.error("Error saving index: %s", e)
     
     def _load_index(self) -> int:
         """Load index from disk."""
         try:
-            chunks_file = self.persist_directory / "chunks.txt"
+            chunks_file = self.persist_directory / CHUNKS_FILE
+            legacy_file = self.persist_directory / LEGACY_CHUNKS_FILE
             metadata_file = self.persist_directory / "metadata.txt"
             
-            if not chunks_file.exists():
-                return 0
-            
             # Загружаем чанки
-            with open(chunks_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                self.chunks = [c.strip() for c in content.split("###CHUNK_SEPARATOR###") if c.strip()]
+            if chunks_file.exists():
+                chunks = self._read_chunks(chunks_file.read_bytes())
+            elif legacy_file.exists():
+                content = legacy_file.read_text(encoding='utf-8')
+                chunks = [c.strip() for c in content.split(LEGACY_CHUNK_SEPARATOR) if c.strip()]
+            else:
+                return 0
             
             # Загружаем метаданные
+            sources = ['Unknown'] * len(chunks)
             if metadata_file.exists():
-                import json
                 with open(metadata_file, 'r', encoding='utf-8') as f:
-                    self.metadata = json.load(f)
-            else:
-                self.metadata = [{'source': 'Unknown'}] * len(self.chunks)
+                    metadata = json.load(f)
+                if isinstance(metadata, dict):
+                    names = metadata['sources']
+                    sources = [names[source_id] for source_id in metadata['chunk_source']]
+                else:
+                    # Старый формат: словарь метаданных на каждый чанк
+                    sources = [meta.get('source', 'Unknown') for meta in metadata]
             
-            logger.info(f"Index loaded: {len(self.chunks)} chunks")
-            return len(self.chunks)
+            data = _IndexData()
+            for chunk, source in zip(chunks, sources):
+                data.append(chunk, source)
+            self._data = data
             
+            logger.info("Index loaded: %s chunks", len(data.chunks))
+            return len(data.chunks)
+        
         except Exception as e:
-            logger.error(f"Error loading index: {e}")
+            logger.error("Error loading index: %s", e)
             return 0
     
+    @staticmethod
+    def _read_chunks(data: bytes) -> List[str]:
+        """
+        Decode length-prefixed chunks.
+        
+        Args:
+            data: Contents of the chunks file
+        
+        Returns:
+            List of chunks
+        """
+        chunks = []
+        view = memoryview(data)
+        offset = 0
+        while offset < len(view):
+            (length,) = _CHUNK_LENGTH.unpack_from(view, offset)
+            offset += _CHUNK_LENGTH.size
+            chunks.append(str(view[offset:offset + length], 'utf-8'))
+            offset += length
+        return chunks
+    
     def get_all_chunks(self) -> List[str]:
         """Get all indexed chunks."""
         return self.chunks
@@ -206,62 +430,57 @@ class SimpleDocumentIndex:
             List of most relevant chunks
         """
         try:
-            # Извлекаем ключевые слова из вопроса
-            q_words = set(re.findall(r'\w+', question.lower()))
+            # Один снимок индекса на весь поиск
+            data = self._data
+            question_lower = question.lower()
             
-            # Убираем стоп-слова
-            stop_words = {
-                'что', 'как', 'где', 'когда', 'кто', 'какой', 'какая', 'какие',
-                'это', 'для', 'или', 'и', 'в', 'на', 'с', 'по', 'из', 'у',
-                'the', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been'
+            # Извлекаем ключевые слова из вопроса, без стоп-слов
+            q_words = {
+                w for w in _WORD_RE.findall(question_lower)
+                if len(w) > 2 and w not in _STOP_WORDS
             }
-            q_words = {w for w in q_words if len(w) > 2 and w not in stop_words}
             
             if not q_words:
                 logger.warning("No meaningful keywords found in question")
                 return []
             
-            # Подсчитываем совпадения
-            scored = []
-            for chunk in self.chunks:
-                c_words = set(re.findall(r'\w+', chunk.lower()))
-                
-                # Базовый score - количество совпадающих слов
-                score = len(q_words & c_words)
-                
-                # Бонус за точное совпадение фразы
-                if question.lower() in chunk.lower():
-                    score += 10
-                
-                if score > 0:
-                    scored.append((score, chunk))
+            # Базовый score - количество совпадающих слов; смотрим только чанки из списков слов
+            scores = Counter()
+            for word in q_words:
+                # Counter.update считает элементы списка в C, без цикла на Python
+                scores.update(data.postings.get(word, ()))
             
-            # Сортируем по убыванию score
-            scored.sort(key=lambda x: x[0], reverse=True)
+            # Бонус за точное совпадение фразы
+            for chunk_id in scores:
+                if question_lower in data.chunks_lower[chunk_id]:
+                    scores[chunk_id] += 10
             
-            # Возвращаем топ-K чанков
-            result = [chunk for _, chunk in scored[:top_k]]
+            # Топ-K по убыванию score, при равенстве - в порядке документа
+            top = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+            result = [data.chunks[chunk_id] for chunk_id, _ in top]
             
-            logger.info(f"Found {len(result)} relevant chunks out of {len(self.chunks)} total")
+            logger.info("Found %s relevant chunks out of %s total", len(result), len(data.chunks))
             return result
             
         except Exception as e:
-            logger.error(f"Error in keyword retrieval: {e}")
+            logger.error("Error in keyword retrieval: %s", e)
             return []
     
     def get_stats(self) -> dict:
         """Get index statistics."""
+        data = self._data
         return {
-            "total_documents": len(set(m['source'] for m in self.metadata)),
-            "total_chunks": len(self.chunks),
+            "total_documents": len(data.sources),
+            "total_chunks": len(data.chunks),
             "persist_directory": str(self.persist_directory),
             "index_type": "simple_keyword"
         }
     
     def clear(self):
         """Clear the index."""
-        self.chunks = []
-        self.metadata = []
+        with self._write_lock:
+            self._data = _IndexData()
+        response_cache.clear()
         logger.info("Index cleared")
 
 
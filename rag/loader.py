@@ -3,32 +3,104 @@ Document Loader for RAG.
 Loads and processes documents from various formats.
 """
 
+import asyncio
+import hashlib
+import os
+import pickle
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from config import DOCUMENTS_DIR, RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP
+from config import (
+    DATA_DIR,
+    DOCUMENTS_DIR,
+    RAG_CHUNK_SIZE,
+    RAG_CHUNK_OVERLAP,
+    SUPPORTED_DOCUMENT_EXTENSIONS
+)
 from utils.logging import logger
+from utils.helpers import evict_lru_files, iter_files, unique_id
+
+
+# Parsed chunks cache, keyed by file content hash
+CHUNK_CACHE_DIR = DATA_DIR / "chunk_cache"
+CHUNK_CACHE_MAX_FILES = 256
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Splitter is stateless, so one instance is shared by all loaders
+TEXT_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=RAG_CHUNK_SIZE,
+    chunk_overlap=RAG_CHUNK_OVERLAP,
+    length_function=len,
+)
 
 
 class DocumentLoader:
     """Loads and processes documents for RAG."""
     
-    def __init__(self):
-        """Initialize document loader."""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=RAG_CHUNK_SIZE,
-            chunk_overlap=RAG_CHUNK_OVERLAP,
-            length_function=len,
-        )
+    def __init__(self, cache_dir: Optional[Path] = CHUNK_CACHE_DIR):
+        """
+        Initialize document loader.
+        
+        Args:
+            cache_dir: Directory for the parsed chunks cache (None disables it)
+        """
+        self.text_splitter = TEXT_SPLITTER
+        
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    def _file_hash(self, file_path: Path) -> str:
+        """Hash file content together with the chunking parameters."""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        digest.update(f"{RAG_CHUNK_SIZE}:{RAG_CHUNK_OVERLAP}".encode())
+        return digest.hexdigest()
     
-    def load_document(self, file_path: Path) -> List[Dict]:
+    def _read_cache(self, cache_path: Path) -> Optional[List[Dict]]:
+        """Read cached chunks, returning None on miss or corrupt entry."""
+        if not cache_path.exists():
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                chunks = pickle.load(f)
+        except Exception as e:
+            logger.warning("Ignoring corrupt chunk cache %s: %s", cache_path.name, e)
+            return None
+        
+        # Mark as recently used for eviction
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return chunks
+    
+    def _write_cache(self, cache_path: Path, chunks: List[Dict]) -> None:
+        """Write chunks to cache; failures are logged, not raised."""
+        tmp_path = cache_path.with_name(f"{cache_path.stem}.{unique_id()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(chunks, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_path.replace(cache_path)
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.warning("Could not write chunk cache %s: %s", cache_path.name, e)
+            return
+        
+        # Edited and re-uploaded documents leave old entries behind
+        evict_lru_files(cache_path.parent, ".pkl", CHUNK_CACHE_MAX_FILES)
+    
+    def load_document(self, file_path: Path, use_cache: bool = True) -> List[Dict]:
         """
         Load a single document and split into chunks.
         
         Args:
             file_path: Path to document file
+            use_cache: Reuse chunks parsed earlier from identical content
         
         Returns:
             List of document chunks with metadata
@@ -36,38 +108,71 @@ class DocumentLoader:
         try:
             file_path = Path(file_path)
             
-            # Select appropriate loader based on file extension
-            if file_path.suffix.lower() == '.pdf':
-                loader = PyPDFLoader(str(file_path))
-            elif file_path.suffix.lower() in ['.txt', '.md']:
-                loader = TextLoader(str(file_path), encoding='utf-8')
-            else:
+            if file_path.suffix.lower() not in SUPPORTED_DOCUMENT_EXTENSIONS:
                 raise ValueError(f"Unsupported file format: {file_path.suffix}")
             
-            # Load document
-            documents = loader.load()
+            chunks = None
+            cache_path = None
+            if use_cache and self.cache_dir is not None:
+                cache_path = self.cache_dir / f"{self._file_hash(file_path)}.pkl"
+                chunks = self._read_cache(cache_path)
+                if chunks is not None:
+                    logger.debug("Chunk cache hit for %s", file_path.name)
             
-            # Split into chunks
-            chunks = self.text_splitter.split_documents(documents)
+            if chunks is None:
+                # Select appropriate loader based on file extension
+                if file_path.suffix.lower() == '.pdf':
+                    loader = PyPDFLoader(str(file_path))
+                else:
+                    loader = TextLoader(str(file_path), encoding='utf-8')
+                
+                # Load document
+                documents = loader.load()
+                
+                # Split into chunks
+                chunks = self.text_splitter.split_documents(documents)
+                
+                if cache_path is not None:
+                    self._write_cache(cache_path, chunks)
             
-            # Add source metadata
+            # Add source metadata (after caching, so moved files still hit)
             for chunk in chunks:
                 chunk.metadata['source'] = file_path.name
                 chunk.metadata['file_path'] = str(file_path)
             
-            logger.info(f"Loaded {len(chunks)} chunks from {file_path.name}")
+            logger.info("Loaded %s chunks from %s", len(chunks), file_path.name)
             return chunks
             
         except Exception as e:
-            logger.error(f"Error loading document {file_path}: {e}")
+            logger.error("Error loading document %s: %s", file_path, e)
             raise
     
-    def load_directory(self, directory: Path = DOCUMENTS_DIR) -> List[Dict]:
+    async def aload_document(self, file_path: Path, use_cache: bool = True) -> List[Dict]:
+        """
+        Load a single document without blocking the event loop.
+        
+        Parsing and splitting are CPU-bound, so they run in a worker thread.
+        
+        Args:
+            file_path: Path to document file
+            use_cache: Reuse chunks parsed earlier from identical content
+        
+        Returns:
+            List of document chunks with metadata
+        """
+        return await asyncio.to_thread(self.load_document, file_path, use_cache)
+    
+    def _find_documents(self, directory: Path) -> List[Path]:
+        """Find all supported documents in a directory."""
+        return list(iter_files(directory, SUPPORTED_DOCUMENT_EXTENSIONS))
+    
+    def load_directory(self, directory: Path = DOCUMENTS_DIR, use_cache: bool = True) -> List[Dict]:
         """
         Load all documents from a directory.
         
         Args:
             directory: Path to directory containing documents
+            use_cache: Reuse chunks parsed earlier from identical content
         
         Returns:
             List of all document chunks
@@ -76,23 +181,55 @@ class DocumentLoader:
             directory = Path(directory)
             all_chunks = []
             
-            # Supported file extensions
-            supported_extensions = ['.pdf', '.txt', '.md']
-            
             # Find all supported files
-            for file_path in directory.rglob('*'):
-                if file_path.suffix.lower() in supported_extensions:
+            for file_path in self._find_documents(directory):
+                try:
+                    chunks = self.load_document(file_path, use_cache)
+                    all_chunks.extend(chunks)
+                except Exception as e:
+                    logger.warning("Skipping %s: %s", file_path.name, e)
+            
+            logger.info("Loaded %s total chunks from %s", len(all_chunks), directory)
+            return all_chunks
+            
+        except Exception as e:
+            logger.error("Error loading directory %s: %s", directory, e)
+            raise
+    
+    async def aload_directory(self, directory: Path = DOCUMENTS_DIR, use_cache: bool = True) -> List[Dict]:
+        """
+        Load all documents from a directory concurrently.
+        
+        Files are parsed in worker threads, at most one per CPU core at a time.
+        
+        Args:
+            directory: Path to directory containing documents
+            use_cache: Reuse chunks parsed earlier from identical content
+        
+        Returns:
+            List of all document chunks
+        """
+        try:
+            directory = Path(directory)
+            file_paths = await asyncio.to_thread(self._find_documents, directory)
+            semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+            
+            async def load_one(file_path: Path) -> List[Dict]:
+                async with semaphore:
                     try:
-                        chunks = self.load_document(file_path)
-                        all_chunks.extend(chunks)
+                        return await self.aload_document(file_path, use_cache)
                     except Exception as e:
-                        logger.warning(f"Skipping {file_path.name}: {e}")
+                        logger.warning("Skipping %s: %s", file_path.name, e)
+                        return []
+            
+            results = await asyncio.gather(*(load_one(p) for p in file_paths))
+            all_chunks = [chunk for chunks in results for chunk in chunks]
             
-            logger.info(f"Loaded {len(all_chunks)} total chunks from {directory}")
+            logger.info("Loaded %s total chunks from %s", len(all_chunks), directory)
             return all_chunks
             
         except Exception as e:
-            logger.error(f"Error loading directory {directory}: {e}")
+            logger.error("Error loading directory %s: %s", directory, e)
             raise
     
     def load_text(self, text: str, source: str = "manual_input") -> List[Dict]:
@@ -118,11 +255,11 @@ class DocumentLoader:
             # Split into chunks
             chunks = self.text_splitter.split_documents([document])
             
-            logger.info(f"Created {len(chunks)} chunks from text input")
+            logger.info("Created %s chunks from text input", len(chunks))
             return chunks
             
         except Exception as e:
-            logger.error(f"Error loading text: {e}")
+            logger.error("Error loading text: %s", e)
             raise
 
 
@@ -3,10 +3,16 @@ RAG Query Handler.
 Handles queries against the knowledge base with context-aware responses.
 """
 
+import asyncio
+import hashlib
+import orjson
+from pathlib import Path
 from typing import List, Dict, Optional
 
 from utils.logging import logger
-from config import RAG_TOP_K, API_PROVIDER
+from config import RAG_TOP_K, API_PROVIDER, RAG_COMPRESS
+from rag.cache import response_cache
+from rag.compress import compress_chunk
 
 # Динамический импорт в зависимости от провайдера
 if API_PROVIDER == "yandex":
@@ -15,6 +21,38 @@ if API_PROVIDER == "yandex":
 else:
     from rag.index import vector_index as knowledge_index
     from services.openai_client import openai_client as ai_client
+    from rag.batcher import EmbeddingBatcher
+    
+    # Concurrent queries share one embeddings request
+    query_embedder = EmbeddingBatcher(knowledge_index.embed_queries)
+
+# Messages of history sent with a prompt (last 3 exchanges)
+HISTORY_WINDOW = 6
+
+RAG_SYSTEM_PROMPT = """Ты - технический консультант-эксперт по люкам и дождеприемникам компании "ЛИТЛИДЕР".
+
+ТВОЯ РОЛЬ:
+- Помогаешь инженерам, проектировщикам, прорабам и снабженцам подбирать продукцию
+- Расшифровываешь технические маркировки типа ТМ(Д400)-2-7-9-60
+- Предоставляешь точные технические характеристики, веса, размеры
+- Объясняешь различия между типами продукции (плавающие/обычные люки, классы нагрузки)
+- Помогаешь с подбором оборудования для конкретных условий эксплуатации
+
+ВАЖНЫЕ ПРАВИЛА:
+1. Используй ТОЛЬКО информацию из технического каталога ниже
+2. Для технических характеристик цитируй точные данные (вес, размеры, маркировку)
+3. Если в каталоге нет информации - честно скажи об этом
+4. Всегда указывай артикул/маркировку продукции
+5. Объясняй технические термины понятным языком
+6. Структурируй ответы: характеристики, применение, преимущества
+
+КОНТЕКСТ ИЗ ТЕХНИЧЕСКОГО КАТАЛОГА:
+{context}
+
+Используй этот контекст для точного и профессионального ответа."""
+
+# Prompt is split once so each request only concatenates the context in
+_SYSTEM_PROMPT_PREFIX, _, _SYSTEM_PROMPT_SUFFIX = RAG_SYSTEM_PROMPT.partition("{context}")
 
 
 async def query_knowledge_base(
@@ -32,9 +70,18 @@ async def query_knowledge_base(
         Generated response based on retrieved context
     """
     try:
+        # Answers depend on recent history, so it scopes the cache (see _history_scope)
+        scope = _history_scope(conversation_history)
+        
+        cached = response_cache.get(query, scope=scope)
+        if cached is not None:
+            logger.debug("RAG cache hit for: %s", query)
+            return cached
+        
         # Search for relevant documents
-        logger.debug(f"Searching knowledge base for: {query} (provider: {API_PROVIDER})")
+        logger.debug("Searching knowledge base for: %s (provider: %s)", query, API_PROVIDER)
         
+        embedding = None
         if API_PROVIDER == "yandex":
             # Keyword-based search for Yandex
             relevant_chunks = knowledge_index.keyword_retrieve(query, top_k=RAG_TOP_K)
@@ -43,17 +90,33 @@ async def query_knowledge_base(
                 logger.warning("No relevant documents found, using fallback")
                 return await _fallback_response(query, conversation_history)
             
+            if RAG_COMPRESS:
+                relevant_chunks = [compress_chunk(chunk, query) for chunk in relevant_chunks]
             context = "\n\n".join(relevant_chunks)
+            sources = []
         else:
+            # Embed once: the same vector serves the cache and the search
+            embedding = await query_embedder.embed(query)
+            
+            cached = response_cache.get(query, embedding=embedding, scope=scope)
+            if cached is not None:
+                logger.debug("RAG semantic cache hit for: %s", query)
+                return cached
+            
             # Vector-based search for OpenAI
-            results = knowledge_index.similarity_search_with_score(query, k=RAG_TOP_K)
+            results = await asyncio.to_thread(
+                knowledge_index.similarity_search_by_vector_with_score,
+                embedding,
+                RAG_TOP_K
+            )
             
             if not results:
                 logger.warning("No relevant documents found, using fallback")
                 return await _fallback_response(query, conversation_history)
             
             # Prepare context from retrieved documents
-            context = _prepare_context(results)
+            context = _prepare_context(results, query if RAG_COMPRESS else None)
+            sources = [doc.metadata.get('source') for doc, _ in results]
         
         # Generate response with context
         response = await _generate_rag_response(
@@ -62,35 +125,58 @@ async def query_knowledge_base(
             conversation_history=conversation_history
         )
         
+        response_cache.put(query, response, sources, embedding=embedding, scope=scope)
+        
         return response
         
     except Exception as e:
-        logger.error(f"Error querying knowledge base: {e}")
+        logger.error("Error querying knowledge base: %s", e)
         # Fallback to regular GPT response
         return await _fallback_response(query, conversation_history)
 
 
-def _prepare_context(results: List[tuple]) -> str:
+def _history_scope(conversation_history: Optional[List[Dict]]) -> str:
+    """
+    Digest the part of the history that is sent with a RAG prompt.
+    
+    The scope is deliberately narrow: the RAG prompt carries the last
+    HISTORY_WINDOW messages, so a follow-up such as "а сколько он весит?"
+    means something different in every conversation. Both cache tiers
+    therefore mostly serve first questions of a conversation, where the
+    scope is empty and shared by all users. Documents need no scope: any
+    upload or removal clears the cache.
+    """
+    if not conversation_history:
+        return ""
+    recent = orjson.dumps(conversation_history[-HISTORY_WINDOW:], option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(recent, digest_size=16).hexdigest()
+
+
+def _prepare_context(results: List[tuple], query: Optional[str] = None) -> str:
     """
     Prepare context from search results.
     
     Args:
         results: List of (document, score) tuples
+        query: If given, chunks are compressed to the parts relevant to it
     
     Returns:
-        Formatted context string
+        Formatted context string with duplicate chunks removed
     """
-    context_parts = []
-    
-    for i, (doc, score) in enumerate(results, 1):
-        source = doc.metadata.get('source', 'Unknown')
+    # The same chunk can be retrieved more than once (e.g. a document indexed twice)
+    unique_chunks = []
+    seen = set()
+    for doc, _ in results:
         content = doc.page_content.strip()
-        
-        context_parts.append(
-            f"[Источник {i}: {source}]\n{content}\n"
-        )
+        if content in seen:
+            continue
+        seen.add(content)
+        unique_chunks.append((doc.metadata.get('source', 'Unknown'), content))
     
-    return "\n".join(context_parts)
+    return "\n".join(
+        f"[Источник {i}: {source}]\n{compress_chunk(content, query) if query else content}\n"
+        for i, (source, content) in enumerate(unique_chunks, 1)
+    )
 
 
 async def _generate_rag_response(
@@ -109,42 +195,18 @@ async def _generate_rag_response(
     Returns:
         Generated response
     """
-    # Build prompt with context
-    system_prompt = """Ты - технический консультант-эксперт по люкам и дождеприемникам компании "ЛИТЛИДЕР".
-
-ТВОЯ РОЛЬ:
-- Помогаешь инженерам, проектировщикам, прорабам и снабженцам подбирать продукцию
-- Расшифровываешь технические маркировки типа ТМ(Д400)-2-7-9-60
-- Предоставляешь точные технические характеристики, веса, размеры
-- Объясняешь различия между типами продукции (плавающие/обычные люки, классы нагрузки)
-- Помогаешь с подбором оборудования для конкретных условий эксплуатации
-
-ВАЖНЫЕ ПРАВИЛА:
-1. Используй ТОЛЬКО информацию из технического каталога ниже
-2. Для технических характеристик цитируй точные данные (вес, размеры, маркировку)
-3. Если в каталоге нет информации - честно скажи об этом
-4. Всегда указывай артикул/маркировку продукции
-5. Объясняй технические термины понятным языком
-6. Структурируй ответы: характеристики, применение, преимущества
-
-КОНТЕКСТ ИЗ ТЕХНИЧЕСКОГО КАТАЛОГА:
-{context}
-
-Используй этот контекст для точного и профессионального ответа."""
-    
     # Prepare messages
     messages = [
         {
             "role": "system",
-            "content": system_prompt.format(context=context)
+            "content": _SYSTEM_PROMPT_PREFIX + context + _SYSTEM_PROMPT_SUFFIX
         }
     ]
     
     # Add conversation history if available
     if conversation_history:
         # Limit history to avoid token limits
-        recent_history = conversation_history[-6:]  # Last 3 exchanges
-        messages.extend(recent_history)
+        messages.extend(conversation_history[-HISTORY_WINDOW:])
     
     # Add current query
     messages.append({
@@ -186,7 +248,7 @@ async def _fallback_response(
     messages = [system_message]
     
     if conversation_history:
-        messages.extend(conversation_history[-6:])
+        messages.extend(conversation_history[-HISTORY_WINDOW:])
     
     messages.append({
         "role": "user",
@@ -209,7 +271,6 @@ async def add_document_to_knowledge_base(file_path: str) -> dict:
         Dictionary with status and details
     """
     try:
-        from pathlib import Path
         from rag.loader import document_loader
         
         # Load document
@@ -229,7 +290,7 @@ async def add_document_to_knowledge_base(file_path: str) -> dict:
         
         knowledge_index.add_documents(documents)
         
-        logger.info(f"Added {file_path.name} to knowledge base")
+        logger.info("Added %s to knowledge base", file_path.name)
         
         return {
             "success": True,
@@ -239,7 +300,7 @@ async def add_document_to_knowledge_base(file_path: str) -> dict:
         }
         
     except Exception as e:
-        logger.error(f"Error adding document to knowledge base: {e}")
+        logger.error("Error adding document to knowledge base: %s", e)
         return {
             "success": False,
             "error": str(e),
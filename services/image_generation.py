@@ -3,20 +3,113 @@ Image Generation Service.
 Uses OpenAI DALL-E API to generate images from text prompts.
 """
 
+import asyncio
 import aiohttp
-import aiofiles
+import hashlib
+import itertools
+import os
+import shutil
+import time
+import re
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any
-from datetime import datetime
-import json
+from typing import Optional, Dict, Any, List
+import orjson
 
 from config import OPENAI_API_KEY, OPENAI_BASE_URL, USE_PROXYAPI, DATA_DIR
 from utils.logging import logger
+from utils.ratelimit import openai_limiter
+from utils.http import request_with_retry, download_to_file, read_error_body
+from utils.helpers import cleanup_files_async, evict_lru_files, read_file_async, unique_id
 
 
 # Create temp directory for generated images
 GENERATED_IMAGES_DIR = DATA_DIR / "generated_images"
-GENERATED_IMAGES_DIR.mkdir(exist_ok=True)
+GENERATED_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+
+# Content-addressed cache of generated images: {key}.png + {key}.json sidecar
+IMAGE_CACHE_DIR = GENERATED_IMAGES_DIR / "cache"
+IMAGE_CACHE_DIR.mkdir(exist_ok=True)
+IMAGE_CACHE_MAX_FILES = 256
+
+# Endpoints (OPENAI_BASE_URL points to ProxyAPI when enabled) and request headers
+GENERATIONS_URL = f"{OPENAI_BASE_URL}/images/generations"
+VARIATIONS_URL = f"{OPENAI_BASE_URL}/images/variations"
+_AUTH_HEADERS = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+_JSON_HEADERS = {**_AUTH_HEADERS, "Content-Type": "application/json"}
+
+# Per-process sequence keeps generated filenames unique under concurrency
+_image_counter = itertools.count()
+
+# Keywords that strongly suggest image generation
+STRONG_KEYWORDS = (
+    'нарисуй', 'сгенерируй изображение', 'создай картинку', 'сделай изображение',
+    'покажи как выглядит', 'визуализируй', 'нарисовать', 'создать изображение',
+    'generate image', 'draw', 'create picture', 'make image', 'show me what',
+    'сгенерируй картинку', 'создай изображение', 'сделай картинку'
+)
+
+
+def _trie_pattern(words) -> str:
+    """
+    Build a regex matching any of the words, factored by common prefixes.
+    
+    Python's re tries alternatives one by one, so a trie-shaped pattern
+    rejects a position after a single character test instead of one per word.
+    Only presence matters, so words extending a shorter keyword are dropped.
+    
+    Args:
+        words: Literal words to match
+    
+    Returns:
+        Regex pattern string
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def emit(node: Dict[str, dict]) -> str:
+        if '' in node:
+            return ''
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    
+    return emit(trie)
+
+
+# Word stems without which a message is never an image request
+TRIGGER_STEMS = (
+    'рису', 'рисов', 'изображ', 'картин', 'визуализ', 'генер', 'покаж', 'показ',
+    'выгляд', 'фото', 'иллюстр', 'эскиз', 'логотип',
+    'draw', 'paint', 'sketch', 'image', 'picture', 'photo', 'illustrat',
+    'render', 'visualiz', 'look like', 'logo'
+)
+
+# Matched against casefolded text
+_STRONG_KEYWORD_RE = re.compile(_trie_pattern(keyword.casefold() for keyword in STRONG_KEYWORDS))
+_TRIGGER_RE = re.compile(_trie_pattern(TRIGGER_STEMS))
+
+# LRU cache of LLM intent decisions, keyed by normalized message text
+INTENT_CACHE_SIZE = 4096
+_intent_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+# Detections in flight, so concurrent identical messages share one call
+_intent_pending: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+@lru_cache(maxsize=INTENT_CACHE_SIZE)
+def has_strong_keyword(text: str) -> bool:
+    """Check whether text contains an explicit image generation keyword."""
+    return _STRONG_KEYWORD_RE.search(text.casefold()) is not None
+
+
+@lru_cache(maxsize=INTENT_CACHE_SIZE)
+def has_trigger_stem(text: str) -> bool:
+    """Check whether text could be an image request at all."""
+    return _TRIGGER_RE.search(text.casefold()) is not None
 
 
 async def detect_image_generation_intent(text: str, conversation_history: list = None) -> Dict[str, Any]:
@@ -30,19 +123,56 @@ async def detect_image_generation_intent(text: str, conversation_history: list =
     Returns:
         Dictionary with 'needs_generation' (bool) and 'prompt' (str) if detected
     """
-    from services.openai_client import openai_client
+    # An explicit keyword is decisive, so the LLM is only asked about ambiguous text
+    if has_strong_keyword(text):
+        logger.info("Image generation detected by keyword")
+        return {
+            "needs_generation": True,
+            "prompt": text,
+            "confidence": 0.95
+        }
+    
+    # Most messages mention nothing visual; skip the LLM round-trip for them
+    if not has_trigger_stem(text):
+        return {
+            "needs_generation": False,
+            "confidence": 0.0
+        }
     
-    # Keywords that strongly suggest image generation
-    strong_keywords = [
-        'нарисуй', 'сгенерируй изображение', 'создай картинку', 'сделай изображение',
-        'покажи как выглядит', 'визуализируй', 'нарисовать', 'создать изображение',
-        'generate image', 'draw', 'create picture', 'make image', 'show me what',
-        'сгенерируй картинку', 'создай изображение', 'сделай картинку'
-    ]
+    # The detection prompt depends only on the text, so repeats are served from cache
+    key = _intent_key(text)
+    cached = _intent_cache.get(key)
+    if cached is not None:
+        _intent_cache.move_to_end(key)
+        return dict(cached)
     
-    # Quick check for strong keywords
-    text_lower = text.lower()
-    has_strong_keyword = any(keyword in text_lower for keyword in strong_keywords)
+    # Identical messages arriving together share one LLM call
+    task = _intent_pending.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_classify_intent(text, key))
+        _intent_pending[key] = task
+        task.add_done_callback(lambda _: _intent_pending.pop(key, None))
+    
+    return dict(await asyncio.shield(task))
+
+
+def _intent_key(text: str) -> str:
+    """Normalize message text for the intent cache."""
+    return " ".join(text.casefold().split())
+
+
+async def _classify_intent(text: str, key: str) -> Dict[str, Any]:
+    """
+    Ask the LLM whether text is an image generation request.
+    
+    Args:
+        text: User's message text
+        key: Intent cache key for the text
+    
+    Returns:
+        Dictionary with 'needs_generation', 'confidence' and optional 'prompt'
+    """
+    from services.openai_client import openai_client
     
     # Build detection prompt
     detection_prompt = f"""Определи, хочет ли пользователь сгенерировать изображение.
@@ -70,39 +200,25 @@ async def detect_image_generation_intent(text: str, conversation_history: list =
     try:
         # Get AI decision
         messages = [{"role": "user", "content": detection_prompt}]
-        response = await openai_client.generate_text_response(messages, temperature=0.3)
-        
-        # Parse JSON response
-        # Remove markdown code blocks if present
-        response_clean = response.strip()
-        if response_clean.startswith('```'):
-            # Remove ```json or ``` at start and ``` at end
-            lines = response_clean.split('\n')
-            response_clean = '\n'.join(lines[1:-1]) if len(lines) > 2 else response_clean
+        response = await openai_client.generate_text_response(
+            messages,
+            temperature=0.3,
+            response_format={"type": "json_object"}
+        )
         
-        result = json.loads(response_clean)
+        # JSON mode guarantees a bare JSON object, no markdown fences
+        result = orjson.loads(response)
         
-        # If strong keyword found but AI said no, trust the keyword
-        if has_strong_keyword and not result.get('needs_generation'):
-            result['needs_generation'] = True
-            # If no prompt provided, use original text
-            if not result.get('prompt'):
-                result['prompt'] = text
+        logger.info("Image generation detection: %s (confidence: %s)", result.get('needs_generation'), result.get('confidence', 0))
         
-        logger.info(f"Image generation detection: {result.get('needs_generation')} (confidence: {result.get('confidence', 0)})")
+        _intent_cache[key] = dict(result)
+        if len(_intent_cache) > INTENT_CACHE_SIZE:
+            _intent_cache.popitem(last=False)
         
         return result
         
     except Exception as e:
-        logger.error(f"Error detecting image generation intent: {e}")
-        
-        # Fallback: use keyword detection
-        if has_strong_keyword:
-            return {
-                "needs_generation": True,
-                "prompt": text,
-                "confidence": 0.8
-            }
+        logger.error("Error detecting image generation intent: %s", e)
         
         return {
             "needs_generation": False,
@@ -110,6 +226,93 @@ async def detect_image_generation_intent(text: str, conversation_history: list =
         }
 
 
+def _new_image_path() -> Path:
+    """Build a unique path for a generated image."""
+    filename = f"generated_{time.time_ns():x}_{next(_image_counter):x}.png"
+    return GENERATED_IMAGES_DIR / filename
+
+
+def _image_cache_key(prompt: str, size: str, quality: str, style: str) -> str:
+    """Hash the normalized generation parameters into a cache key."""
+    params = {
+        "prompt": " ".join(prompt.split()),
+        "size": size,
+        "quality": quality,
+        "style": style
+    }
+    return hashlib.sha256(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def _place_file(source: Path, destination: Path):
+    """Hard-link source to destination, copying if linking is not possible."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def _read_image_cache(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a cached image.
+    
+    Callers delete the returned image after sending it, so the cached
+    file is handed out as a fresh link under GENERATED_IMAGES_DIR.
+    
+    Args:
+        key: Cache key from _image_cache_key
+    
+    Returns:
+        Result dictionary like generate_image, or None on miss
+    """
+    cached_image = IMAGE_CACHE_DIR / f"{key}.png"
+    sidecar = IMAGE_CACHE_DIR / f"{key}.json"
+    
+    try:
+        meta = orjson.loads(sidecar.read_bytes())
+        image_path = _new_image_path()
+        _place_file(cached_image, image_path)
+        # Touch for LRU eviction
+        os.utime(cached_image)
+    except (OSError, ValueError):
+        return None
+    
+    return {
+        "image_path": image_path,
+        "revised_prompt": meta.get("revised_prompt"),
+        "url": meta.get("url"),
+        "cached": True
+    }
+
+
+def _write_image_cache(key: str, image_path: Path, meta: Dict[str, Any]):
+    """
+    Store a generated image and its metadata, then evict old entries.
+    
+    Args:
+        key: Cache key from _image_cache_key
+        image_path: Downloaded image
+        meta: Sidecar data (revised_prompt, url)
+    """
+    cached_image = IMAGE_CACHE_DIR / f"{key}.png"
+    sidecar = IMAGE_CACHE_DIR / f"{key}.json"
+    suffix = f".{unique_id()}.tmp"
+    tmp_image = cached_image.with_name(cached_image.name + suffix)
+    tmp_sidecar = sidecar.with_name(sidecar.name + suffix)
+    
+    try:
+        _place_file(image_path, tmp_image)
+        tmp_sidecar.write_bytes(orjson.dumps(meta))
+        # Image first: a sidecar is only visible once its image exists
+        os.replace(tmp_image, cached_image)
+        os.replace(tmp_sidecar, sidecar)
+    except OSError:
+        tmp_image.unlink(missing_ok=True)
+        tmp_sidecar.unlink(missing_ok=True)
+        raise
+    
+    evict_lru_files(IMAGE_CACHE_DIR, ".png", IMAGE_CACHE_MAX_FILES, companions=(".json",))
+
+
 async def generate_image(
     prompt: str,
     size: str = "1024x1024",
@@ -129,14 +332,17 @@ async def generate_image(
         Dictionary with 'image_path', 'revised_prompt', and 'url'
     """
     try:
-        logger.info(f"Generating image with DALL-E: {prompt[:100]}...")
+        # Same prompt and parameters were generated before: serve from disk
+        cache_key = _image_cache_key(prompt, size, quality, style)
+        cached = await asyncio.to_thread(_read_image_cache, cache_key)
+        if cached is not None:
+            logger.info("Image cache hit for prompt: %.100s...", prompt)
+            cached["original_prompt"] = prompt
+            return cached
         
-        # Prepare API request
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json"
-        }
+        logger.info("Generating image with DALL-E: %.100s...", prompt)
         
+        # Prepare API request
         payload = {
             "model": "dall-e-3",
             "prompt": prompt,
@@ -146,33 +352,41 @@ async def generate_image(
             "style": style
         }
         
-        # Determine API URL based on ProxyAPI usage
-        api_url = f"{OPENAI_BASE_URL}/images/generations"
-        
         # Make API request
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                api_url,
-                headers=headers,
-                json=payload
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    logger.error(f"DALL-E API error: {error_text}")
-                    raise Exception(f"DALL-E API error: {response.status}")
-                
-                result = await response.json()
+        async with request_with_retry(
+            "POST",
+            GENERATIONS_URL,
+            limiter=openai_limiter,
+            headers=_JSON_HEADERS,
+            json=payload
+        ) as response:
+            if response.status != 200:
+                error_text = await read_error_body(response)
+                logger.error("DALL-E API error: %s", error_text)
+                raise Exception(f"DALL-E API error: {response.status}")
+            
+            result = orjson.loads(await response.read())
         
         # Extract image data
         image_data = result['data'][0]
         image_url = image_data['url']
         revised_prompt = image_data.get('revised_prompt', prompt)
         
-        logger.info(f"Image generated successfully. Revised prompt: {revised_prompt[:100]}...")
+        logger.info("Image generated successfully. Revised prompt: %.100s...", revised_prompt)
         
         # Download image
         image_path = await download_image(image_url)
         
+        try:
+            await asyncio.to_thread(
+                _write_image_cache,
+                cache_key,
+                image_path,
+                {"revised_prompt": revised_prompt, "url": image_url}
+            )
+        except OSError as e:
+            logger.warning("Could not cache generated image: %s", e)
+        
         return {
             "image_path": image_path,
             "revised_prompt": revised_prompt,
@@ -181,7 +395,7 @@ async def generate_image(
         }
         
     except Exception as e:
-        logger.error(f"Error generating image: {e}")
+        logger.error("Error generating image: %s", e)
         raise
 
 
@@ -196,29 +410,44 @@ async def download_image(url: str) -> Path:
         Path to downloaded image
     """
     try:
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"generated_{timestamp}.png"
-        filepath = GENERATED_IMAGES_DIR / filename
+        filepath = _new_image_path()
         
-        # Download image
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to download image: {response.status}")
-                
-                # Save to file
-                async with aiofiles.open(filepath, 'wb') as f:
-                    await f.write(await response.read())
+        # Download image over the shared keep-alive session
+        await download_to_file(url, filepath)
         
-        logger.info(f"Image downloaded to: {filepath}")
+        logger.info("Image downloaded to: %s", filepath)
         return filepath
         
     except Exception as e:
-        logger.error(f"Error downloading image: {e}")
+        logger.error("Error downloading image: %s", e)
         raise
 
 
+async def download_images(urls: List[str]) -> List[Path]:
+    """
+    Download several images concurrently.
+    
+    If any download fails, the images that did download are removed.
+    
+    Args:
+        urls: Image URLs
+    
+    Returns:
+        Paths to downloaded images, in the order of urls
+    """
+    downloads = await asyncio.gather(
+        *(download_image(url) for url in urls),
+        return_exceptions=True
+    )
+    paths = [path for path in downloads if isinstance(path, Path)]
+    errors = [error for error in downloads if isinstance(error, BaseException)]
+    if errors:
+        await cleanup_files_async(*paths)
+        raise errors[0]
+    
+    return paths
+
+
 async def generate_image_variations(
     image_path: Path,
     n: int = 1,
@@ -236,49 +465,45 @@ async def generate_image_variations(
         List of paths to generated variations
     """
     try:
-        logger.info(f"Generating {n} variations of image: {image_path}")
+        logger.info("Generating %s variations of image: %s", n, image_path)
         
         # Prepare multipart form data
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}"
-        }
-        
-        data = aiohttp.FormData()
-        data.add_field('image', 
-                      open(image_path, 'rb'),
-                      filename=image_path.name,
-                      content_type='image/png')
-        data.add_field('n', str(n))
-        data.add_field('size', size)
+        # DALL-E accepts images up to 4 MB, so reading it whole is fine
+        image_bytes = await read_file_async(image_path)
         
-        # Determine API URL based on ProxyAPI usage
-        api_url = f"{OPENAI_BASE_URL}/images/variations"
+        # FormData can only be sent once, so it is rebuilt for every retry
+        def build_form() -> aiohttp.FormData:
+            data = aiohttp.FormData()
+            data.add_field('image', 
+                          image_bytes,
+                          filename=image_path.name,
+                          content_type='image/png')
+            data.add_field('n', str(n))
+            data.add_field('size', size)
+            return data
         
         # Make API request
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                api_url,
-                headers=headers,
-                data=data
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    logger.error(f"DALL-E variations API error: {error_text}")
-                    raise Exception(f"API error: {response.status}")
-                
-                result = await response.json()
+        async with request_with_retry(
+            "POST",
+            VARIATIONS_URL,
+            limiter=openai_limiter,
+            headers=_AUTH_HEADERS,
+            data=build_form
+        ) as response:
+            if response.status != 200:
+                error_text = await read_error_body(response)
+                logger.error("DALL-E variations API error: %s", error_text)
+                raise Exception(f"API error: {response.status}")
+            
+            result = orjson.loads(await response.read())
         
-        # Download all variations
-        variation_paths = []
-        for i, image_data in enumerate(result['data']):
-            url = image_data['url']
-            path = await download_image(url)
-            variation_paths.append(path)
+        # Download all variations concurrently
+        variation_paths = await download_images([image_data['url'] for image_data in result['data']])
         
-        logger.info(f"Generated {len(variation_paths)} variations successfully")
+        logger.info("Generated %s variations successfully", len(variation_paths))
         return variation_paths
         
     except Exception as e:
-        logger.error(f"Error generating variations: {e}")
+        logger.error("Error generating variations: %s", e)
         raise
 
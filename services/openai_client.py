@@ -3,8 +3,14 @@ OpenAI Client for the Personal Assistant Bot.
 Provides methods for text generation, vision, STT, and TTS.
 """
 
-from typing import List, Dict, Optional
-from openai import AsyncOpenAI
+import asyncio
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+from typing import AsyncIterator, List, Dict, Optional
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from pathlib import Path
 
 from config import (
@@ -16,9 +22,24 @@ from config import (
     TTS_MODEL,
     VISION_MODEL,
     TEMPERATURE,
-    MAX_TOKENS
+    MAX_TOKENS,
+    DATA_DIR
 )
 from utils.logging import logger
+from utils.ratelimit import openai_limiter
+from utils.helpers import evict_lru_files, unique_id
+
+
+# Connection pool settings; idle connections are kept well past the SDK's 5 s default
+OPENAI_POOL_LIMIT = 64
+OPENAI_KEEPALIVE_EXPIRY = 75
+
+# Synthesized speech cache for short, often repeated phrases (greetings, error replies).
+# A phrase is stored only when requested a second time, so one-off answer sentences are not.
+TTS_CACHE_DIR = DATA_DIR / "tts_cache"
+TTS_CACHE_MAX_CHARS = 300
+TTS_CACHE_MAX_FILES = 500
+TTS_SEEN_PHRASES = 4096  # Phrases remembered (by hash) while waiting for a repeat
 
 
 class OpenAIClient:
@@ -28,22 +49,31 @@ class OpenAIClient:
         """Initialize the OpenAI client."""
         self.client = AsyncOpenAI(
             api_key=OPENAI_API_KEY,
-            base_url=OPENAI_BASE_URL
+            base_url=OPENAI_BASE_URL,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_POOL_LIMIT,
+                    max_keepalive_connections=OPENAI_POOL_LIMIT,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+                )
+            )
         )
         
         if USE_PROXYAPI:
-            logger.info(f"OpenAI client initialized with ProxyAPI: {OPENAI_BASE_URL}")
+            logger.info("OpenAI client initialized with ProxyAPI: %s", OPENAI_BASE_URL)
         else:
             logger.info("OpenAI client initialized with direct API")
         
         self.use_proxyapi = USE_PROXYAPI
+        self._tts_seen: OrderedDict = OrderedDict()
     
     async def generate_text_response(
         self,
         messages: List[Dict[str, str]],
         model: str = GPT_MODEL,
         temperature: float = TEMPERATURE,
-        max_tokens: int = MAX_TOKENS
+        max_tokens: int = MAX_TOKENS,
+        response_format: Optional[Dict[str, str]] = None
     ) -> str:
         """
         Generate text response using GPT model.
@@ -53,25 +83,75 @@ class OpenAIClient:
             model: Model to use
             temperature: Response randomness (0-2)
             max_tokens: Maximum tokens in response
+            response_format: Output format, e.g. {"type": "json_object"}
         
         Returns:
             Generated text response
         """
         try:
-            logger.debug(f"Generating text response with {model}")
-            response = await self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
+            logger.debug("Generating text response with %s", model)
+            extra = {"response_format": response_format} if response_format else {}
+            async with openai_limiter:
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **extra
+                )
             
             result = response.choices[0].message.content
-            logger.info(f"Generated response: {len(result)} characters")
+            logger.info("Generated response: %s characters", len(result))
             return result
             
         except Exception as e:
-            logger.error(f"Error generating text response: {e}")
+            logger.error("Error generating text response: %s", e)
+            raise
+    
+    async def generate_text_response_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = GPT_MODEL,
+        temperature: float = TEMPERATURE,
+        max_tokens: int = MAX_TOKENS
+    ) -> AsyncIterator[str]:
+        """
+        Generate text response, yielding pieces as the model produces them.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            model: Model to use
+            temperature: Response randomness (0-2)
+            max_tokens: Maximum tokens in response
+        
+        Yields:
+            Response text fragments
+        """
+        try:
+            logger.debug("Streaming text response with %s", model)
+            async with openai_limiter:
+                stream = await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    stream=True
+                )
+            
+            length = 0
+            async with stream:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        length += len(content)
+                        yield content
+            
+            logger.info("Streamed response: %s characters", length)
+        
+        except Exception as e:
+            logger.error("Error streaming text response: %s", e)
             raise
     
     async def analyze_image(
@@ -92,30 +172,31 @@ class OpenAIClient:
             Image analysis result
         """
         try:
-            logger.debug(f"Analyzing image with {model}")
-            response = await self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": image_url}
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=MAX_TOKENS
-            )
+            logger.debug("Analyzing image with %s", model)
+            async with openai_limiter:
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {"url": image_url}
+                                }
+                            ]
+                        }
+                    ],
+                    max_tokens=MAX_TOKENS
+                )
             
             result = response.choices[0].message.content
-            logger.info(f"Image analyzed: {len(result)} characters")
+            logger.info("Image analyzed: %s characters", len(result))
             return result
             
         except Exception as e:
-            logger.error(f"Error analyzing image: {e}")
+            logger.error("Error analyzing image: %s", e)
             raise
     
     async def transcribe_audio(
@@ -134,20 +215,55 @@ class OpenAIClient:
             Transcribed text
         """
         try:
-            logger.debug(f"Transcribing audio: {audio_file_path}")
+            logger.debug("Transcribing audio: %s", audio_file_path)
+            
+            async with openai_limiter:
+                with open(audio_file_path, "rb") as audio_file:
+                    response = await self.client.audio.transcriptions.create(
+                        model=model,
+                        file=audio_file,
+                        response_format="text"
+                    )
+            
+            logger.info("Audio transcribed: %s characters", len(response))
+            return response
+        
+        except Exception as e:
+            logger.error("Error transcribing audio: %s", e)
+            raise
+    
+    async def transcribe_audio_bytes(
+        self,
+        audio_data: bytes,
+        filename: str = "audio.wav",
+        model: str = WHISPER_MODEL
+    ) -> str:
+        """
+        Transcribe in-memory audio to text using Whisper.
+        
+        Args:
+            audio_data: Raw audio bytes
+            filename: Upload name; its extension tells Whisper the format
+            model: Whisper model to use
+        
+        Returns:
+            Transcribed text
+        """
+        try:
+            logger.debug("Transcribing %s bytes of audio", len(audio_data))
             
-            with open(audio_file_path, "rb") as audio_file:
+            async with openai_limiter:
                 response = await self.client.audio.transcriptions.create(
                     model=model,
-                    file=audio_file,
+                    file=(filename, audio_data),
                     response_format="text"
                 )
             
-            logger.info(f"Audio transcribed: {len(response)} characters")
+            logger.info("Audio transcribed: %s characters", len(response))
             return response
-            
+        
         except Exception as e:
-            logger.error(f"Error transcribing audio: {e}")
+            logger.error("Error transcribing audio: %s", e)
             raise
     
     async def generate_speech(
@@ -168,31 +284,88 @@ class OpenAIClient:
         
         Returns:
             Path to generated audio file
+        
+        Short phrases requested repeatedly are cached on disk; a cached phrase
+        is copied to the output path without an API request. The returned file
+        always belongs to the caller.
         """
         try:
-            logger.debug(f"Generating speech with voice: {voice}")
-            
-            response = await self.client.audio.speech.create(
-                model=model,
-                voice=voice,
-                input=text
-            )
+            logger.debug("Generating speech with voice: %s", voice)
             
             # Default output path
             if output_path is None:
-                from config import DATA_DIR
-                import uuid
-                output_path = DATA_DIR / f"tts_{uuid.uuid4()}.mp3"
+                output_path = DATA_DIR / f"tts_{unique_id()}.mp3"
+            
+            cache_path = None
+            if len(text) <= TTS_CACHE_MAX_CHARS:
+                digest = hashlib.blake2b(f"{model}|{voice}|{text}".encode(), digest_size=16).hexdigest()
+                cache_path = TTS_CACHE_DIR / f"{digest}.mp3"
+                try:
+                    await asyncio.to_thread(self._copy_cached_speech, cache_path, output_path)
+                    logger.info("Speech served from cache: %s", output_path)
+                    return output_path
+                except FileNotFoundError:
+                    # Cache only phrases that come back; first-time ones are just remembered
+                    if not self._seen_before(digest):
+                        cache_path = None
+            
+            async with openai_limiter:
+                response = await self.client.audio.speech.create(
+                    model=model,
+                    voice=voice,
+                    input=text
+                )
             
-            # Save audio to file
-            response.stream_to_file(str(output_path))
+            # Save audio to file off the event loop
+            await asyncio.to_thread(response.stream_to_file, str(output_path))
             
-            logger.info(f"Speech generated: {output_path}")
+            if cache_path is not None:
+                await asyncio.to_thread(self._cache_speech, output_path, cache_path)
+            
+            logger.info("Speech generated: %s", output_path)
             return output_path
             
         except Exception as e:
-            logger.error(f"Error generating speech: {e}")
+            logger.error("Error generating speech: %s", e)
             raise
+    
+    def _seen_before(self, digest: str) -> bool:
+        """Remember a phrase hash; True if the phrase was requested recently."""
+        if digest in self._tts_seen:
+            del self._tts_seen[digest]
+            return True
+        self._tts_seen[digest] = None
+        if len(self._tts_seen) > TTS_SEEN_PHRASES:
+            self._tts_seen.popitem(last=False)
+        return False
+    
+    @staticmethod
+    def _copy_cached_speech(cache_path: Path, output_path: Path) -> None:
+        """Copy cached speech to the output path and mark it recently used."""
+        shutil.copyfile(cache_path, output_path)
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+    
+    @staticmethod
+    def _cache_speech(audio_path: Path, cache_path: Path) -> None:
+        """Store generated speech in the cache; failures are logged, not raised."""
+        tmp_path = cache_path.with_name(f"{cache_path.stem}.{unique_id()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(audio_path, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            logger.warning("Could not cache speech %s: %s", cache_path.name, e)
+            return
+        
+        evict_lru_files(cache_path.parent, ".mp3", TTS_CACHE_MAX_FILES)
+    
+    async def close(self):
+        """Close pooled connections."""
+        await self.client.close()
 
 
 # Global client instance
@@ -3,17 +3,21 @@ Request Router.
 Routes different types of requests to appropriate handlers.
 """
 
-from typing import Dict, Any, Optional
+import asyncio
+import re
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 
+import aiohttp
+
 from utils.logging import logger
-from utils.helpers import user_sessions
+from utils.helpers import user_sessions, cleanup_files_async, concat_audio_files
 from config import BotMode, API_PROVIDER
 
 # Условные импорты в зависимости от провайдера
 if API_PROVIDER == "yandex":
     from services.yandex_client import yandex_gpt_client as ai_client
-    from services.stt import transcribe_voice_message
+    from services.stt import transcribe_voice_message, transcribe_voice_bytes
     from services.tts import generate_voice_response
     from services.vision import analyze_image
     # Для Yandex генерация изображений пока не поддерживается напрямую
@@ -21,28 +25,89 @@ if API_PROVIDER == "yandex":
     generate_image = None
 else:
     from services.openai_client import openai_client as ai_client
-    from services.stt import transcribe_voice_message
+    from services.stt import transcribe_voice_message, transcribe_voice_bytes
     from services.tts import generate_voice_response
     from services.vision import analyze_image
     from services.image_generation import detect_image_generation_intent, generate_image
 
 
+# Sentence boundary in a streamed answer; each finished sentence can be voiced
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?…])\s+')
+
+# Text requests being processed, keyed by (user_id, text, mode)
+_inflight: Dict[Tuple[int, str, Optional[str]], asyncio.Future] = {}
+
+
 async def route_text_request(
     user_id: int,
     text: str,
-    mode: Optional[str] = None
+    mode: Optional[str] = None,
+    voice: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Route text request to appropriate handler.
     
+    An identical request from the same user that arrives while the first one
+    is still processed (double send, retry) shares its result instead of
+    running the pipeline again.
+    
     Args:
         user_id: User ID
         text: User's text message
         mode: Bot mode (text, rag, etc.)
+        voice: Voice for a spoken answer; when set, the answer is voiced as it streams
     
     Returns:
         Response dictionary with 'text' and optional 'voice_path' and 'image_path'
     """
+    if voice is not None:
+        # Voice files belong to one reply and are never shared
+        return await _route_text_request(user_id, text, mode, voice)
+    
+    key = (user_id, text, mode)
+    shared = _inflight.get(key)
+    if shared is not None:
+        logger.info("Joining in-flight text request for user %s", user_id)
+        try:
+            response = await asyncio.shield(shared)
+        except asyncio.CancelledError:
+            if not shared.cancelled():
+                raise
+            return await _route_text_request(user_id, text, mode)
+        if response.get('has_image'):
+            # The image is sent and cleaned up by the first request
+            return {
+                "text": "🎨 Это изображение уже создаётся по вашему предыдущему сообщению.",
+                "has_image": False
+            }
+        return dict(response)
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        response = await _route_text_request(user_id, text, mode)
+        future.set_result(response)
+        return response
+    except BaseException as e:
+        if isinstance(e, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(e)
+            # Joined callers re-raise it; don't warn when there are none
+            future.exception()
+        raise
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+async def _route_text_request(
+    user_id: int,
+    text: str,
+    mode: Optional[str] = None,
+    voice: Optional[str] = None
+) -> Dict[str, Any]:
+    """Process a text request; see route_text_request."""
     try:
         # Determine mode
         if mode is None:
@@ -51,14 +116,25 @@ async def route_text_request(
         # Get conversation history
         history = user_sessions.get_history(user_id)
         
-        # Check if user wants to generate an image (only for OpenAI)
-        image_intent = None
-        if detect_image_generation_intent is not None:
-            image_intent = await detect_image_generation_intent(text, history)
+        # Start the text answer while intent detection runs; dropped if an image is wanted
+        if voice is None:
+            reply_task = asyncio.create_task(_generate_reply(mode, text, history))
+        else:
+            reply_task = asyncio.create_task(_generate_spoken_reply(mode, text, history, voice))
+        
+        try:
+            # Check if user wants to generate an image (only for OpenAI)
+            image_intent = None
+            if detect_image_generation_intent is not None:
+                image_intent = await detect_image_generation_intent(text, history)
+        except BaseException:
+            await _discard_task(reply_task)
+            raise
         
         if image_intent and image_intent.get('needs_generation') and image_intent.get('confidence', 0) > 0.5:
             # User wants to generate an image
-            logger.info(f"Image generation request detected for user {user_id}")
+            await _discard_task(reply_task)
+            logger.info("Image generation request detected for user %s", user_id)
             return await route_image_generation_request(
                 user_id=user_id,
                 prompt=image_intent.get('prompt', text),
@@ -68,33 +144,152 @@ async def route_text_request(
         # Add user message to history
         user_sessions.add_message(user_id, "user", text)
         
-        # Route based on mode
-        if mode == BotMode.RAG:
-            # Use RAG for knowledge base queries
-            from rag.query import query_knowledge_base
-            response_text = await query_knowledge_base(text, history)
+        voice_path = None
+        if voice is None:
+            response_text = await reply_task
         else:
-            # Standard GPT response
-            messages = history + [{"role": "user", "content": text}]
-            response_text = await ai_client.generate_text_response(messages)
+            response_text, voice_path = await reply_task
         
         # Add assistant response to history
         user_sessions.add_message(user_id, "assistant", response_text)
         
-        logger.info(f"Text request processed for user {user_id}")
-        return {
+        logger.info("Text request processed for user %s", user_id)
+        response = {
             "text": response_text,
             "mode": mode
         }
-        
+        if voice_path is not None:
+            response["voice_path"] = voice_path
+        return response
+    
     except Exception as e:
-        logger.error(f"Error routing text request: {e}")
+        logger.error("Error routing text request: %s", e)
         return {
             "text": "Извините, произошла ошибка при обработке запроса.",
             "error": str(e)
         }
 
 
+async def _discard_task(task: asyncio.Task) -> None:
+    """Cancel a speculative task and wait for it, so its cleanup runs and errors are retrieved."""
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _generate_reply(mode: str, text: str, history: List[Dict[str, str]]) -> str:
+    """
+    Generate a text answer for the given mode.
+    
+    Args:
+        mode: Bot mode
+        text: User's text message
+        history: Conversation history before this message
+    
+    Returns:
+        Response text
+    """
+    # Route based on mode
+    if mode == BotMode.RAG:
+        # Use RAG for knowledge base queries
+        from rag.query import query_knowledge_base
+        return await query_knowledge_base(text, history)
+    
+    # Standard GPT response
+    messages = history + [{"role": "user", "content": text}]
+    return await ai_client.generate_text_response(messages)
+
+
+async def _generate_spoken_reply(
+    mode: str,
+    text: str,
+    history: List[Dict[str, str]],
+    voice: str
+) -> Tuple[str, Optional[Path]]:
+    """
+    Generate a text answer and its voice response.
+    
+    Chat answers are streamed and voiced sentence by sentence while the rest
+    of the answer is still being generated; the audio parts are then joined.
+    
+    Args:
+        mode: Bot mode
+        text: User's text message
+        history: Conversation history before this message
+        voice: Voice type to use
+    
+    Returns:
+        Response text and path to the voice response (None for an empty answer)
+    """
+    stream = getattr(ai_client, "generate_text_response_stream", None)
+    if mode == BotMode.RAG or stream is None:
+        response_text = await _generate_reply(mode, text, history)
+        return response_text, await generate_voice_response(response_text, voice=voice)
+    
+    sentences: asyncio.Queue = asyncio.Queue()
+    audio_paths: List[Path] = []
+    speaker = asyncio.create_task(_speak_sentences(sentences, voice, audio_paths))
+    
+    try:
+        fragments = []
+        pending = ""
+        async for fragment in stream(history + [{"role": "user", "content": text}]):
+            fragments.append(fragment)
+            *finished, pending = _SENTENCE_END_RE.split(pending + fragment)
+            if finished:
+                sentences.put_nowait(" ".join(finished))
+        
+        if pending.strip():
+            sentences.put_nowait(pending)
+        sentences.put_nowait(None)
+        await speaker
+        
+        if len(audio_paths) <= 1:
+            return "".join(fragments), (audio_paths[0] if audio_paths else None)
+        
+        response_text = "".join(fragments)
+        try:
+            voice_path = await concat_audio_files(audio_paths)
+        except FileNotFoundError:
+            # Without ffmpeg the parts cannot be joined; voice the whole answer at once
+            voice_path = await generate_voice_response(response_text, voice=voice)
+        await cleanup_files_async(*audio_paths)
+        return response_text, voice_path
+    
+    except BaseException:
+        speaker.cancel()
+        await asyncio.gather(speaker, return_exceptions=True)
+        await cleanup_files_async(*audio_paths)
+        raise
+
+
+async def _speak_sentences(
+    sentences: asyncio.Queue,
+    voice: str,
+    audio_paths: List[Path]
+) -> None:
+    """
+    Voice queued sentences in order until a None marker arrives.
+    
+    Sentences that queue up while a previous part is being voiced are
+    synthesized together, so fast answers need few TTS requests.
+    
+    Args:
+        sentences: Queue of sentences, terminated by None
+        voice: Voice type to use
+        audio_paths: List collecting generated audio files
+    """
+    done = False
+    while not done:
+        batch = [await sentences.get()]
+        while not sentences.empty():
+            batch.append(sentences.get_nowait())
+        if batch[-1] is None:
+            done = True
+            batch.pop()
+        if batch:
+            audio_paths.append(await generate_voice_response(" ".join(batch), voice=voice))
+
+
 async def route_voice_request(
     user_id: int,
     voice_path: Path
@@ -111,54 +306,94 @@ async def route_voice_request(
     """
     try:
         # Transcribe voice to text
-        logger.debug(f"Transcribing voice for user {user_id}")
+        logger.debug("Transcribing voice for user %s", user_id)
         transcription = await transcribe_voice_message(voice_path)
         
-        # Process text request (may include image generation)
-        text_response = await route_text_request(user_id, transcription)
-        
-        # Check if response contains an image
-        if text_response.get('has_image'):
-            # If image was generated, return without voice response
-            logger.info(f"Voice request with image generation for user {user_id}")
-            return {
-                "text": text_response["text"],
-                "transcription": transcription,
-                "has_image": True,
-                "image_path": text_response.get("image_path"),
-                "revised_prompt": text_response.get("revised_prompt"),
-                "voice_path": None  # No voice response when image is generated
-            }
-        
-        # Generate voice response for normal text
-        user_voice = user_sessions.get_voice(user_id)
-        logger.debug(f"Generating voice response with voice: {user_voice}")
-        voice_response_path = await generate_voice_response(
-            text_response["text"],
-            voice=user_voice
-        )
-        
-        logger.info(f"Voice request processed for user {user_id}")
+        return await _respond_to_transcription(user_id, transcription)
+    
+    except Exception as e:
+        logger.error("Error routing voice request: %s", e)
         return {
-            "text": text_response["text"],
-            "transcription": transcription,
-            "voice_path": voice_response_path,
-            "has_image": False
+            "text": "Извините, произошла ошибка при обработке голосового сообщения.",
+            "error": str(e)
         }
+
+
+async def route_voice_request_bytes(
+    user_id: int,
+    voice_bytes: bytes
+) -> Dict[str, Any]:
+    """
+    Route voice request for an in-memory voice message.
+    
+    Args:
+        user_id: User ID
+        voice_bytes: Raw OGG voice message
+    
+    Returns:
+        Response dictionary with 'text', 'transcription', 'voice_path', and optional 'image_path'
+    """
+    try:
+        # Transcribe voice to text (no temp file when the backend accepts bytes)
+        logger.debug("Transcribing voice for user %s", user_id)
+        transcription = await transcribe_voice_bytes(voice_bytes)
         
+        return await _respond_to_transcription(user_id, transcription)
+    
     except Exception as e:
-        logger.error(f"Error routing voice request: {e}")
+        logger.error("Error routing voice request: %s", e)
         return {
             "text": "Извините, произошла ошибка при обработке голосового сообщения.",
             "error": str(e)
         }
 
 
+async def _respond_to_transcription(
+    user_id: int,
+    transcription: str
+) -> Dict[str, Any]:
+    """Process transcribed text and generate voice response."""
+    # Process text request (may include image generation), voicing the answer as it streams
+    user_voice = user_sessions.get_voice(user_id)
+    text_response = await route_text_request(user_id, transcription, voice=user_voice)
+    
+    # Check if response contains an image
+    if text_response.get('has_image'):
+        # If image was generated, return without voice response
+        logger.info("Voice request with image generation for user %s", user_id)
+        return {
+            "text": text_response["text"],
+            "transcription": transcription,
+            "has_image": True,
+            "image_path": text_response.get("image_path"),
+            "revised_prompt": text_response.get("revised_prompt"),
+            "voice_path": None  # No voice response when image is generated
+        }
+    
+    # Voice the text separately only if it was not voiced already (e.g. an error message)
+    voice_response_path = text_response.get("voice_path")
+    if voice_response_path is None:
+        logger.debug("Generating voice response with voice: %s", user_voice)
+        voice_response_path = await generate_voice_response(
+            text_response["text"],
+            voice=user_voice
+        )
+    
+    logger.info("Voice request processed for user %s", user_id)
+    return {
+        "text": text_response["text"],
+        "transcription": transcription,
+        "voice_path": voice_response_path,
+        "has_image": False
+    }
+
+
 async def route_image_request(
     user_id: int,
     image_path: Optional[Path] = None,
     image_url: Optional[str] = None,
-    caption: Optional[str] = None
+    caption: Optional[str] = None,
+    session: Optional[aiohttp.ClientSession] = None
 ) -> Dict[str, Any]:
     """
     Route image request: analyze image with Vision API.
@@ -168,6 +403,7 @@ async def route_image_request(
         image_path: Local path to image
         image_url: URL to image
         caption: Optional caption/question about image
+        session: Shared HTTP session for the Yandex Vision requests
     
     Returns:
         Response dictionary with 'text' (analysis result)
@@ -179,11 +415,12 @@ async def route_image_request(
             custom_prompt = f"{caption}\n\nПроанализируй изображение с учетом этого вопроса."
         
         # Analyze image
-        logger.debug(f"Analyzing image for user {user_id}")
+        logger.debug("Analyzing image for user %s", user_id)
         analysis = await analyze_image(
             image_path=image_path,
             image_url=image_url,
-            custom_prompt=custom_prompt
+            custom_prompt=custom_prompt,
+            session=session
         )
         
         # Add to conversation history
@@ -193,13 +430,13 @@ async def route_image_request(
         user_sessions.add_message(user_id, "user", context)
         user_sessions.add_message(user_id, "assistant", analysis)
         
-        logger.info(f"Image request processed for user {user_id}")
+        logger.info("Image request processed for user %s", user_id)
         return {
             "text": analysis
         }
         
     except Exception as e:
-        logger.error(f"Error routing image request: {e}")
+        logger.error("Error routing image request: %s", e)
         return {
             "text": "Извините, произошла ошибка при анализе изображения.",
             "error": str(e)
@@ -227,21 +464,21 @@ async def route_rag_request(
         history = user_sessions.get_history(user_id)
         
         # Query knowledge base
-        logger.debug(f"Querying knowledge base for user {user_id}")
+        logger.debug("Querying knowledge base for user %s", user_id)
         response = await query_knowledge_base(query, history)
         
         # Add to history
         user_sessions.add_message(user_id, "user", query)
         user_sessions.add_message(user_id, "assistant", response)
         
-        logger.info(f"RAG request processed for user {user_id}")
+        logger.info("RAG request processed for user %s", user_id)
         return {
             "text": response,
             "mode": "rag"
         }
         
     except Exception as e:
-        logger.error(f"Error routing RAG request: {e}")
+        logger.error("Error routing RAG request: %s", e)
         # Fallback to regular text response
         return await route_text_request(user_id, query, mode=BotMode.TEXT)
 
@@ -269,7 +506,7 @@ async def route_image_generation_request(
         Response dictionary with 'text', 'image_path', and generation details
     """
     try:
-        logger.info(f"Generating image for user {user_id}: {prompt[:100]}...")
+        logger.info("Generating image for user %s: %.100s...", user_id, prompt)
         
         # Generate image
         result = await generate_image(
@@ -295,7 +532,7 @@ async def route_image_generation_request(
             f"[Изображение создано: {result['revised_prompt'][:100]}...]"
         )
         
-        logger.info(f"Image generation completed for user {user_id}")
+        logger.info("Image generation completed for user %s", user_id)
         return {
             "text": response_text,
             "image_path": result['image_path'],
@@ -305,7 +542,7 @@ async def route_image_generation_request(
         }
         
     except Exception as e:
-        logger.error(f"Error routing image generation request: {e}")
+        logger.error("Error routing image generation request: %s", e)
         
         # Add error to history
         user_sessions.add_message(user_id, "user", f"[Запрос на генерацию изображения: {original_text}]")
@@ -0,0 +1,97 @@
+"""
+Handler Scheduler.
+Runs handler coroutines on a fixed worker pool, cheapest work first.
+"""
+
+import asyncio
+import itertools
+from typing import Any, Awaitable, Callable, List, Optional
+
+from utils.logging import logger
+
+
+# Job priorities (lower runs first), roughly ordered by expected cost
+PRIORITY_COMMAND = 0       # Static command replies (/start, /voices, ...)
+PRIORITY_TEXT = 5          # Chat / RAG text responses
+PRIORITY_VISION = 10       # Image analysis, voice (STT + LLM + TTS)
+PRIORITY_GENERATION = 20   # Image generation
+
+
+class PriorityScheduler:
+    """Priority queue of jobs executed by a pool of worker tasks."""
+    
+    def __init__(self, workers: int):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            workers: Number of jobs allowed to run at the same time
+        """
+        self.workers = workers
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Tie-breaker keeps FIFO order within the same priority
+        self._seq = itertools.count()
+        # Set by shutdown(); Task.cancelling() would need Python 3.11
+        self._closing = False
+    
+    def _ensure_workers(self):
+        """Start worker tasks on first use (requires a running loop)."""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._tasks = [
+                asyncio.create_task(self._worker())
+                for _ in range(self.workers)
+            ]
+            logger.debug(f"Scheduler started with {self.workers} workers")
+    
+    async def _worker(self):
+        """Pop jobs in priority order and run them."""
+        while True:
+            _, _, job, future = await self._queue.get()
+            try:
+                if not future.cancelled():
+                    result = await job()
+                    if not future.done():
+                        future.set_result(result)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                # Only stop when the worker itself is being cancelled
+                if self._closing:
+                    raise
+            except BaseException as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+    
+    async def submit(
+        self,
+        job: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_TEXT
+    ) -> Any:
+        """
+        Queue a job and wait for its result.
+        
+        Args:
+            job: Zero-argument callable returning the coroutine to run
+            priority: Job priority (lower runs first)
+        
+        Returns:
+            Result of the job
+        """
+        self._ensure_workers()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((priority, next(self._seq), job, future))
+        return await future
+    
+    async def shutdown(self):
+        """Cancel worker tasks."""
+        self._closing = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._closing = False
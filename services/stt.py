@@ -7,7 +7,7 @@ from pathlib import Path
 from typing import Union
 
 from utils.logging import logger
-from utils.helpers import convert_ogg_to_wav, cleanup_file
+from utils.helpers import convert_ogg_to_wav, convert_ogg_bytes_to_wav, cleanup_file_async
 from config import API_PROVIDER
 
 # Условный импорт в зависимости от провайдера
@@ -40,7 +40,7 @@ async def transcribe_voice_message(audio_path: Union[str, Path]) -> str:
             # OpenAI Whisper требует WAV - конвертируем OGG в WAV
             if audio_path.suffix.lower() == '.ogg':
                 logger.debug(f"Converting OGG to WAV: {audio_path}")
-                wav_path = convert_ogg_to_wav(audio_path)
+                wav_path = await convert_ogg_to_wav(audio_path)
                 transcription_path = wav_path
             else:
                 transcription_path = audio_path
@@ -57,5 +57,27 @@ async def transcribe_voice_message(audio_path: Union[str, Path]) -> str:
     finally:
         # Cleanup converted file if created
         if wav_path and wav_path != audio_path:
-            cleanup_file(wav_path)
+            await cleanup_file_async(wav_path)
 
+
+async def transcribe_voice_bytes(voice_bytes: bytes) -> str:
+    """
+    Transcribe an in-memory OGG voice message to text.
+    
+    Args:
+        voice_bytes: Raw OGG/Opus audio as downloaded from Telegram
+    
+    Returns:
+        Transcribed text
+    """
+    if API_PROVIDER == "yandex":
+        # SpeechKit принимает OGG из памяти, временный файл не нужен
+        text = await stt_client.transcribe_audio_bytes(voice_bytes, "oggopus")
+        logger.info(f"Transcription completed: {len(text)} characters")
+        return text
+    
+    # Конвертируем в WAV через пайпы ffmpeg, без временных файлов
+    wav_bytes = await convert_ogg_bytes_to_wav(voice_bytes)
+    text = await stt_client.transcribe_audio_bytes(wav_bytes, "voice.wav")
+    logger.info(f"Transcription completed: {len(text)} characters")
+    return text
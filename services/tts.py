@@ -3,6 +3,7 @@ Text-to-Speech Service.
 Handles text to voice conversion.
 """
 
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
@@ -25,6 +26,42 @@ VOICE_MAPPING = {
     VoiceType.SHIMMER: "dasha"
 }
 
+# Описания голосов OpenAI
+VOICE_INFO = {
+    VoiceType.ALLOY: {
+        "name": "Alloy",
+        "type": "Нейтральный",
+        "description": "Сбалансированный голос"
+    },
+    VoiceType.ECHO: {
+        "name": "Echo",
+        "type": "Мужской",
+        "description": "Четкий мужской голос"
+    },
+    VoiceType.NOVA: {
+        "name": "Nova",
+        "type": "Женский",
+        "description": "Энергичный женский голос"
+    },
+    VoiceType.FABLE: {
+        "name": "Fable",
+        "type": "Мужской (британский)",
+        "description": "Британский акцент"
+    },
+    VoiceType.ONYX: {
+        "name": "Onyx",
+        "type": "Мужской (глубокий)",
+        "description": "Глубокий мужской голос"
+    },
+    VoiceType.SHIMMER: {
+        "name": "Shimmer",
+        "type": "Женский (теплый)",
+        "description": "Теплый женский голос"
+    }
+}
+
+VALID_VOICES = frozenset(VOICE_INFO)
+
 
 async def generate_voice_response(
     text: str,
@@ -42,16 +79,7 @@ async def generate_voice_response(
     """
     try:
         # Validate voice type
-        valid_voices = [
-            VoiceType.ALLOY,
-            VoiceType.ECHO,
-            VoiceType.NOVA,
-            VoiceType.FABLE,
-            VoiceType.ONYX,
-            VoiceType.SHIMMER
-        ]
-        
-        if voice not in valid_voices:
+        if voice not in VALID_VOICES:
             logger.warning(f"Invalid voice '{voice}', using default")
             voice = DEFAULT_VOICE
         
@@ -81,44 +109,12 @@ def get_voice_info(voice: str) -> dict:
         voice: Voice identifier
     
     Returns:
-        Dictionary with voice information
+        Dictionary with voice information (shared, do not modify)
     """
-    voices = {
-        VoiceType.ALLOY: {
-            "name": "Alloy",
-            "type": "Нейтральный",
-            "description": "Сбалансированный голос"
-        },
-        VoiceType.ECHO: {
-            "name": "Echo",
-            "type": "Мужской",
-            "description": "Четкий мужской голос"
-        },
-        VoiceType.NOVA: {
-            "name": "Nova",
-            "type": "Женский",
-            "description": "Энергичный женский голос"
-        },
-        VoiceType.FABLE: {
-            "name": "Fable",
-            "type": "Мужской (британский)",
-            "description": "Британский акцент"
-        },
-        VoiceType.ONYX: {
-            "name": "Onyx",
-            "type": "Мужской (глубокий)",
-            "description": "Глубокий мужской голос"
-        },
-        VoiceType.SHIMMER: {
-            "name": "Shimmer",
-            "type": "Женский (теплый)",
-            "description": "Теплый женский голос"
-        }
-    }
-    
-    return voices.get(voice, voices[VoiceType.ALLOY])
+    return VOICE_INFO.get(voice, VOICE_INFO[VoiceType.ALLOY])
 
 
+@lru_cache(maxsize=None)
 def get_available_voices() -> str:
     """
     Get formatted list of available voices.
@@ -126,18 +122,8 @@ def get_available_voices() -> str:
     Returns:
         Formatted string with voice information
     """
-    voices = [
-        VoiceType.ALLOY,
-        VoiceType.ECHO,
-        VoiceType.NOVA,
-        VoiceType.FABLE,
-        VoiceType.ONYX,
-        VoiceType.SHIMMER
-    ]
-    
     result = "📢 Доступные голоса:\n\n"
-    for voice in voices:
-        info = get_voice_info(voice)
+    for voice, info in VOICE_INFO.items():
         result += f"• {info['name']} ({voice})\n"
         result += f"  Тип: {info['type']}\n"
         result += f"  {info['description']}\n\n"
@@ -7,6 +7,8 @@ from typing import Optional
 import base64
 from pathlib import Path
 
+import aiohttp
+
 from utils.logging import logger
 from config import API_PROVIDER
 
@@ -20,7 +22,8 @@ else:
 async def analyze_image(
     image_path: Optional[Path] = None,
     image_url: Optional[str] = None,
-    custom_prompt: Optional[str] = None
+    custom_prompt: Optional[str] = None,
+    session: Optional[aiohttp.ClientSession] = None
 ) -> str:
     """
     Analyze an image using GPT-4 Vision.
@@ -29,6 +32,8 @@ async def analyze_image(
         image_path: Local path to image file
         image_url: URL to image (Telegram file URL)
         custom_prompt: Custom analysis prompt
+        session: HTTP session for the Yandex Vision download and request;
+            the OpenAI client keeps its own connection pool
     
     Returns:
         Analysis result
@@ -63,7 +68,8 @@ async def analyze_image(
             result = await vision_client.analyze_image(
                 image_path=image_path,
                 image_url=image_url,
-                prompt=custom_prompt
+                prompt=custom_prompt,
+                session=session
             )
         else:
             result = await vision_client.analyze_image(
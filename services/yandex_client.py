@@ -4,6 +4,7 @@ Provides methods for YandexGPT, SpeechKit (STT/TTS), and Vision API.
 """
 
 import requests
+import aiohttp
 import base64
 import json
 from typing import List, Dict, Optional
@@ -14,9 +15,12 @@ from config import (
     YANDEX_FOLDER_ID,
     YANDEX_GPT_MODEL,
     TEMPERATURE,
-    MAX_TOKENS
+    MAX_TOKENS,
+    DATA_DIR
 )
 from utils.logging import logger
+from utils.helpers import unique_id
+from utils.http import get_http_session
 
 
 class YandexGPTClient:
@@ -131,24 +135,43 @@ class YandexSpeechKitClient:
             audio_file_path: Path to audio file
             language: Language code (ru-RU, en-US, etc.)
         
+        Returns:
+            Transcribed text
+        """
+        logger.debug(f"Transcribing audio: {audio_file_path}")
+        
+        # Читаем аудио файл
+        with open(audio_file_path, "rb") as audio_file:
+            audio_data = audio_file.read()
+        
+        # Определяем формат аудио
+        audio_format = "oggopus" if audio_file_path.suffix.lower() == ".ogg" else "lpcm"
+        
+        return await self.transcribe_audio_bytes(audio_data, audio_format, language)
+    
+    async def transcribe_audio_bytes(
+        self,
+        audio_data: bytes,
+        audio_format: str = "oggopus",
+        language: str = "ru-RU"
+    ) -> str:
+        """
+        Transcribe in-memory audio to text using Yandex SpeechKit.
+        
+        Args:
+            audio_data: Raw audio bytes
+            audio_format: SpeechKit format (oggopus, lpcm)
+            language: Language code (ru-RU, en-US, etc.)
+        
         Returns:
             Transcribed text
         """
         try:
-            logger.debug(f"Transcribing audio: {audio_file_path}")
-            
-            # Читаем аудио файл
-            with open(audio_file_path, "rb") as audio_file:
-                audio_data = audio_file.read()
-            
             url = "https://stt.api.cloud.yandex.net/speech/v1/stt:recognize"
             headers = {
                 "Authorization": f"Api-Key {self.api_key}",
             }
             
-            # Определяем формат аудио
-            audio_format = "oggopus" if audio_file_path.suffix.lower() == ".ogg" else "lpcm"
-            
             params = {
                 "folderId": self.folder_id,
                 "lang": language,
@@ -221,9 +244,7 @@ class YandexSpeechKitClient:
             
             # Default output path
             if output_path is None:
-                from config import DATA_DIR
-                import uuid
-                output_path = DATA_DIR / f"tts_{uuid.uuid4()}.ogg"
+                output_path = DATA_DIR / f"tts_{unique_id()}.ogg"
             
             # Сохраняем аудио
             with open(output_path, "wb") as f:
@@ -251,7 +272,8 @@ class YandexVisionClient:
         self,
         image_path: Optional[Path] = None,
         image_url: Optional[str] = None,
-        prompt: str = "Опиши это изображение подробно. Что ты видишь?"
+        prompt: str = "Опиши это изображение подробно. Что ты видишь?",
+        session: Optional[aiohttp.ClientSession] = None
     ) -> str:
         """
         Analyze an image using Yandex Vision API (OCR + Classification).
@@ -262,6 +284,8 @@ class YandexVisionClient:
             image_path: Local path to image
             image_url: URL to image
             prompt: Analysis prompt (used only for context, not sent to API)
+            session: HTTP session for the download and the Vision request
+                (defaults to the shared pooled session)
         
         Returns:
             Image analysis result
@@ -269,14 +293,20 @@ class YandexVisionClient:
         try:
             logger.debug("Analyzing image with Yandex Vision (OCR + Classification)")
             
+            if session is None:
+                session = get_http_session()
+            
             # Подготовка изображения
             if image_path:
                 with open(image_path, "rb") as f:
                     image_data = base64.b64encode(f.read()).decode("utf-8")
             elif image_url:
-                # Скачиваем изображение по URL
-                response = requests.get(image_url, timeout=30)
-                image_data = base64.b64encode(response.content).decode("utf-8")
+                # Скачиваем изображение через общий пул соединений
+                async with session.get(
+                    image_url,
+                    timeout=aiohttp.ClientTimeout(total=30)
+                ) as response:
+                    image_data = base64.b64encode(await response.read()).decode("utf-8")
             else:
                 raise ValueError("Either image_path or image_url must be provided")
             
@@ -300,14 +330,18 @@ class YandexVisionClient:
                 ]
             }
             
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            
-            if response.status_code != 200:
-                error_text = response.text
-                logger.error(f"Yandex Vision API error ({response.status_code}): {error_text}")
-                raise RuntimeError(f"Vision API error: {error_text}")
-            
-            result = response.json()
+            async with session.post(
+                url,
+                headers=headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=60)
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"Yandex Vision API error ({response.status}): {error_text}")
+                    raise RuntimeError(f"Vision API error: {error_text}")
+                
+                result = await response.json(content_type=None)
             
             # Извлекаем текст и классификацию
             analysis_text = self._format_vision_result(result, prompt)
@@ -0,0 +1,37 @@
+"""
+Tests for the bot instance.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from telebot.async_telebot import AsyncTeleBot
+
+from bot import bot
+
+
+class TestPacedTeleBot:
+    """Test suite for pacing outgoing Telegram messages."""
+    
+    @pytest.mark.asyncio
+    async def test_sends_acquire_shared_limiter(self):
+        """Test that outgoing messages pass through the Telegram limiter."""
+        entered = []
+        
+        class CountingLimiter:
+            async def __aenter__(self):
+                entered.append(True)
+            
+            async def __aexit__(self, *exc):
+                return False
+        
+        with patch('bot.telegram_limiter', CountingLimiter()), \
+                patch.object(AsyncTeleBot, 'send_message', new=AsyncMock(return_value="sent")), \
+                patch.object(AsyncTeleBot, 'send_chat_action', new=AsyncMock()):
+            assert await bot.send_message(1, "hi") == "sent"
+            await bot.send_chat_action(1, "typing")
+        
+        assert len(entered) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
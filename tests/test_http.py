@@ -0,0 +1,128 @@
+"""
+Tests for the shared HTTP helpers.
+"""
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from utils import http
+
+
+@pytest_asyncio.fixture
+async def file_server():
+    """Serve a fixed binary payload over local HTTP."""
+    payload = bytes(range(256)) * 8192  # 2 MB
+    
+    async def handler(request):
+        return web.Response(body=payload)
+    
+    async def error_handler(request):
+        return web.Response(status=500, body=payload)
+    
+    flaky_calls = []
+    
+    async def flaky_handler(request):
+        flaky_calls.append(request)
+        if len(flaky_calls) < 3:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        return web.Response(body=payload)
+    
+    async def busy_handler(request):
+        return web.Response(status=429, headers={"Retry-After": "0"})
+    
+    app = web.Application()
+    app.router.add_get("/file", handler)
+    app.router.add_get("/error", error_handler)
+    app.router.add_get("/flaky", flaky_handler)
+    app.router.add_get("/busy", busy_handler)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, payload
+    await server.close()
+    await http.close_http_session()
+
+
+class TestDownloadToFile:
+    """Test suite for streaming downloads."""
+    
+    @pytest.mark.asyncio
+    async def test_download_writes_full_body(self, file_server, tmp_path):
+        """Test that the streamed file matches the response body."""
+        server, payload = file_server
+        destination = tmp_path / "download.bin"
+        
+        written = await http.download_to_file(str(server.make_url("/file")), destination)
+        
+        assert written == len(payload)
+        assert destination.read_bytes() == payload
+    
+    @pytest.mark.asyncio
+    async def test_download_aborts_over_max_size(self, file_server, tmp_path):
+        """Test that oversized downloads are aborted and removed."""
+        server, payload = file_server
+        destination = tmp_path / "download.bin"
+        
+        with pytest.raises(ValueError):
+            await http.download_to_file(
+                str(server.make_url("/file")),
+                destination,
+                max_size=len(payload) // 2
+            )
+        
+        assert not destination.exists()
+
+
+class TestReadErrorBody:
+    """Test suite for bounded error body reads."""
+    
+    @pytest.mark.asyncio
+    async def test_error_body_is_truncated(self, file_server):
+        """Test that only the first bytes of an error page are read."""
+        server, payload = file_server
+        session = http.get_http_session()
+        
+        async with session.get(str(server.make_url("/error"))) as response:
+            body = await http.read_error_body(response, limit=100)
+        
+        assert response.status == 500
+        assert body == payload[:100].decode("utf-8", errors="replace")
+
+
+class TestRequestWithRetry:
+    """Test suite for retrying transient HTTP failures."""
+    
+    @pytest.mark.asyncio
+    async def test_transient_errors_are_retried(self, file_server, tmp_path):
+        """Test that 503 responses are retried until the request succeeds."""
+        server, payload = file_server
+        destination = tmp_path / "download.bin"
+        
+        written = await http.download_to_file(str(server.make_url("/flaky")), destination)
+        
+        assert written == len(payload)
+    
+    @pytest.mark.asyncio
+    async def test_last_response_returned_after_attempts(self, file_server):
+        """Test that the final failing response is handed to the caller."""
+        server, _ = file_server
+        
+        async with http.request_with_retry("GET", str(server.make_url("/busy")), attempts=2) as response:
+            assert response.status == 429
+    
+    def test_logged_url_hides_bot_token(self):
+        """Test that retry log lines never contain the bot token or query string."""
+        url = "https://api.telegram.org/file/bot123:SECRET/photos/file_1.jpg?sig=abc"
+        
+        assert http._log_url(url) == "https://api.telegram.org/file/bot<token>/photos/file_1.jpg"
+    
+    def test_retry_after_is_honored_and_capped(self):
+        """Test that Retry-After overrides backoff but not the maximum delay."""
+        assert http._retry_delay(3, "2") == 2.0
+        assert http._retry_delay(0, "3600") == http.HTTP_RETRY_MAX_DELAY
+        assert 4 <= http._retry_delay(2, "Wed, 21 Oct 2015 07:28:00 GMT") < 5
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
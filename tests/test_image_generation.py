@@ -4,6 +4,7 @@
 
 import pytest
 from pathlib import Path
+from unittest.mock import AsyncMock, patch
 import sys
 
 # Add parent directory to path
@@ -164,6 +165,196 @@ class TestImageGenerationIntentDetection:
         assert 'prompt' in result
 
 
+class TestImageGenerationKeywords:
+    """Тесты для быстрого поиска ключевых слов и кэша намерений."""
+    
+    def test_strong_keyword_case_insensitive(self):
+        """Тест что ключевые слова находятся без учета регистра."""
+        from services.image_generation import has_strong_keyword
+        
+        assert has_strong_keyword("НАРИСУЙ кота") is True
+        assert has_strong_keyword("Please DRAW a cat") is True
+        assert has_strong_keyword("Что такое Python?") is False
+    
+    def test_trie_pattern_matches_every_keyword(self):
+        """Тест что префиксное дерево находит каждое ключевое слово и только их."""
+        import re
+        from services.image_generation import STRONG_KEYWORDS, _trie_pattern
+        
+        pattern = re.compile(_trie_pattern(["abc", "abd", "ab", "xyz"]))
+        assert pattern.search("--ab--")
+        assert pattern.search("xyz")
+        assert not pattern.search("a b xy")
+        
+        pattern = re.compile(_trie_pattern(STRONG_KEYWORDS))
+        for keyword in STRONG_KEYWORDS:
+            assert pattern.search(f"пожалуйста {keyword} кота")
+    
+    @pytest.mark.asyncio
+    async def test_intent_cached_by_text(self):
+        """Тест что повторный запрос не вызывает LLM повторно."""
+        from services import image_generation
+        from services.openai_client import openai_client
+        
+        text = "Можешь показать тестовый пример для кэша намерений?"
+        image_generation._intent_cache.pop(image_generation._intent_key(text), None)
+        llm = AsyncMock(return_value='{"needs_generation": false, "confidence": 0.1}')
+        
+        with patch.object(openai_client, 'generate_text_response', llm):
+            first = await detect_image_generation_intent(text)
+            second = await detect_image_generation_intent("  можешь ПОКАЗАТЬ тестовый пример для кэша намерений? ")
+        
+        assert first == second
+        assert first['needs_generation'] is False
+        assert llm.await_count == 1
+        assert llm.await_args.kwargs['response_format'] == {"type": "json_object"}
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_detections_share_llm_call(self):
+        """Тест что одновременные одинаковые запросы вызывают LLM один раз."""
+        import asyncio
+        from services import image_generation
+        from services.openai_client import openai_client
+        
+        text = "Покажи пример параллельного определения"
+        image_generation._intent_cache.pop(image_generation._intent_key(text), None)
+        
+        async def slow_llm(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return '{"needs_generation": false, "confidence": 0.2}'
+        
+        llm = AsyncMock(side_effect=slow_llm)
+        
+        with patch.object(openai_client, 'generate_text_response', llm):
+            results = await asyncio.gather(*[detect_image_generation_intent(text) for _ in range(5)])
+        
+        assert all(result['confidence'] == 0.2 for result in results)
+        assert llm.await_count == 1
+        assert not image_generation._intent_pending
+    
+    @pytest.mark.asyncio
+    async def test_no_trigger_skips_llm(self):
+        """Тест что сообщение без слов-триггеров не отправляется в LLM."""
+        from services.openai_client import openai_client
+        
+        llm = AsyncMock()
+        
+        with patch.object(openai_client, 'generate_text_response', llm):
+            result = await detect_image_generation_intent("Привет, как дела?")
+            empty = await detect_image_generation_intent("")
+        
+        assert result['needs_generation'] is False
+        assert empty['needs_generation'] is False
+        llm.assert_not_awaited()
+
+
+class TestImageGenerationCache:
+    """Тесты для кэша сгенерированных изображений."""
+    
+    @pytest.fixture
+    def cache_dirs(self, tmp_path):
+        """Перенаправить каталоги изображений во временную папку."""
+        from services import image_generation
+        
+        cache_dir = tmp_path / "cache"
+        cache_dir.mkdir()
+        with patch.object(image_generation, 'GENERATED_IMAGES_DIR', tmp_path), \
+             patch.object(image_generation, 'IMAGE_CACHE_DIR', cache_dir):
+            yield tmp_path, cache_dir
+    
+    def test_cache_key_normalizes_whitespace(self):
+        """Тест что ключ не зависит от лишних пробелов."""
+        from services.image_generation import _image_cache_key
+        
+        assert _image_cache_key("a  cat ", "1024x1024", "standard", "vivid") == \
+            _image_cache_key("a cat", "1024x1024", "standard", "vivid")
+        assert _image_cache_key("a cat", "1024x1024", "hd", "vivid") != \
+            _image_cache_key("a cat", "1024x1024", "standard", "vivid")
+    
+    def test_cache_roundtrip_survives_cleanup(self, cache_dirs):
+        """Тест что закэшированное изображение переживает удаление выданного файла."""
+        from services.image_generation import _read_image_cache, _write_image_cache
+        
+        images_dir, _ = cache_dirs
+        image = images_dir / "generated.png"
+        image.write_bytes(b"png data")
+        
+        _write_image_cache("key", image, {"revised_prompt": "a cat", "url": "http://x"})
+        image.unlink()
+        
+        cached = _read_image_cache("key")
+        assert cached["revised_prompt"] == "a cat"
+        assert cached["image_path"].read_bytes() == b"png data"
+        
+        cached["image_path"].unlink()
+        assert _read_image_cache("key") is not None
+        assert _read_image_cache("missing") is None
+    
+    def test_cache_evicts_oldest(self, cache_dirs):
+        """Тест что при переполнении удаляются самые старые записи."""
+        import os
+        from services import image_generation
+        
+        images_dir, cache_dir = cache_dirs
+        
+        with patch.object(image_generation, 'IMAGE_CACHE_MAX_FILES', 2):
+            for i, key in enumerate(("old", "mid", "new")):
+                image = images_dir / f"{key}.png"
+                image.write_bytes(b"png data")
+                # Each write evicts; older entries get older access times
+                image_generation._write_image_cache(key, image, {})
+                os.utime(cache_dir / f"{key}.png", (i, i))
+        
+        assert sorted(p.name for p in cache_dir.iterdir()) == \
+            ["mid.json", "mid.png", "new.json", "new.png"]
+    
+    @pytest.mark.asyncio
+    async def test_download_images_concurrently_in_order(self, cache_dirs):
+        """Тест что изображения скачиваются параллельно и в исходном порядке."""
+        import asyncio
+        from services import image_generation
+        
+        images_dir, _ = cache_dirs
+        active = 0
+        peak = 0
+        
+        async def fake_download(url):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            path = images_dir / f"{url}.png"
+            path.write_bytes(b"png")
+            return path
+        
+        with patch.object(image_generation, 'download_image', side_effect=fake_download):
+            paths = await image_generation.download_images(["a", "b", "c"])
+        
+        assert [p.name for p in paths] == ["a.png", "b.png", "c.png"]
+        assert peak == 3
+    
+    @pytest.mark.asyncio
+    async def test_download_images_cleans_up_on_failure(self, cache_dirs):
+        """Тест что при ошибке скачанные файлы удаляются."""
+        from services import image_generation
+        
+        images_dir, _ = cache_dirs
+        
+        async def fake_download(url):
+            if url == "bad":
+                raise RuntimeError("download failed")
+            path = images_dir / f"{url}.png"
+            path.write_bytes(b"png")
+            return path
+        
+        with patch.object(image_generation, 'download_image', side_effect=fake_download):
+            with pytest.raises(RuntimeError):
+                await image_generation.download_images(["a", "bad", "c"])
+        
+        assert not list(images_dir.glob("*.png"))
+
+
 class TestImageGenerationConfig:
     """Тесты для конфигурации генерации изображений."""
     
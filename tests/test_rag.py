@@ -68,6 +68,58 @@ class TestDocumentLoader:
             # Loading may fail in test environment
             pass
     
+    def test_load_document_uses_chunk_cache(self, temp_documents, tmp_path):
+        """Test unchanged files are served from the chunk cache."""
+        loader = DocumentLoader(cache_dir=tmp_path / "cache")
+        txt_file = temp_documents / "test.txt"
+        
+        first = loader.load_document(txt_file)
+        
+        with patch('rag.loader.TextLoader', side_effect=AssertionError("re-parsed")):
+            cached = loader.load_document(txt_file)
+        
+        assert [c.page_content for c in cached] == [c.page_content for c in first]
+        assert cached[0].metadata["source"] == "test.txt"
+        
+        with pytest.raises(AssertionError):
+            with patch('rag.loader.TextLoader', side_effect=AssertionError("re-parsed")):
+                loader.load_document(txt_file, use_cache=False)
+    
+    def test_chunk_cache_evicts_least_recently_used(self, temp_documents, tmp_path):
+        """Test that stale chunk cache entries are dropped above the limit."""
+        import os
+        
+        cache_dir = tmp_path / "cache"
+        loader = DocumentLoader(cache_dir=cache_dir)
+        
+        versions = []
+        for i in range(3):
+            doc = temp_documents / f"edit{i}.txt"
+            doc.write_text(f"Версия документа {i}.", encoding='utf-8')
+            with patch('rag.loader.CHUNK_CACHE_MAX_FILES', 2):
+                loader.load_document(doc)
+            versions.append(loader._file_hash(doc))
+            entry = cache_dir / f"{versions[-1]}.pkl"
+            os.utime(entry, (i, i))
+        
+        assert sorted(p.stem for p in cache_dir.glob("*.pkl")) == sorted(versions[1:])
+    
+    def test_iter_files_filters_by_suffix(self, temp_documents):
+        """Test scandir-based discovery of supported documents."""
+        from utils.helpers import iter_files
+        
+        nested = temp_documents / "nested"
+        nested.mkdir()
+        (nested / "deep.TXT").write_text("nested")
+        (temp_documents / "image.png").write_bytes(b"png")
+        
+        extensions = ('.pdf', '.txt', '.md')
+        found = {p.name for p in iter_files(temp_documents, extensions)}
+        top_level = {p.name for p in iter_files(temp_documents, extensions, recursive=False)}
+        
+        assert found == {"test.pdf", "test.txt", "test.md", "deep.TXT"}
+        assert top_level == {"test.pdf", "test.txt", "test.md"}
+    
     def test_load_directory_empty(self, tmp_path):
         """Test loading from empty directory."""
         loader = DocumentLoader()
@@ -76,6 +128,18 @@ class TestDocumentLoader:
         
         assert isinstance(chunks, list)
         assert len(chunks) == 0
+    
+    @pytest.mark.asyncio
+    async def test_aload_directory_matches_sync(self, temp_documents):
+        """Test async directory loading returns the same chunks as sync loading."""
+        loader = DocumentLoader()
+        (temp_documents / "test.pdf").unlink()
+        
+        sync_chunks = loader.load_directory(temp_documents)
+        async_chunks = await loader.aload_directory(temp_documents)
+        
+        assert sorted(c.page_content for c in async_chunks) == \
+            sorted(c.page_content for c in sync_chunks)
 
 
 class TestVectorIndex:
@@ -128,6 +192,85 @@ class TestVectorIndex:
         except Exception as e:
             pytest.fail(f"Adding documents failed: {e}")
     
+    def test_add_documents_in_batches(self, tmp_path, mock_embeddings, mock_chroma):
+        """Test that documents are sent to the vector store in batches."""
+        index = VectorIndex(persist_directory=tmp_path)
+        documents = [Mock() for _ in range(5)]
+        
+        index.add_documents(documents, batch_size=2)
+        
+        calls = index.vectorstore.add_documents.call_args_list
+        assert [len(call.args[0]) for call in calls] == [2, 2, 1]
+    
+    def test_add_documents_clears_response_cache(self, tmp_path, mock_embeddings, mock_chroma):
+        """Test that answers cached from other documents are dropped on upload."""
+        from rag.cache import response_cache
+        
+        index = VectorIndex(persist_directory=tmp_path)
+        doc = Mock(page_content="Новый документ", metadata={"source": "new.pdf"})
+        response_cache.put("вопрос", "старый ответ", sources=["old.pdf"])
+        
+        index.add_documents([doc])
+        
+        assert response_cache.get("вопрос") is None
+    
+    def test_clear_index_keeps_database_files(self, tmp_path, mock_embeddings, mock_chroma):
+        """Test that clearing drops the collection without deleting the directory."""
+        index = VectorIndex(persist_directory=tmp_path)
+        marker = tmp_path / "chroma.sqlite3"
+        marker.write_bytes(b"db")
+        
+        index.clear_index()
+        
+        mock_chroma.return_value.delete_collection.assert_called_once()
+        assert marker.exists()
+    
+    def test_add_documents_embeds_batches_concurrently(self, tmp_path, mock_embeddings, mock_chroma):
+        """Test that batches are embedded in parallel before being stored."""
+        import threading
+        import time
+        
+        index = VectorIndex(persist_directory=tmp_path)
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+        
+        def slow_embed(texts):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return [[0.1] for _ in texts]
+        
+        index.query_embeddings.embed_documents = Mock(side_effect=slow_embed)
+        documents = [Mock(page_content=f"chunk {i}", metadata={"source": "doc"}) for i in range(6)]
+        
+        with patch('rag.embedding_cache.CachedEmbeddings._write'):
+            index.add_documents(documents, batch_size=2)
+        
+        assert index.query_embeddings.embed_documents.call_count == 3
+        assert peak > 1
+        assert index.vectorstore.add_documents.call_count == 3
+    
+    def test_add_documents_embeds_each_batch_once(self, tmp_path, mock_embeddings, mock_chroma):
+        """Test that the vector store reuses pre-computed vectors even when the disk cache fails."""
+        index = VectorIndex(persist_directory=tmp_path)
+        index.query_embeddings.embed_documents = Mock(side_effect=lambda texts: [[0.1] for _ in texts])
+        # Like Chroma, the store embeds the documents it is given
+        index.vectorstore.add_documents = Mock(
+            side_effect=lambda batch: index.embeddings.embed_documents([doc.page_content for doc in batch])
+        )
+        documents = [Mock(page_content=f"batch chunk {i}", metadata={"source": "doc"}) for i in range(6)]
+        
+        with patch('rag.embedding_cache.CachedEmbeddings._write'):
+            index.add_documents(documents, batch_size=2)
+        
+        assert index.query_embeddings.embed_documents.call_count == 3
+        assert index.embeddings._memory == {}
+    
     def test_similarity_search(self, tmp_path, mock_embeddings, mock_chroma):
         """Test similarity search."""
         index = VectorIndex(persist_directory=tmp_path)
@@ -235,6 +378,30 @@ class TestRAGQuery:
         assert "Second document content" in context
         assert "doc1.pdf" in context
     
+    def test_prepare_context_skips_duplicate_chunks(self):
+        """Test that repeated chunks are sent only once."""
+        from rag.query import _prepare_context
+        
+        doc = Mock()
+        doc.page_content = "Same content"
+        doc.metadata = {"source": "doc.pdf"}
+        other = Mock()
+        other.page_content = "Other content"
+        other.metadata = {"source": "doc.pdf"}
+        
+        context = _prepare_context([(doc, 0.9), (doc, 0.9), (other, 0.8)])
+        
+        assert context.count("Same content") == 1
+        assert "[Источник 2: doc.pdf]\nOther content" in context
+    
+    def test_system_prompt_split_matches_format(self):
+        """Test the pre-split system prompt equals the formatted template."""
+        from rag import query
+        
+        context = "Люк ТМ(Д400) {не шаблон}"
+        assert query._SYSTEM_PROMPT_PREFIX + context + query._SYSTEM_PROMPT_SUFFIX == \
+            query.RAG_SYSTEM_PROMPT.format(context=context)
+    
     def test_get_knowledge_base_stats(self):
         """Test getting knowledge base statistics."""
         from rag.query import get_knowledge_base_stats
@@ -251,6 +418,410 @@ class TestRAGQuery:
             assert "total_documents" in stats
 
 
+class TestResponseCache:
+    """Test suite for the RAG response cache."""
+    
+    def test_exact_hit_ignores_case_and_spacing(self):
+        """Test exact lookups on the normalized query."""
+        from rag.cache import ResponseCache
+        
+        cache = ResponseCache()
+        cache.put("Вес люка  ТМ?", "42 кг")
+        
+        assert cache.get("вес люка тм?") == "42 кг"
+        assert cache.get("вес люка тм?", scope="other") is None
+    
+    def test_semantic_hit_by_embedding(self):
+        """Test lookups by cosine similarity of query embeddings."""
+        from rag.cache import ResponseCache
+        
+        cache = ResponseCache(similarity_threshold=0.95)
+        cache.put("first", "answer", embedding=[1.0, 0.0, 0.0])
+        
+        assert cache.get("second", embedding=[0.99, 0.05, 0.0]) == "answer"
+        assert cache.get("third", embedding=[0.0, 1.0, 0.0]) is None
+    
+    def test_semantic_hit_respects_scope_and_reuses_rows(self):
+        """Test that semantic lookups stay in scope and freed rows are reused."""
+        from rag.cache import ResponseCache
+        
+        cache = ResponseCache(max_size=2, similarity_threshold=0.95)
+        cache.put("first", "a1", embedding=[1.0, 0.0], scope="s1")
+        cache.put("second", "a2", embedding=[0.0, 1.0])
+        
+        assert cache.get("again", embedding=[1.0, 0.01]) is None
+        assert cache.get("again", embedding=[1.0, 0.01], scope="s1") == "a1"
+        
+        cache.put("third", "a3", embedding=[1.0, 0.0])
+        assert len(cache) == 2
+        assert cache.get("again", embedding=[1.0, 0.01]) == "a3"
+        assert cache._matrix.shape == (2, 2)
+    
+    def test_remove_from_cache_by_source(self):
+        """Test invalidation of responses built from a document."""
+        from rag.cache import ResponseCache
+        
+        cache = ResponseCache()
+        cache.put("q1", "a1", sources=["catalog.pdf"])
+        cache.put("q2", "a2", sources=["other.pdf"])
+        
+        assert cache.remove_from_cache("catalog.pdf") == 1
+        assert cache.get("q1") is None
+        assert cache.get("q2") == "a2"
+    
+    def test_eviction_prefers_unused_entries(self):
+        """Test that frequently used entries survive eviction."""
+        from rag.cache import ResponseCache
+        
+        cache = ResponseCache(max_size=2)
+        cache.put("hot", "a")
+        cache.put("cold", "b")
+        cache.get("hot")
+        cache.put("new", "c")
+        
+        assert len(cache) == 2
+        assert cache.get("hot") == "a"
+        assert cache.get("cold") is None
+    
+    def test_entries_expire(self):
+        """Test TTL expiry."""
+        from rag.cache import ResponseCache
+        
+        cache = ResponseCache(ttl=-1)
+        cache.put("q", "a")
+        
+        assert cache.get("q") is None
+
+
+class TestEmbeddingBatcher:
+    """Test suite for query embedding batching."""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_request(self):
+        """Test that queries arriving together are embedded in one call."""
+        import asyncio
+        from rag.batcher import EmbeddingBatcher
+        
+        calls = []
+        
+        def embed(texts):
+            calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+        
+        batcher = EmbeddingBatcher(embed, max_batch=8, window=0.05)
+        try:
+            results = await asyncio.gather(*(batcher.embed(q) for q in ["a", "bb", "ccc"]))
+        finally:
+            await batcher.shutdown()
+        
+        assert results == [[1.0], [2.0], [3.0]]
+        assert calls == [["a", "bb", "ccc"]]
+    
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_caller(self):
+        """Test that a failed batch raises in each waiting caller."""
+        import asyncio
+        from rag.batcher import EmbeddingBatcher
+        
+        def embed(texts):
+            raise RuntimeError("embeddings unavailable")
+        
+        batcher = EmbeddingBatcher(embed, window=0.01)
+        try:
+            results = await asyncio.gather(
+                batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+            )
+        finally:
+            await batcher.shutdown()
+        
+        assert all(isinstance(r, RuntimeError) for r in results)
+    
+    @pytest.mark.asyncio
+    async def test_repeated_query_uses_cache(self):
+        """Test that a repeated query is answered without an embeddings call."""
+        from rag.batcher import EmbeddingBatcher
+        
+        calls = []
+        
+        def embed(texts):
+            calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+        
+        batcher = EmbeddingBatcher(embed, window=0.01, cache_size=1)
+        try:
+            first = await batcher.embed("a")
+            again = await batcher.embed("a")
+            await batcher.embed("bb")
+            await batcher.embed("a")
+        finally:
+            await batcher.shutdown()
+        
+        assert first == again == [1.0]
+        assert calls == [["a"], ["bb"], ["a"]]
+
+
+class TestContextCompression:
+    """Test suite for RAG context compression."""
+    
+    def test_keeps_segments_matching_query(self):
+        """Test that relevant lines survive and unrelated ones are dropped."""
+        from rag.compress import compress_chunk
+        
+        text = (
+            "Люк ТМ(Д400) масса 120 кг.\n"
+            "Компания основана давно и выпускает много продукции.\n"
+            "Доставка по всей стране в кратчайшие сроки.\n"
+            "Класс нагрузки Д400 для дорог."
+        )
+        result = compress_chunk(text, "Какая масса люка Д400?", target_ratio=0.1)
+        
+        assert "масса 120 кг" in result
+        assert "Класс нагрузки Д400" in result
+        assert "Доставка" not in result
+    
+    def test_single_segment_unchanged(self):
+        """Test that a one-line chunk is returned as is."""
+        from rag.compress import compress_chunk
+        
+        assert compress_chunk("Одна строка", "вопрос") == "Одна строка"
+    
+    def test_prepare_context_compresses_with_query(self):
+        """Test that _prepare_context compresses only when given a query."""
+        from rag.query import _prepare_context
+        
+        doc = Mock()
+        doc.page_content = "Вес люка 50 кг.\nЭта строка не относится к делу и занимает много места."
+        doc.metadata = {"source": "doc.pdf"}
+        
+        full = _prepare_context([(doc, 0.9)])
+        compressed = _prepare_context([(doc, 0.9)], "вес люка")
+        
+        assert "не относится" in full
+        assert "не относится" not in compressed
+        assert "[Источник 1: doc.pdf]" in compressed
+
+
+class TestSimpleIndex:
+    """Test suite for the keyword index used with Yandex."""
+    
+    @pytest.fixture
+    def simple_index(self, tmp_path):
+        """Simple index persisted to a temporary directory."""
+        from rag.index_simple import SimpleDocumentIndex
+        
+        index = SimpleDocumentIndex()
+        index.persist_directory = tmp_path
+        return index
+    
+    def test_index_single_document_appends(self, simple_index, tmp_path):
+        """Test that a new document is added without touching others."""
+        first = tmp_path / "first.txt"
+        first.write_text("Первый документ про серверы.", encoding="utf-8")
+        second = tmp_path / "second.txt"
+        second.write_text("Второй документ про сети.", encoding="utf-8")
+        
+        simple_index.index_single_document(first)
+        count = simple_index.index_single_document(second)
+        
+        assert count == 1
+        assert [simple_index.get_source(i) for i in range(2)] == ["first.txt", "second.txt"]
+        assert simple_index.get_stats()["total_documents"] == 2
+        assert (tmp_path / "chunks.bin").exists()
+    
+    def test_index_single_document_replaces_same_name(self, simple_index, tmp_path):
+        """Test that re-uploading a document replaces its old chunks."""
+        doc = tmp_path / "doc.txt"
+        doc.write_text("Старая версия.", encoding="utf-8")
+        simple_index.index_single_document(doc)
+        
+        doc.write_text("Новая версия.", encoding="utf-8")
+        simple_index.index_single_document(doc)
+        
+        assert simple_index.chunks == ["Новая версия."]
+    
+    def test_search_during_upload_sees_previous_index(self, simple_index, tmp_path):
+        """Test that a search running while a document is re-indexed is not left empty."""
+        from rag import index_simple
+        
+        doc = tmp_path / "doc.txt"
+        doc.write_text("Старая версия инструкции.", encoding="utf-8")
+        simple_index.index_single_document(doc)
+        seen = []
+        
+        def load_while_searching(path):
+            seen.append(simple_index.keyword_retrieve("инструкции"))
+            return ["Новая версия инструкции."]
+        
+        with patch.object(index_simple, '_load_document_chunks', side_effect=load_while_searching):
+            simple_index.index_single_document(doc)
+        
+        assert seen == [["Старая версия инструкции."]]
+        assert simple_index.chunks == ["Новая версия инструкции."]
+    
+    def test_concurrent_uploads_keep_all_documents(self, simple_index, tmp_path):
+        """Test that uploads from several threads do not lose or mix chunks."""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        docs = []
+        for i in range(8):
+            doc = tmp_path / f"doc{i}.txt"
+            doc.write_text(f"Документ номер {i}.", encoding="utf-8")
+            docs.append(doc)
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(simple_index.index_single_document, docs))
+        
+        assert sorted(simple_index.sources) == sorted(doc.name for doc in docs)
+        for i, chunk in enumerate(simple_index.chunks):
+            assert chunk == f"Документ номер {simple_index.get_source(i)[3:-4]}."
+    
+    def test_index_directory_in_worker_processes(self, simple_index, tmp_path):
+        """Test that documents parsed in parallel keep their chunks and sources."""
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        for i in range(3):
+            (docs / f"doc{i}.txt").write_text(f"Документ номер {i}.", encoding="utf-8")
+        
+        with patch('rag.index_simple.DOCUMENTS_DIR', docs), \
+                patch('rag.index_simple.RAG_INDEX_PROCESSES', 2):
+            count = simple_index.index_documents_directory(force_reindex=True)
+        
+        assert count == 3
+        assert {
+            simple_index.get_source(i): chunk for i, chunk in enumerate(simple_index.chunks)
+        } == {f"doc{i}.txt": f"Документ номер {i}." for i in range(3)}
+    
+    def test_saved_index_round_trips(self, simple_index, tmp_path):
+        """Test that chunks survive saving, including separator-like text."""
+        from rag.index_simple import SimpleDocumentIndex
+        
+        for chunk, source in [
+            ("Обычный чанк.", "a.txt"),
+            ("Текст с ###CHUNK_SEPARATOR### внутри.", "b.txt"),
+            ("  пробелы  ", "a.txt")
+        ]:
+            simple_index._data.append(chunk, source)
+        simple_index._save_index()
+        
+        loaded = SimpleDocumentIndex()
+        loaded.persist_directory = tmp_path
+        
+        assert loaded._load_index() == 3
+        assert loaded.chunks == simple_index.chunks
+        assert loaded.sources == ["a.txt", "b.txt"]
+        assert loaded.get_source(2) == "a.txt"
+        assert loaded.keyword_retrieve("обычный") == ["Обычный чанк."]
+    
+    def test_legacy_text_index_is_loaded(self, simple_index, tmp_path):
+        """Test that an index saved in the old sentinel format still loads."""
+        (tmp_path / "chunks.txt").write_text(
+            "Первый.\n###CHUNK_SEPARATOR###\nВторой.\n###CHUNK_SEPARATOR###\n",
+            encoding="utf-8"
+        )
+        
+        assert simple_index._load_index() == 2
+        assert simple_index.chunks == ["Первый.", "Второй."]
+        assert simple_index.sources == ["Unknown"]
+    
+    def test_keyword_retrieve_ranks_by_overlap(self, simple_index, tmp_path):
+        """Test that retrieval ranks chunks by keyword overlap and phrase match."""
+        for name, text in [
+            ("a.txt", "Настройка сети на сервере."),
+            ("b.txt", "Резервное копирование сервера и настройка сети."),
+            ("c.txt", "Рецепт пирога.")
+        ]:
+            (tmp_path / name).write_text(text, encoding="utf-8")
+            simple_index.index_single_document(tmp_path / name)
+        
+        result = simple_index.keyword_retrieve("настройка сети", top_k=5)
+        
+        assert result == [
+            "Настройка сети на сервере.",
+            "Резервное копирование сервера и настройка сети."
+        ]
+        
+        # Повторная загрузка документа не оставляет устаревших записей в индексе
+        (tmp_path / "a.txt").write_text("Рецепт торта.", encoding="utf-8")
+        simple_index.index_single_document(tmp_path / "a.txt")
+        
+        assert simple_index.keyword_retrieve("рецепт", top_k=5) == ["Рецепт пирога.", "Рецепт торта."]
+
+
+class TestEmbeddingCache:
+    """Test suite for the on-disk chunk embedding cache."""
+    
+    def test_cached_chunks_skip_embeddings_request(self, tmp_path):
+        """Test that only unseen chunk texts are sent for embedding."""
+        from rag.embedding_cache import CachedEmbeddings
+        
+        underlying = Mock()
+        underlying.embed_documents = Mock(side_effect=lambda texts: [[float(len(t)), 1.0] for t in texts])
+        cache = CachedEmbeddings(underlying, cache_dir=tmp_path, namespace="test-model")
+        
+        first = cache.embed_documents(["alpha", "beta"])
+        second = cache.embed_documents(["beta", "gamma!", "alpha"])
+        
+        assert first == [[5.0, 1.0], [4.0, 1.0]]
+        assert second == [[4.0, 1.0], [6.0, 1.0], [5.0, 1.0]]
+        assert underlying.embed_documents.call_args_list[1].args[0] == ["gamma!"]
+    
+    def test_namespace_separates_models(self, tmp_path):
+        """Test that vectors cached for one model are not reused for another."""
+        from rag.embedding_cache import CachedEmbeddings
+        
+        underlying = Mock()
+        underlying.embed_documents = Mock(return_value=[[0.5]])
+        
+        CachedEmbeddings(underlying, cache_dir=tmp_path, namespace="model-a").embed_documents(["text"])
+        CachedEmbeddings(underlying, cache_dir=tmp_path, namespace="model-b").embed_documents(["text"])
+        
+        assert underlying.embed_documents.call_count == 2
+    
+    def test_cache_evicts_least_recently_used(self, tmp_path):
+        """Test that the cache keeps at most max_files vectors, dropping the stalest."""
+        import os
+        from rag.embedding_cache import CachedEmbeddings
+        
+        underlying = Mock()
+        underlying.embed_documents = Mock(side_effect=lambda texts: [[1.0] for _ in texts])
+        cache = CachedEmbeddings(underlying, cache_dir=tmp_path, max_files=2)
+        
+        cache.embed_documents(["old", "recent"])
+        os.utime(cache._path("old"), (0, 0))
+        os.utime(cache._path("recent"), (1, 1))
+        cache.embed_documents(["new"])
+        
+        assert not cache._path("old").exists()
+        assert cache._path("recent").exists() and cache._path("new").exists()
+    
+    def test_retained_batches_evict_once(self, tmp_path):
+        """Test that eviction scans the cache once per retain block, not per batch."""
+        from rag.embedding_cache import CachedEmbeddings
+        
+        underlying = Mock()
+        underlying.embed_documents = Mock(side_effect=lambda texts: [[1.0] for _ in texts])
+        cache = CachedEmbeddings(underlying, cache_dir=tmp_path)
+        
+        with patch('rag.embedding_cache.evict_lru_files') as evict:
+            with cache.retain():
+                cache.embed_documents(["a"])
+                cache.embed_documents(["b"])
+                assert evict.call_count == 0
+        
+        assert evict.call_count == 1
+    
+    def test_queries_are_not_cached(self, tmp_path):
+        """Test that query embeddings bypass the cache."""
+        from rag.embedding_cache import CachedEmbeddings
+        
+        underlying = Mock()
+        underlying.embed_query = Mock(return_value=[0.1, 0.2])
+        cache = CachedEmbeddings(underlying, cache_dir=tmp_path)
+        
+        assert cache.embed_query("question") == [0.1, 0.2]
+        assert list(tmp_path.iterdir()) == []
+
+
 class TestRAGIntegration:
     """Integration tests for RAG system."""
     
@@ -0,0 +1,114 @@
+"""
+Tests for handler scheduling.
+"""
+
+import asyncio
+import pytest
+
+from services.scheduler import PriorityScheduler
+
+
+class TestPriorityScheduler:
+    """Test suite for the priority scheduler."""
+    
+    @pytest.mark.asyncio
+    async def test_submit_returns_result(self):
+        """Test that submit returns the job result."""
+        scheduler = PriorityScheduler(workers=2)
+        
+        async def job():
+            return 42
+        
+        try:
+            assert await scheduler.submit(job) == 42
+        finally:
+            await scheduler.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_submit_propagates_exception(self):
+        """Test that job exceptions are raised to the caller."""
+        scheduler = PriorityScheduler(workers=1)
+        
+        async def job():
+            raise ValueError("boom")
+        
+        try:
+            with pytest.raises(ValueError):
+                await scheduler.submit(job)
+        finally:
+            await scheduler.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_job_keeps_worker_alive(self):
+        """Test that a job raising CancelledError does not take its worker down."""
+        scheduler = PriorityScheduler(workers=1)
+        
+        async def cancelled_job():
+            raise asyncio.CancelledError()
+        
+        async def job():
+            return "ok"
+        
+        try:
+            with pytest.raises(asyncio.CancelledError):
+                await scheduler.submit(cancelled_job)
+            assert await asyncio.wait_for(scheduler.submit(job), timeout=1) == "ok"
+        finally:
+            await scheduler.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_shutdown_stops_busy_worker(self):
+        """Test that shutdown cancels a worker that is running a job."""
+        scheduler = PriorityScheduler(workers=1)
+        started = asyncio.Event()
+        
+        async def job():
+            started.set()
+            await asyncio.Event().wait()
+        
+        pending = asyncio.create_task(scheduler.submit(job))
+        await started.wait()
+        tasks = scheduler._tasks
+        await asyncio.wait_for(scheduler.shutdown(), timeout=1)
+        
+        assert all(task.done() for task in tasks)
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+    
+    @pytest.mark.asyncio
+    async def test_cheap_jobs_run_first(self):
+        """Test that queued jobs run in priority order, FIFO within a priority."""
+        scheduler = PriorityScheduler(workers=1)
+        release = asyncio.Event()
+        order = []
+        
+        async def blocker():
+            await release.wait()
+        
+        def make_job(name):
+            async def job():
+                order.append(name)
+            return job
+        
+        try:
+            blocking = asyncio.create_task(scheduler.submit(blocker, priority=0))
+            await asyncio.sleep(0)
+            
+            jobs = [
+                asyncio.create_task(scheduler.submit(make_job("generation"), priority=20)),
+                asyncio.create_task(scheduler.submit(make_job("text-1"), priority=5)),
+                asyncio.create_task(scheduler.submit(make_job("command"), priority=0)),
+                asyncio.create_task(scheduler.submit(make_job("text-2"), priority=5)),
+            ]
+            await asyncio.sleep(0)
+            
+            release.set()
+            await asyncio.gather(blocking, *jobs)
+            
+            assert order == ["command", "text-1", "text-2", "generation"]
+        finally:
+            await scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -2,6 +2,9 @@
 Tests for Speech-to-Text functionality.
 """
 
+import shutil
+import subprocess
+
 import pytest
 from unittest.mock import Mock, AsyncMock, patch, MagicMock
 from pathlib import Path
@@ -79,26 +82,138 @@ class TestSTT:
                 except Exception:
                     # Conversion may fail in test environment, that's ok
                     pass
+    
+    @pytest.mark.asyncio
+    async def test_transcribe_voice_bytes_stays_in_memory(self):
+        """Test in-memory transcription pipes audio without temporary files."""
+        from services.stt import transcribe_voice_bytes
+        
+        mock_client = Mock()
+        mock_client.transcribe_audio_bytes = AsyncMock(return_value="text")
+        
+        with patch('services.stt.API_PROVIDER', 'openai'), \
+             patch('services.stt.stt_client', mock_client), \
+             patch('services.stt.convert_ogg_bytes_to_wav', AsyncMock(return_value=b"wav data")) as convert, \
+             patch('services.stt.transcribe_voice_message') as transcribe_file:
+            result = await transcribe_voice_bytes(b"ogg data")
+        
+        assert result == "text"
+        convert.assert_awaited_once_with(b"ogg data")
+        mock_client.transcribe_audio_bytes.assert_awaited_once_with(b"wav data", "voice.wav")
+        transcribe_file.assert_not_called()
 
 
 class TestAudioHelpers:
     """Test suite for audio helper functions."""
     
-    def test_convert_ogg_to_wav_mock(self):
+    @pytest.mark.asyncio
+    async def test_convert_ogg_to_wav_mock(self):
         """Test OGG to WAV conversion (mocked)."""
-        with patch('utils.helpers.AudioSegment') as mock_audio:
-            from utils.helpers import convert_ogg_to_wav
-            
-            # Mock AudioSegment
-            mock_segment = Mock()
-            mock_audio.from_ogg.return_value = mock_segment
-            
+        from utils.helpers import convert_ogg_to_wav
+        
+        # Mock ffmpeg process
+        mock_process = Mock(returncode=0)
+        mock_process.communicate = AsyncMock(return_value=(None, b""))
+        
+        with patch('utils.helpers._ffmpeg_path', "/usr/bin/ffmpeg"), \
+             patch('asyncio.create_subprocess_exec', AsyncMock(return_value=mock_process)) as mock_exec:
             # Test conversion
             input_path = Path("test.ogg")
-            result = convert_ogg_to_wav(input_path)
-            
-            assert result.suffix == '.wav'
-            assert result.stem == input_path.stem
+            result = await convert_ogg_to_wav(input_path)
+        
+        assert result.suffix == '.wav'
+        assert result.stem == input_path.stem
+        assert mock_exec.await_args.args[0] == "/usr/bin/ffmpeg"
+    
+    @pytest.mark.asyncio
+    async def test_convert_ogg_to_wav_failure(self):
+        """Test that a failed ffmpeg run raises."""
+        from utils.helpers import convert_ogg_to_wav
+        
+        mock_process = Mock(returncode=1)
+        mock_process.communicate = AsyncMock(return_value=(None, b"Invalid data found"))
+        
+        with patch('utils.helpers._ffmpeg_path', "/usr/bin/ffmpeg"), \
+             patch('asyncio.create_subprocess_exec', AsyncMock(return_value=mock_process)):
+            with pytest.raises(RuntimeError):
+                await convert_ogg_to_wav(Path("broken.ogg"))
+    
+    @pytest.mark.asyncio
+    async def test_convert_ogg_bytes_to_wav_mock(self):
+        """Test in-memory OGG to WAV conversion feeds ffmpeg through pipes."""
+        from utils.helpers import convert_ogg_bytes_to_wav
+        
+        mock_process = Mock(returncode=0)
+        mock_process.communicate = AsyncMock(return_value=(b"RIFF wav", b""))
+        
+        with patch('utils.helpers._ffmpeg_path', "/usr/bin/ffmpeg"), \
+             patch('asyncio.create_subprocess_exec', AsyncMock(return_value=mock_process)) as mock_exec:
+            result = await convert_ogg_bytes_to_wav(b"OggS data")
+        
+        assert result == b"RIFF wav"
+        mock_process.communicate.assert_awaited_once_with(b"OggS data")
+        assert "pipe:0" in mock_exec.await_args.args
+        assert mock_exec.await_args.args[-1] == "pipe:1"
+    
+    @pytest.mark.asyncio
+    async def test_convert_ogg_to_wav_without_ffmpeg(self):
+        """Test that a failed ffmpeg lookup is remembered and no process is spawned."""
+        from utils.helpers import convert_ogg_to_wav
+        
+        mock_exec = AsyncMock()
+        
+        with patch('utils.helpers._ffmpeg_path', ""), \
+             patch('asyncio.create_subprocess_exec', mock_exec):
+            with pytest.raises(FileNotFoundError):
+                await convert_ogg_to_wav(Path("test.ogg"))
+        
+        mock_exec.assert_not_awaited()
+    
+    @pytest.mark.asyncio
+    async def test_concat_audio_files_mock(self):
+        """Test that parts are joined by ffmpeg's concat filter into OGG/Opus."""
+        from utils.helpers import concat_audio_files
+        
+        mock_process = Mock(returncode=0)
+        mock_process.communicate = AsyncMock(return_value=(None, b""))
+        
+        with patch('utils.helpers._ffmpeg_path', "/usr/bin/ffmpeg"), \
+             patch('asyncio.create_subprocess_exec', AsyncMock(return_value=mock_process)) as mock_exec:
+            result = await concat_audio_files([Path("a.mp3"), Path("b.mp3")])
+        
+        args = mock_exec.await_args.args
+        assert result.suffix == ".ogg"
+        assert args[-1] == str(result)
+        assert "concat=n=2:v=0:a=1" in args
+        assert "libopus" in args
+    
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    async def test_concat_audio_files_decodes_whole(self, tmp_path):
+        """Test that the joined file decodes to the full length of all parts."""
+        from utils.helpers import concat_audio_files
+        
+        parts = []
+        for i, seconds in enumerate((1, 2)):
+            part = tmp_path / f"part{i}.mp3"
+            subprocess.run(
+                ["ffmpeg", "-loglevel", "error", "-f", "lavfi",
+                 "-i", f"sine=frequency=440:duration={seconds}", str(part)],
+                check=True
+            )
+            parts.append(part)
+        
+        joined = await concat_audio_files(parts)
+        try:
+            # Decode the whole file; a broken join stops after the first part
+            decoded = subprocess.run(
+                ["ffmpeg", "-loglevel", "error", "-i", str(joined), "-f", "s16le", "-ac", "1", "-ar", "8000", "pipe:1"],
+                check=True, capture_output=True
+            ).stdout
+        finally:
+            joined.unlink(missing_ok=True)
+        
+        assert len(decoded) / 2 / 8000 == pytest.approx(3, abs=0.1)
     
     @pytest.mark.asyncio
     async def test_save_file_async(self, tmp_path):
@@ -114,6 +229,25 @@ class TestAudioHelpers:
         # Cleanup
         result.unlink()
     
+    def test_unique_id(self):
+        """Test that generated file IDs are unique 16-character hex strings."""
+        from utils.helpers import unique_id
+        
+        ids = [unique_id() for _ in range(1000)]
+        
+        assert len(set(ids)) == len(ids)
+        assert all(len(i) == 16 and int(i, 16) >= 0 for i in ids)
+    
+    @pytest.mark.asyncio
+    async def test_read_file_async(self, tmp_path):
+        """Test async file reading."""
+        from utils.helpers import read_file_async
+
+        test_file = tmp_path / "test.bin"
+        test_file.write_bytes(b"binary content")
+
+        assert await read_file_async(test_file) == b"binary content"
+
     def test_cleanup_file(self, tmp_path):
         """Test file cleanup."""
         from utils.helpers import cleanup_file
@@ -147,6 +281,18 @@ class TestAudioHelpers:
         
         assert not file1.exists()
         assert not file2.exists()
+    
+    @pytest.mark.asyncio
+    async def test_cleanup_files_async(self, tmp_path):
+        """Test async cleanup skips missing files and None."""
+        from utils.helpers import cleanup_files_async
+        
+        existing = tmp_path / "test.txt"
+        existing.write_text("test")
+        
+        await cleanup_files_async(existing, tmp_path / "missing.txt", None)
+        
+        assert not existing.exists()
 
 
 class TestTTSIntegration:
@@ -180,6 +326,44 @@ class TestTTSIntegration:
         
         assert isinstance(result, Path)
     
+    @pytest.mark.asyncio
+    async def test_generate_speech_caches_repeated_phrase(self, mock_tts_response, tmp_path):
+        """Test that a phrase is cached on its second request and then served without the API."""
+        def stream_to_file(path):
+            Path(path).write_bytes(b"mp3 data")
+        
+        client = OpenAIClient()
+        client.client.audio.speech.create.return_value.stream_to_file = stream_to_file
+        cache_dir = tmp_path / "cache"
+        
+        with patch('services.openai_client.TTS_CACHE_DIR', cache_dir):
+            first = await client.generate_speech("Привет!", output_path=tmp_path / "first.mp3")
+            assert not cache_dir.exists()
+            await client.generate_speech("Привет!", output_path=tmp_path / "second.mp3")
+            third = await client.generate_speech("Привет!", output_path=tmp_path / "third.mp3")
+        
+        assert client.client.audio.speech.create.await_count == 2
+        assert first != third
+        assert third.read_bytes() == b"mp3 data"
+    
+    @pytest.mark.asyncio
+    async def test_speech_cache_is_bounded(self, mock_tts_response, tmp_path):
+        """Test that the speech cache keeps at most TTS_CACHE_MAX_FILES phrases."""
+        def stream_to_file(path):
+            Path(path).write_bytes(b"mp3 data")
+        
+        client = OpenAIClient()
+        client.client.audio.speech.create.return_value.stream_to_file = stream_to_file
+        cache_dir = tmp_path / "cache"
+        
+        with patch('services.openai_client.TTS_CACHE_DIR', cache_dir), \
+             patch('services.openai_client.TTS_CACHE_MAX_FILES', 2):
+            for phrase in ("Один.", "Два.", "Три."):
+                for _ in range(2):
+                    await client.generate_speech(phrase, output_path=tmp_path / "out.mp3")
+        
+        assert len(list(cache_dir.glob("*.mp3"))) == 2
+    
     def test_get_voice_info(self):
         """Test voice information retrieval."""
         from services.tts import get_voice_info
@@ -8,6 +8,7 @@ from unittest.mock import Mock, AsyncMock, patch
 from services.openai_client import OpenAIClient
 from services.router import route_text_request
 from utils.helpers import UserSession
+from config import MAX_HISTORY_LENGTH
 
 
 class TestTextProcessing:
@@ -55,6 +56,221 @@ class TestTextProcessing:
         assert "text" in response
         assert isinstance(response["text"], str)
     
+    @pytest.mark.asyncio
+    async def test_generate_text_response_stream(self, mock_openai_client):
+        """Test that streamed fragments are yielded as they arrive."""
+        class FakeStream:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc):
+                return False
+            
+            async def __aiter__(self):
+                for content in ("При", None, "вет"):
+                    yield Mock(choices=[Mock(delta=Mock(content=content))])
+        
+        client = OpenAIClient()
+        client.client.chat.completions.create = AsyncMock(return_value=FakeStream())
+        
+        fragments = [f async for f in client.generate_text_response_stream([{"role": "user", "content": "Hi"}])]
+        
+        assert fragments == ["При", "вет"]
+        assert client.client.chat.completions.create.await_args.kwargs["stream"] is True
+    
+    @pytest.mark.asyncio
+    async def test_reply_overlaps_intent_detection(self):
+        """Test that the text answer is generated while intent detection runs."""
+        import asyncio
+        
+        reply_started = asyncio.Event()
+        
+        async def detect(text, history):
+            # Only finishes once the reply is already being generated
+            await asyncio.wait_for(reply_started.wait(), timeout=1)
+            return {"needs_generation": False, "confidence": 0.0}
+        
+        async def reply(messages):
+            reply_started.set()
+            return "Ответ"
+        
+        with patch('services.router.detect_image_generation_intent', new=detect), \
+                patch('services.router.ai_client.generate_text_response', new=reply):
+            response = await route_text_request(54321, "Привет", mode="text")
+        
+        assert response["text"] == "Ответ"
+    
+    @pytest.mark.asyncio
+    async def test_image_intent_cancels_speculative_reply(self):
+        """Test that the speculative answer is dropped for image requests."""
+        import asyncio
+        
+        async def reply(messages):
+            await asyncio.sleep(10)
+            return "Не должно быть отправлено"
+        
+        detect = AsyncMock(return_value={"needs_generation": True, "confidence": 0.9, "prompt": "кот"})
+        image = AsyncMock(return_value={"text": "🎨", "has_image": True})
+        
+        with patch('services.router.detect_image_generation_intent', new=detect), \
+                patch('services.router.ai_client.generate_text_response', new=reply), \
+                patch('services.router.route_image_generation_request', new=image):
+            response = await route_text_request(54322, "Нарисуй кота", mode="text")
+            await asyncio.sleep(0)
+        
+        assert response["has_image"] is True
+        assert [t for t in asyncio.all_tasks() if t is not asyncio.current_task()] == []
+    
+    @pytest.mark.asyncio
+    async def test_dropped_reply_finishes_cleanup_first(self):
+        """Test that the speculative reply has finished its cleanup before the image is routed."""
+        import asyncio
+        
+        cleaned = []
+        
+        async def reply(messages):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                cleaned.append(True)
+        
+        async def image(**kwargs):
+            return {"text": "🎨", "has_image": True, "reply_cleaned": bool(cleaned)}
+        
+        async def detect(text, history):
+            # Let the speculative reply start
+            await asyncio.sleep(0)
+            return {"needs_generation": True, "confidence": 0.9, "prompt": "кот"}
+        
+        with patch('services.router.detect_image_generation_intent', new=detect), \
+                patch('services.router.ai_client.generate_text_response', new=reply), \
+                patch('services.router.route_image_generation_request', new=image):
+            response = await route_text_request(54326, "Нарисуй кота", mode="text")
+        
+        assert response["reply_cleaned"] is True
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_requests_share_one_reply(self):
+        """Test that an identical in-flight request does not run the pipeline again."""
+        import asyncio
+        from services import router
+        
+        release = asyncio.Event()
+        
+        async def reply(messages):
+            await release.wait()
+            return "Ответ"
+        
+        reply_mock = AsyncMock(side_effect=reply)
+        detect = AsyncMock(return_value={"needs_generation": False, "confidence": 0.0})
+        
+        with patch('services.router.detect_image_generation_intent', new=detect), \
+                patch('services.router.ai_client.generate_text_response', new=reply_mock):
+            first = asyncio.create_task(route_text_request(54324, "Привет", mode="text"))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(route_text_request(54324, "Привет", mode="text"))
+            await asyncio.sleep(0)
+            release.set()
+            responses = await asyncio.gather(first, second)
+        
+        assert [r["text"] for r in responses] == ["Ответ", "Ответ"]
+        assert reply_mock.await_count == 1
+        assert router._inflight == {}
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_image_request_gets_short_notice(self):
+        """Test that a repeated image request does not echo the first caption without the image."""
+        import asyncio
+        
+        release = asyncio.Event()
+        
+        async def generate(**kwargs):
+            await release.wait()
+            return {"text": "🎨 Изображение создано!", "image_path": "cat.png", "has_image": True}
+        
+        detect = AsyncMock(return_value={"needs_generation": True, "confidence": 0.9, "prompt": "кот"})
+        
+        with patch('services.router.detect_image_generation_intent', new=detect), \
+                patch('services.router.ai_client.generate_text_response', new=AsyncMock(return_value="")), \
+                patch('services.router.route_image_generation_request', new=generate):
+            first = asyncio.create_task(route_text_request(54325, "Нарисуй кота", mode="text"))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(route_text_request(54325, "Нарисуй кота", mode="text"))
+            await asyncio.sleep(0)
+            release.set()
+            original, duplicate = await asyncio.gather(first, second)
+        
+        assert original["image_path"] == "cat.png"
+        assert duplicate["has_image"] is False
+        assert "уже создаётся" in duplicate["text"]
+    
+    @pytest.mark.asyncio
+    async def test_spoken_reply_is_voiced_while_streaming(self, tmp_path):
+        """Test that finished sentences are voiced before the answer is complete."""
+        import asyncio
+        
+        first_voiced = asyncio.Event()
+        spoken = []
+        
+        async def stream(messages):
+            yield "Первое предложение. Вто"
+            # The rest of the answer only arrives once the first sentence is voiced
+            await asyncio.wait_for(first_voiced.wait(), timeout=1)
+            yield "рое предложение."
+        
+        async def voice(text, voice):
+            spoken.append(text)
+            path = tmp_path / f"part{len(spoken)}.mp3"
+            path.write_bytes(text.encode())
+            first_voiced.set()
+            return path
+        
+        async def concat(paths):
+            path = tmp_path / "joined.ogg"
+            path.write_bytes(b"".join(part.read_bytes() for part in paths))
+            return path
+        
+        detect = AsyncMock(return_value={"needs_generation": False, "confidence": 0.0})
+        
+        with patch('services.router.detect_image_generation_intent', new=detect), \
+                patch('services.router.ai_client.generate_text_response_stream', new=stream), \
+                patch('services.router.generate_voice_response', new=voice), \
+                patch('services.router.concat_audio_files', new=concat):
+            response = await route_text_request(54323, "Привет", mode="text", voice="alloy")
+        
+        assert response["text"] == "Первое предложение. Второе предложение."
+        assert spoken == ["Первое предложение.", "Второе предложение."]
+        assert response["voice_path"].read_bytes() == "Первое предложение.Второе предложение.".encode()
+        assert not (tmp_path / "part1.mp3").exists()
+    
+    @pytest.mark.asyncio
+    async def test_spoken_reply_without_ffmpeg_is_voiced_whole(self, tmp_path):
+        """Test that the answer is voiced in one request when the parts cannot be joined."""
+        spoken = []
+        
+        async def stream(messages):
+            yield "Первое предложение. "
+            yield "Второе предложение."
+        
+        async def voice(text, voice):
+            spoken.append(text)
+            path = tmp_path / f"part{len(spoken)}.mp3"
+            path.write_bytes(text.encode())
+            return path
+        
+        detect = AsyncMock(return_value={"needs_generation": False, "confidence": 0.0})
+        concat = AsyncMock(side_effect=FileNotFoundError("ffmpeg not found in PATH"))
+        
+        with patch('services.router.detect_image_generation_intent', new=detect), \
+                patch('services.router.ai_client.generate_text_response_stream', new=stream), \
+                patch('services.router.generate_voice_response', new=voice), \
+                patch('services.router.concat_audio_files', new=concat):
+            response = await route_text_request(54327, "Привет", mode="text", voice="alloy")
+        
+        assert spoken[-1] == "Первое предложение. Второе предложение."
+        assert response["voice_path"].read_bytes() == spoken[-1].encode()
+        assert len(list(tmp_path.glob("part*.mp3"))) == 1
+    
     def test_user_session_history(self):
         """Test user session history management."""
         session = UserSession()
@@ -85,6 +301,33 @@ class TestTextProcessing:
         session.clear_history(user_id)
         assert len(session.get_history(user_id)) == 0
     
+    def test_user_session_history_is_bounded(self):
+        """Test that only the most recent messages are kept."""
+        session = UserSession()
+        user_id = 12345
+        
+        for i in range(MAX_HISTORY_LENGTH * 2 + 5):
+            session.add_message(user_id, "user", str(i))
+        
+        history = session.get_history(user_id)
+        
+        assert len(history) == MAX_HISTORY_LENGTH * 2
+        assert history[0]["content"] == "5"
+        assert history[-1]["content"] == str(MAX_HISTORY_LENGTH * 2 + 4)
+    
+    def test_user_session_lru_eviction(self):
+        """Test that the least recently used user is evicted over the cap."""
+        session = UserSession(max_sessions=2)
+        
+        session.add_message(1, "user", "first")
+        session.add_message(2, "user", "second")
+        session.get_history(1)  # user 1 becomes most recent
+        session.add_message(3, "user", "third")
+        
+        assert len(session.get_history(1)) == 1
+        assert session.get_history(2) == []
+        assert len(session.history) == 2
+    
     def test_user_mode_management(self):
         """Test user mode setting and retrieval."""
         session = UserSession()
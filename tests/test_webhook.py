@@ -0,0 +1,81 @@
+"""
+Tests for the webhook update receiver.
+"""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, patch
+from aiohttp.test_utils import TestClient, TestServer
+
+import webhook
+
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 10,
+        "date": 0,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "text": "Привет"
+    }
+}
+
+
+@pytest_asyncio.fixture
+async def webhook_client():
+    """Client for a webhook app with a known secret."""
+    client = TestClient(TestServer(webhook.create_webhook_app("/hook", secret="s3cret")))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+class TestWebhook:
+    """Test suite for receiving updates over a webhook."""
+    
+    @pytest.mark.asyncio
+    async def test_update_is_dispatched(self, webhook_client):
+        """Test that a valid update reaches the bot handlers."""
+        with patch.object(webhook.bot, 'process_new_updates', new=AsyncMock()) as process:
+            response = await webhook_client.post(
+                "/hook",
+                json=UPDATE,
+                headers={webhook.SECRET_HEADER: "s3cret"}
+            )
+            await asyncio.sleep(0)
+        
+        assert response.status == 200
+        update = process.call_args.args[0][0]
+        assert update.message.text == "Привет"
+    
+    @pytest.mark.asyncio
+    async def test_wrong_secret_is_rejected(self, webhook_client):
+        """Test that requests without the secret token are not processed."""
+        with patch.object(webhook.bot, 'process_new_updates', new=AsyncMock()) as process:
+            response = await webhook_client.post("/hook", json=UPDATE)
+        
+        assert response.status == 403
+        process.assert_not_called()
+    
+    def test_secret_is_required(self):
+        """Test that a webhook app cannot be created without a secret token."""
+        with pytest.raises(ValueError):
+            webhook.create_webhook_app("/hook", secret="")
+    
+    @pytest.mark.asyncio
+    async def test_malformed_body_is_rejected(self, webhook_client):
+        """Test that a body that is not an update gets a client error."""
+        response = await webhook_client.post(
+            "/hook",
+            data=b"not json",
+            headers={webhook.SECRET_HEADER: "s3cret"}
+        )
+        
+        assert response.status == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
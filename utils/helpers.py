@@ -3,16 +3,44 @@ Helper functions for the Personal Assistant Bot.
 Provides utility functions for file operations, audio conversion, etc.
 """
 
+import asyncio
+import heapq
 import os
-import uuid
+import shutil
+import threading
 import aiofiles
+import aiofiles.os
+from collections import OrderedDict, deque
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Union
+from typing import Iterator, Optional, Sequence, Tuple, Union
 
-from config import BASE_DIR
+from config import BASE_DIR, MAX_SESSIONS, MAX_HISTORY_LENGTH, DEFAULT_VOICE
 from utils.logging import logger
 
 
+# Random bytes for file IDs, refilled from one urandom call per 128 IDs
+_id_buffer = bytearray()
+_id_lock = threading.Lock()
+ID_BYTES = 8
+ID_REFILL_SIZE = 1024
+
+
+def unique_id() -> str:
+    """
+    Generate a random 16-character hex ID for temporary file names.
+    
+    Returns:
+        Hex string from 8 random bytes
+    """
+    with _id_lock:
+        if len(_id_buffer) < ID_BYTES:
+            _id_buffer.extend(os.urandom(ID_REFILL_SIZE))
+        chunk = _id_buffer[:ID_BYTES]
+        del _id_buffer[:ID_BYTES]
+    return chunk.hex()
+
+
 async def save_file_async(file_content: bytes, extension: str = "tmp") -> Path:
     """
     Save file content asynchronously to a temporary file.
@@ -24,7 +52,7 @@ async def save_file_async(file_content: bytes, extension: str = "tmp") -> Path:
     Returns:
         Path to the saved file
     """
-    filename = f"{uuid.uuid4()}.{extension}"
+    filename = f"{unique_id()}.{extension}"
     filepath = BASE_DIR / "data" / filename
     
     try:
@@ -37,53 +65,172 @@ async def save_file_async(file_content: bytes, extension: str = "tmp") -> Path:
         raise
 
 
-def convert_ogg_to_wav(ogg_path: Union[str, Path]) -> Path:
+async def read_file_async(filepath: Union[str, Path]) -> bytes:
     """
-    Convert OGG audio file to WAV format using pydub.
+    Read file content asynchronously.
     
     Args:
-        ogg_path: Path to the OGG file
+        filepath: Path to the file
     
     Returns:
-        Path to the converted WAV file
+        Binary content of the file
     """
     try:
-        # Lazy import to avoid audioop error on startup
-        from pydub import AudioSegment
-    except ImportError as e:
-        logger.error(f"pydub not available: {e}. Install ffmpeg and audioop support.")
+        async with aiofiles.open(filepath, 'rb') as f:
+            return await f.read()
+    except Exception as e:
+        logger.error(f"Error reading file {filepath}: {e}")
         raise
+
+
+# Resolved ffmpeg executable; empty string once the lookup has failed
+_ffmpeg_path: Optional[str] = None
+
+
+def _find_ffmpeg() -> str:
+    """Resolve the ffmpeg executable once per process."""
+    global _ffmpeg_path
+    if _ffmpeg_path is None:
+        _ffmpeg_path = shutil.which("ffmpeg") or ""
+    if not _ffmpeg_path:
+        raise FileNotFoundError("ffmpeg not found in PATH")
+    return _ffmpeg_path
+
+
+async def convert_ogg_to_wav(ogg_path: Union[str, Path]) -> Path:
+    """
+    Convert OGG audio file to 16 kHz mono WAV with an ffmpeg subprocess.
+    
+    Args:
+        ogg_path: Path to the OGG file
     
+    Returns:
+        Path to the converted WAV file
+    """
     ogg_path = Path(ogg_path)
     wav_path = ogg_path.with_suffix('.wav')
     
     try:
-        audio = AudioSegment.from_ogg(ogg_path)
-        audio.export(wav_path, format='wav')
-        logger.debug(f"Converted {ogg_path} to {wav_path}")
-        return wav_path
-    except Exception as e:
-        logger.error(f"Error converting audio: {e}")
+        process = await asyncio.create_subprocess_exec(
+            _find_ffmpeg(), "-y", "-loglevel", "error",
+            "-i", str(ogg_path),
+            "-ar", "16000", "-ac", "1",
+            str(wav_path),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+    except FileNotFoundError:
+        logger.error("ffmpeg not found. Install ffmpeg to convert voice messages.")
+        raise
+    
+    if process.returncode != 0:
+        await cleanup_file_async(wav_path)
+        error = stderr.decode(errors="replace").strip()[-500:]
+        logger.error(f"Error converting audio: {error}")
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}")
+    
+    logger.debug(f"Converted {ogg_path} to {wav_path}")
+    return wav_path
+
+
+async def convert_ogg_bytes_to_wav(ogg_data: bytes) -> bytes:
+    """
+    Convert in-memory OGG audio to 16 kHz mono WAV, piping through ffmpeg.
+    
+    Args:
+        ogg_data: Raw OGG audio
+    
+    Returns:
+        WAV audio bytes
+    """
+    try:
+        process = await asyncio.create_subprocess_exec(
+            _find_ffmpeg(), "-loglevel", "error",
+            "-i", "pipe:0",
+            "-ar", "16000", "-ac", "1",
+            "-f", "wav", "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        wav_data, stderr = await process.communicate(ogg_data)
+    except FileNotFoundError:
+        logger.error("ffmpeg not found. Install ffmpeg to convert voice messages.")
+        raise
+    
+    if process.returncode != 0:
+        error = stderr.decode(errors="replace").strip()[-500:]
+        logger.error(f"Error converting audio: {error}")
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}")
+    
+    logger.debug(f"Converted {len(ogg_data)} bytes of OGG to {len(wav_data)} bytes of WAV")
+    return wav_data
+
+
+async def concat_audio_files(paths: Sequence[Union[str, Path]]) -> Path:
+    """
+    Join audio files into one OGG/Opus voice message with ffmpeg.
+    
+    Parts are decoded and re-encoded, so the headers of each part (ID3,
+    Xing) do not end up inside the result, and send_voice gets the
+    OGG/Opus audio Telegram expects.
+    
+    Args:
+        paths: Audio files in playback order
+    
+    Returns:
+        Path to the joined OGG file
+    """
+    ogg_path = BASE_DIR / "data" / f"{unique_id()}.ogg"
+    inputs = [arg for path in paths for arg in ("-i", str(path))]
+    
+    try:
+        process = await asyncio.create_subprocess_exec(
+            _find_ffmpeg(), "-y", "-loglevel", "error",
+            *inputs,
+            "-filter_complex", f"concat=n={len(paths)}:v=0:a=1",
+            "-c:a", "libopus", "-b:a", "48k",
+            str(ogg_path),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+    except FileNotFoundError:
+        logger.error("ffmpeg not found. Install ffmpeg to join voice responses.")
         raise
+    
+    if process.returncode != 0:
+        await cleanup_file_async(ogg_path)
+        error = stderr.decode(errors="replace").strip()[-500:]
+        logger.error(f"Error joining audio: {error}")
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}")
+    
+    logger.debug(f"Joined {len(paths)} audio parts into {ogg_path}")
+    return ogg_path
 
 
-def cleanup_file(filepath: Union[str, Path]) -> None:
+def cleanup_file(filepath: Optional[Union[str, Path]]) -> None:
     """
     Delete a file safely.
     
     Args:
-        filepath: Path to the file to delete
+        filepath: Path to the file to delete (None is ignored)
     """
+    if filepath is None:
+        return
     try:
-        filepath = Path(filepath)
-        if filepath.exists():
-            filepath.unlink()
-            logger.debug(f"Cleaned up file: {filepath}")
+        os.remove(filepath)
+        logger.debug(f"Cleaned up file: {filepath}")
+    except FileNotFoundError:
+        pass
     except Exception as e:
         logger.warning(f"Error cleaning up file {filepath}: {e}")
 
 
-def cleanup_files(*filepaths: Union[str, Path]) -> None:
+def cleanup_files(*filepaths: Optional[Union[str, Path]]) -> None:
     """
     Delete multiple files safely.
     
@@ -94,6 +241,115 @@ def cleanup_files(*filepaths: Union[str, Path]) -> None:
         cleanup_file(filepath)
 
 
+async def cleanup_file_async(filepath: Optional[Union[str, Path]]) -> None:
+    """
+    Delete a file safely without blocking the event loop.
+    
+    Args:
+        filepath: Path to the file to delete (None is ignored)
+    """
+    if filepath is None:
+        return
+    try:
+        await aiofiles.os.remove(filepath)
+        logger.debug(f"Cleaned up file: {filepath}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Error cleaning up file {filepath}: {e}")
+
+
+async def cleanup_files_async(*filepaths: Optional[Union[str, Path]]) -> None:
+    """
+    Delete multiple files safely without blocking the event loop.
+    
+    Args:
+        *filepaths: Paths to files to delete
+    """
+    await asyncio.gather(*(cleanup_file_async(filepath) for filepath in filepaths))
+
+
+def iter_files(
+    root: Union[str, Path],
+    suffixes: Tuple[str, ...],
+    recursive: bool = True
+) -> Iterator[Path]:
+    """
+    Iterate over files with the given suffixes using os.scandir.
+    
+    Names are matched case-insensitively on the directory entry, so Path
+    objects are only created for matching files.
+    
+    Args:
+        root: Directory to scan
+        suffixes: Lowercase file suffixes to match (e.g. ('.pdf', '.txt'))
+        recursive: Descend into subdirectories
+    
+    Yields:
+        Paths to matching files
+    """
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        yield from iter_files(entry.path, suffixes, recursive)
+                elif entry.name.lower().endswith(suffixes) and entry.is_file():
+                    yield Path(entry.path)
+    except FileNotFoundError:
+        return
+
+
+def evict_lru_files(
+    directory: Union[str, Path],
+    suffix: str,
+    max_files: int,
+    companions: Tuple[str, ...] = ()
+) -> int:
+    """
+    Delete the least recently used cache files above a limit.
+    
+    Cache readers refresh the mtime of entries they hit, so the oldest
+    mtime marks the least recently used entry.
+    
+    Args:
+        directory: Cache directory
+        suffix: Extension of cache entries (e.g. ".pkl")
+        max_files: Number of entries to keep
+        companions: Extensions of files stored next to each entry
+            (e.g. metadata sidecars), deleted together with it
+    
+    Returns:
+        Number of evicted entries
+    """
+    try:
+        with os.scandir(directory) as it:
+            entries = [
+                (entry.stat().st_mtime, entry.path)
+                for entry in it
+                if entry.name.endswith(suffix)
+            ]
+    except OSError as e:
+        logger.warning(f"Could not scan cache directory {directory}: {e}")
+        return 0
+    
+    excess = len(entries) - max_files
+    if excess <= 0:
+        return 0
+    
+    for _, path in heapq.nsmallest(excess, entries):
+        path = Path(path)
+        path.unlink(missing_ok=True)
+        for companion in companions:
+            path.with_suffix(companion).unlink(missing_ok=True)
+    logger.debug(f"Evicted {excess} cache files from {directory}")
+    return excess
+
+
+FILE_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+
+@lru_cache(maxsize=256)
 def format_file_size(size_bytes: int) -> str:
     """
     Format file size in human-readable format.
@@ -104,11 +360,13 @@ def format_file_size(size_bytes: int) -> str:
     Returns:
         Formatted string (e.g., "1.5 MB")
     """
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.1f} TB"
+    # Each unit is 2**10 of the previous one, so the bit length picks it directly
+    index = min((max(int(size_bytes), 1).bit_length() - 1) // 10, len(FILE_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (index * 10)):.1f} {FILE_SIZE_UNITS[index]}"
+
+
+ELLIPSIS = "..."
+CAPTION_MAX_LENGTH = 1024  # Telegram limit for photo captions
 
 
 def truncate_text(text: str, max_length: int = 100) -> str:
@@ -124,55 +382,74 @@ def truncate_text(text: str, max_length: int = 100) -> str:
     """
     if len(text) <= max_length:
         return text
-    return text[:max_length - 3] + "..."
+    return f"{text[:max_length - len(ELLIPSIS)]}{ELLIPSIS}"
 
 
 class UserSession:
-    """Simple user session manager to store conversation history."""
+    """
+    User session manager for conversation history, mode and voice.
+    
+    Each kind of state lives in its own OrderedDict keyed by user ID and is
+    capped at max_sessions users, evicting the least recently used one.
+    """
     
-    def __init__(self):
-        self.sessions = {}
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self.history: OrderedDict[int, deque] = OrderedDict()
+        self.mode: OrderedDict[int, str] = OrderedDict()
+        self.voice: OrderedDict[int, str] = OrderedDict()
+    
+    @staticmethod
+    def _get(store: OrderedDict, user_id: int, default=None):
+        """Look up a user's entry and mark it as recently used."""
+        if user_id not in store:
+            return default
+        store.move_to_end(user_id)
+        return store[user_id]
+    
+    def _set(self, store: OrderedDict, user_id: int, value):
+        """Store a user's entry, evicting least recently used users."""
+        store[user_id] = value
+        store.move_to_end(user_id)
+        while len(store) > self.max_sessions:
+            store.popitem(last=False)
     
     def get_history(self, user_id: int) -> list:
-        """Get conversation history for a user."""
-        return self.sessions.get(user_id, [])
+        """Get a snapshot of conversation history for a user."""
+        return list(self._get(self.history, user_id, ()))
     
     def add_message(self, user_id: int, role: str, content: str):
         """Add a message to user's conversation history."""
-        if user_id not in self.sessions:
-            self.sessions[user_id] = []
+        history = self._get(self.history, user_id)
+        if history is None:
+            # Bounded deque drops the oldest message once full
+            history = deque(maxlen=MAX_HISTORY_LENGTH * 2)
+            self._set(self.history, user_id, history)
         
-        self.sessions[user_id].append({
+        history.append({
             "role": role,
             "content": content
         })
-        
-        # Limit history length
-        from config import MAX_HISTORY_LENGTH
-        if len(self.sessions[user_id]) > MAX_HISTORY_LENGTH * 2:
-            self.sessions[user_id] = self.sessions[user_id][-MAX_HISTORY_LENGTH * 2:]
     
     def clear_history(self, user_id: int):
         """Clear conversation history for a user."""
-        if user_id in self.sessions:
-            del self.sessions[user_id]
+        self.history.pop(user_id, None)
     
     def get_mode(self, user_id: int) -> str:
         """Get current mode for a user."""
-        return self.sessions.get(f"{user_id}_mode", "text")
+        return self._get(self.mode, user_id, "text")
     
     def set_mode(self, user_id: int, mode: str):
         """Set mode for a user."""
-        self.sessions[f"{user_id}_mode"] = mode
+        self._set(self.mode, user_id, mode)
     
     def get_voice(self, user_id: int) -> str:
         """Get current voice setting for a user."""
-        from config import DEFAULT_VOICE
-        return self.sessions.get(f"{user_id}_voice", DEFAULT_VOICE)
+        return self._get(self.voice, user_id, DEFAULT_VOICE)
     
     def set_voice(self, user_id: int, voice: str):
         """Set voice for a user."""
-        self.sessions[f"{user_id}_voice"] = voice
+        self._set(self.voice, user_id, voice)
 
 
 # Global session manager instance
@@ -0,0 +1,224 @@
+"""
+Shared HTTP session for the Personal Assistant Bot.
+Provides a pooled aiohttp session reused by handlers and services.
+"""
+
+import asyncio
+import random
+import re
+from contextlib import asynccontextmanager, nullcontext
+from pathlib import Path
+from typing import AsyncIterator, Optional, Union
+from urllib.parse import urlsplit
+
+import aiofiles
+import aiohttp
+import orjson
+
+from config import HTTP_RETRY_ATTEMPTS, HTTP_RETRY_MAX_DELAY
+from utils.logging import logger
+from utils.helpers import cleanup_file_async
+
+
+# Connection pool settings
+HTTP_POOL_LIMIT = 64
+HTTP_POOL_LIMIT_PER_HOST = 16
+HTTP_KEEPALIVE_TIMEOUT = 75
+HTTP_DNS_CACHE_TTL = 300
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_FLUSH_SIZE = 1024 * 1024  # Buffered bytes per aiofiles write
+# Images and audio are already compressed; skip transparent decompression
+DOWNLOAD_HEADERS = {"Accept-Encoding": "identity"}
+ERROR_BODY_LIMIT = 4096  # Bytes of an error response kept for logging
+# Transient statuses worth retrying: rate limit and gateway/server hiccups
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Telegram file URLs carry the bot token as a path segment
+_BOT_TOKEN_RE = re.compile(r"/bot[^/]+")
+
+_http_session: Optional[aiohttp.ClientSession] = None
+
+
+def _log_url(url: str) -> str:
+    """Reduce a URL to scheme, host and path, without the bot token or query."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.hostname}{_BOT_TOKEN_RE.sub('/bot<token>', parts.path)}"
+
+
+def _json_dumps(obj) -> str:
+    """Serialize request bodies passed as json= with orjson."""
+    return orjson.dumps(obj).decode()
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """
+    Get the shared aiohttp session, creating it on first use.
+    
+    The session must be created inside a running event loop,
+    so it is initialized lazily rather than at import time.
+    
+    Returns:
+        Shared ClientSession with keep-alive connection pool
+    """
+    global _http_session
+    
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL
+        )
+        _http_session = aiohttp.ClientSession(connector=connector, json_serialize=_json_dumps)
+        logger.debug("Shared HTTP session created")
+    
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the shared aiohttp session if it was created."""
+    global _http_session
+    
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+        logger.debug("Shared HTTP session closed")
+    
+    _http_session = None
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Compute the pause before the next attempt.
+    
+    Args:
+        attempt: Zero-based number of the failed attempt
+        retry_after: Retry-After header value, if the server sent one
+    
+    Returns:
+        Delay in seconds
+    """
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), HTTP_RETRY_MAX_DELAY)
+        except ValueError:
+            pass  # HTTP-date form, fall back to backoff
+    return min(2 ** attempt, HTTP_RETRY_MAX_DELAY) + random.random()
+
+
+@asynccontextmanager
+async def request_with_retry(
+    method: str,
+    url: str,
+    attempts: int = HTTP_RETRY_ATTEMPTS,
+    limiter=None,
+    **kwargs
+) -> AsyncIterator[aiohttp.ClientResponse]:
+    """
+    Send a request over the shared session, retrying transient failures.
+    
+    429/5xx responses and connection errors are retried with jittered
+    exponential backoff, honoring Retry-After. The last response is
+    yielded as is, so callers still check its status.
+    
+    Args:
+        method: HTTP method
+        url: Request URL
+        attempts: Maximum number of attempts
+        limiter: Rate limiter acquired before every attempt
+        **kwargs: Passed to session.request; a callable data is
+            called per attempt to rebuild one-shot bodies like FormData
+    
+    Yields:
+        Response of the final attempt
+    """
+    session = get_http_session()
+    data = kwargs.pop("data", None)
+    
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        body = data() if callable(data) else data
+        
+        try:
+            async with limiter or nullcontext():
+                response = await session.request(method, url, data=body, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if last_attempt:
+                raise
+            delay = _retry_delay(attempt)
+            logger.warning("%s %s failed (%s), retrying in %.1fs", method, _log_url(url), e, delay)
+            await asyncio.sleep(delay)
+            continue
+        
+        if response.status in RETRY_STATUSES and not last_attempt:
+            delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+            response.release()
+            logger.warning("%s %s returned %s, retrying in %.1fs", method, _log_url(url), response.status, delay)
+            await asyncio.sleep(delay)
+            continue
+        
+        async with response:
+            yield response
+        return
+
+
+async def read_error_body(response: aiohttp.ClientResponse, limit: int = ERROR_BODY_LIMIT) -> str:
+    """
+    Read the beginning of an error response for logging.
+    
+    Args:
+        response: Response with a non-success status
+        limit: Maximum number of bytes to read
+    
+    Returns:
+        Decoded prefix of the response body
+    """
+    body = await response.content.read(limit)
+    return body.decode("utf-8", errors="replace")
+
+
+async def download_to_file(
+    url: str,
+    destination: Union[str, Path],
+    max_size: Optional[int] = None,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE
+) -> int:
+    """
+    Stream a URL to disk without buffering the whole body in memory.
+    
+    Args:
+        url: URL to download
+        destination: Path to write the file to
+        max_size: Abort if the body exceeds this many bytes
+        chunk_size: Size of chunks read from the response
+    
+    Returns:
+        Number of bytes written
+    """
+    written = 0
+    
+    try:
+        async with request_with_retry("GET", url, headers=DOWNLOAD_HEADERS) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Download failed: HTTP {response.status}")
+            
+            async with aiofiles.open(destination, 'wb') as f:
+                # Each aiofiles call is a thread hop, so chunks are written in batches
+                pending = []
+                pending_size = 0
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    written += len(chunk)
+                    if max_size is not None and written > max_size:
+                        raise ValueError(f"File exceeds maximum size of {max_size} bytes")
+                    pending.append(chunk)
+                    pending_size += len(chunk)
+                    if pending_size >= DOWNLOAD_FLUSH_SIZE:
+                        await f.writelines(pending)
+                        pending = []
+                        pending_size = 0
+                if pending:
+                    await f.writelines(pending)
+    except Exception:
+        await cleanup_file_async(destination)
+        raise
+    
+    logger.debug("Downloaded %s bytes to %s", written, destination)
+    return written
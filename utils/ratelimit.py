@@ -0,0 +1,15 @@
+"""
+Rate limiting for the Personal Assistant Bot.
+Provides shared token buckets that pace outbound OpenAI and Telegram requests.
+"""
+
+from aiolimiter import AsyncLimiter
+
+from config import OPENAI_RPM, TELEGRAM_SEND_RATE
+
+
+# Shared limiter for all OpenAI API calls (chat, vision, audio, images)
+openai_limiter = AsyncLimiter(max_rate=OPENAI_RPM, time_period=60)
+
+# Shared limiter for messages the bot sends to Telegram
+telegram_limiter = AsyncLimiter(max_rate=TELEGRAM_SEND_RATE, time_period=1)
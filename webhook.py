@@ -0,0 +1,90 @@
+"""
+Webhook Server.
+Receives Telegram updates over HTTPS and dispatches them to the bot handlers.
+"""
+
+import asyncio
+import hmac
+import secrets
+from urllib.parse import urlparse
+
+import orjson
+from aiohttp import web
+from telebot import types
+
+from bot import bot
+from config import WEBHOOK_URL, WEBHOOK_LISTEN_HOST, WEBHOOK_LISTEN_PORT, WEBHOOK_SECRET
+from utils.logging import logger
+
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_webhook_app(path: str = "", secret: str = WEBHOOK_SECRET) -> web.Application:
+    """
+    Create the aiohttp application receiving updates.
+    
+    Updates are acknowledged at once and handled in background tasks, so
+    Telegram never waits on (or retries because of) a slow handler.
+    
+    Args:
+        path: URL path to listen on, defaults to the path of WEBHOOK_URL
+        secret: Secret token every request must carry
+    
+    Returns:
+        Configured application
+    """
+    if not secret:
+        # Without it anyone who finds the URL could post updates as any user
+        raise ValueError("Webhook secret token is required")
+    
+    path = path or urlparse(WEBHOOK_URL).path or "/webhook"
+    expected = secret.encode()
+    pending = set()
+    
+    async def handle_update(request: web.Request) -> web.Response:
+        received = request.headers.get(SECRET_HEADER, "").encode()
+        if not hmac.compare_digest(received, expected):
+            return web.Response(status=403)
+        
+        try:
+            update = types.Update.de_json(orjson.loads(await request.read()))
+        except Exception as e:
+            logger.warning("Ignoring malformed update: %s", e)
+            return web.Response(status=400)
+        
+        task = asyncio.create_task(bot.process_new_updates([update]))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        return web.Response()
+    
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+async def run_webhook():
+    """Register the webhook with Telegram and serve updates until cancelled."""
+    secret = WEBHOOK_SECRET
+    if not secret:
+        # Telegram echoes the token back, so a per-run random one works too
+        secret = secrets.token_urlsafe(32)
+        logger.info("WEBHOOK_SECRET is not set, using a random secret token for this run")
+    
+    runner = web.AppRunner(create_webhook_app(secret=secret))
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, WEBHOOK_LISTEN_HOST, WEBHOOK_LISTEN_PORT)
+        await site.start()
+        logger.info("Webhook server listening on %s:%s", WEBHOOK_LISTEN_HOST, WEBHOOK_LISTEN_PORT)
+        
+        await bot.set_webhook(
+            url=WEBHOOK_URL,
+            secret_token=secret,
+            drop_pending_updates=True
+        )
+        logger.info("Webhook registered")
+        
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()